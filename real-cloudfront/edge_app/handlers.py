@@ -1,5 +1,27 @@
+import json
+import logging
 import urllib
 
+import boto3
+import botocore
+
+logger = logging.getLogger()
+
+# The CloudFront origin passes us the arn of the real-main lambda that renders thumbnails via this custom
+# header, as Lambda@Edge functions can't have environment variables. See serverless.yml
+RENDER_THUMBNAIL_FUNCTION_HEADER = 'x-real-render-thumbnail-function'
+
+# And whether on demand rendering is enabled, which is when thumbnails may be missing from S3 at all
+THUMBNAILS_ON_DEMAND_ENABLED_HEADER = 'x-real-thumbnails-on-demand-enabled'
+
+# Thumbnails that are not rendered on upload when on demand rendering is enabled. The others are always
+# in S3, so requests for them skip the existence check. Keep in sync with
+# PREFETCHED_THUMBNAILS in real-main/app/utils/image_size.py
+ON_DEMAND_THUMBNAIL_FILENAMES = ('4K.jpg',)
+
+# boto clients, by region, reused across invocations
+boto_clients = {}
+
 
 def viewer_request(event, context):
     """
@@ -27,9 +49,55 @@ def origin_request(event, context):
       * Adds the x-amz-acl header to give IAM users access to S3 objects.
         Without this, only the cloud front access identity user can access the
         objects and if that user gets deleted... then no more access to S3 objects.
+      * On reads of thumbnails that are not yet in S3, has them rendered from their native
+        image and saved to S3 before the request continues on to S3.
     """
     request = event['Records'][0]['cf']['request']
     writes = ['PUT', 'POST', 'PATCH']
     if request['method'] in writes:
         request['headers']['x-amz-acl'] = [{'key': 'x-amz-acl', 'value': 'bucket-owner-full-control'}]
+    filename = request['uri'].rpartition('/')[2]
+    if request['method'] in ('GET', 'HEAD') and filename in ON_DEMAND_THUMBNAIL_FILENAMES:
+        try:
+            render_thumbnail_if_missing(request)
+        except Exception as err:
+            # let the request through, S3 will respond with a 403 or 404 as it would have anyway
+            logger.exception(f'Unable to render thumbnail `{request["uri"]}`: {err}')
     return request
+
+
+def get_boto_client(service_name, region_name):
+    key = (service_name, region_name)
+    if key not in boto_clients:
+        boto_clients[key] = boto3.client(service_name, region_name=region_name)
+    return boto_clients[key]
+
+
+def render_thumbnail_if_missing(request):
+    origin = request['origin']['s3']
+    custom_headers = origin.get('customHeaders', {})
+    enabled_headers = custom_headers.get(THUMBNAILS_ON_DEMAND_ENABLED_HEADER)
+    if not enabled_headers or enabled_headers[0]['value'] in ('', 'false'):
+        return  # rendering on demand not enabled, so the thumbnail was rendered on upload
+    function_headers = custom_headers.get(RENDER_THUMBNAIL_FUNCTION_HEADER)
+    if not function_headers:
+        return  # rendering on demand not configured
+    function_arn = function_headers[0]['value']
+    region_name = function_arn.split(':')[3]
+
+    # s3 origin domain names are of the form '<bucket>.s3.amazonaws.com' or '<bucket>.s3.<region>.amazonaws.com'
+    bucket_name = origin['domainName'].split('.s3.')[0]
+    path = urllib.parse.unquote(request['uri'][1:])
+    try:
+        get_boto_client('s3', region_name).head_object(Bucket=bucket_name, Key=path)
+    except botocore.exceptions.ClientError as err:
+        if err.response['Error']['Code'] != '404':
+            raise
+    else:
+        return  # already exists
+
+    resp = get_boto_client('lambda', region_name).invoke(
+        FunctionName=function_arn, Payload=json.dumps({'path': path}).encode('utf-8')
+    )
+    if 'FunctionError' in resp:
+        raise Exception(f'Render thumbnail function failed: {resp["Payload"].read()}')
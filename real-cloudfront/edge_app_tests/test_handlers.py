@@ -0,0 +1,96 @@
+import io
+import json
+from unittest import mock
+
+import botocore
+import pytest
+
+from edge_app import handlers
+
+FUNCTION_ARN = 'arn:aws:lambda:us-east-1:123456789012:function:real-dev-main-renderThumbnail'
+
+
+@pytest.fixture
+def boto_clients():
+    clients = {'s3': mock.Mock(), 'lambda': mock.Mock()}
+    with mock.patch.object(handlers, 'get_boto_client', side_effect=lambda name, region: clients[name]):
+        yield clients
+
+
+def build_event(uri, method='GET', enabled='true'):
+    custom_headers = {
+        handlers.RENDER_THUMBNAIL_FUNCTION_HEADER: [
+            {'key': handlers.RENDER_THUMBNAIL_FUNCTION_HEADER, 'value': FUNCTION_ARN}
+        ],
+        handlers.THUMBNAILS_ON_DEMAND_ENABLED_HEADER: [
+            {'key': handlers.THUMBNAILS_ON_DEMAND_ENABLED_HEADER, 'value': enabled}
+        ],
+    }
+    request = {
+        'method': method,
+        'uri': uri,
+        'headers': {},
+        'origin': {'s3': {'domainName': 'the-bucket.s3.amazonaws.com', 'customHeaders': custom_headers}},
+    }
+    return {'Records': [{'cf': {'request': request}}]}
+
+
+def not_found_error():
+    return botocore.exceptions.ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+
+
+def test_origin_request_thumbnail_exists(boto_clients):
+    event = build_event('/uid/post/pid/image/4K.jpg')
+    request = handlers.origin_request(event, None)
+    assert request is event['Records'][0]['cf']['request']
+    assert boto_clients['s3'].mock_calls == [
+        mock.call.head_object(Bucket='the-bucket', Key='uid/post/pid/image/4K.jpg')
+    ]
+    assert boto_clients['lambda'].mock_calls == []
+
+
+def test_origin_request_thumbnail_missing_renders_it(boto_clients):
+    boto_clients['s3'].head_object.side_effect = not_found_error()
+    boto_clients['lambda'].invoke.return_value = {'StatusCode': 200, 'Payload': io.BytesIO(b'null')}
+    event = build_event('/uid/post/pid/image/4K.jpg', method='HEAD')
+    request = handlers.origin_request(event, None)
+    assert request is event['Records'][0]['cf']['request']
+    assert len(boto_clients['s3'].mock_calls) == 1
+    assert boto_clients['lambda'].mock_calls == [
+        mock.call.invoke(
+            FunctionName=FUNCTION_ARN, Payload=json.dumps({'path': 'uid/post/pid/image/4K.jpg'}).encode('utf-8')
+        )
+    ]
+
+
+def test_origin_request_thumbnail_render_failure_lets_request_through(boto_clients, caplog):
+    boto_clients['s3'].head_object.side_effect = not_found_error()
+    boto_clients['lambda'].invoke.return_value = {'FunctionError': 'Unhandled', 'Payload': io.BytesIO(b'oops')}
+    event = build_event('/uid/post/pid/image/4K.jpg')
+    request = handlers.origin_request(event, None)
+    assert request is event['Records'][0]['cf']['request']
+    assert len(caplog.records) == 1
+    assert 'Unable to render thumbnail `/uid/post/pid/image/4K.jpg`' in caplog.records[0].msg
+
+
+@pytest.mark.parametrize('enabled', ['false', ''])
+def test_origin_request_on_demand_disabled(boto_clients, enabled):
+    event = build_event('/uid/post/pid/image/4K.jpg', enabled=enabled)
+    request = handlers.origin_request(event, None)
+    assert request is event['Records'][0]['cf']['request']
+    assert boto_clients['s3'].mock_calls == []
+    assert boto_clients['lambda'].mock_calls == []
+
+
+def test_origin_request_not_on_demand_thumbnail(boto_clients):
+    event = build_event('/uid/post/pid/image/480p.jpg')
+    handlers.origin_request(event, None)
+    assert boto_clients['s3'].mock_calls == []
+    assert boto_clients['lambda'].mock_calls == []
+
+
+def test_origin_request_write_sets_acl(boto_clients):
+    event = build_event('/uid/post/pid/image/4K.jpg', method='PUT')
+    request = handlers.origin_request(event, None)
+    assert request['headers']['x-amz-acl'] == [{'key': 'x-amz-acl', 'value': 'bucket-owner-full-control'}]
+    assert boto_clients['s3'].mock_calls == []
@@ -1,8 +1,13 @@
 import base64
+import concurrent.futures
+import heapq
 import json
 import logging
+import math
 import os
 import re
+import threading
+import zlib
 
 import boto3
 
@@ -11,6 +16,10 @@ logger = logging.getLogger()
 
 
 class DynamoClient:
+
+    # max number of times decrement_count() reads the counter to decrement it to zero without racing
+    decrement_count_max_attempts = 3
+
     def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None):
         """
         If create_table_schema is not None, then the table will be created
@@ -19,16 +28,39 @@ class DynamoClient:
         assert table_name, "Table name is required"
         self.table_name = table_name
 
-        boto3_resource = boto3.resource('dynamodb')
+        self.session = boto3.session.Session()
+        boto3_resource = self.session.resource('dynamodb')
 
         if create_table_schema:
             create_table_schema['TableName'] = table_name
             boto3_resource.create_table(**create_table_schema)
 
-        self.table = boto3_resource.Table(table_name)
-        self.boto3_client = boto3.client('dynamodb')
+        # boto3 resources are not thread safe, so each thread that uses us gets its own resource. They are
+        # created under a lock from our one session, so they raise the same exception classes as
+        # self.exceptions. They are keyed by thread ident, which is only reused once the thread that had it
+        # has exited, so the resources are reused across thread pools rather than created per task.
+        self.thread_resources = {threading.get_ident(): (boto3_resource, boto3_resource.Table(table_name))}
+        self.thread_resources_lock = threading.Lock()
+        self.boto3_client = self.session.client('dynamodb')
         self.exceptions = self.boto3_client.exceptions
 
+    @property
+    def resource(self):
+        return self.get_thread_resource()[0]
+
+    @property
+    def table(self):
+        return self.get_thread_resource()[1]
+
+    def get_thread_resource(self):
+        "Returns a pair of (resource, table) for use by the current thread only"
+        thread_id = threading.get_ident()
+        if thread_id not in self.thread_resources:
+            with self.thread_resources_lock:
+                resource = self.session.resource('dynamodb')
+            self.thread_resources[thread_id] = (resource, resource.Table(self.table_name))
+        return self.thread_resources[thread_id]
+
     def add_item(self, query_kwargs):
         "Put an item and return what was putted"
         # ensure query fails if the item already exists
@@ -60,6 +92,23 @@ class DynamoClient:
             kwargs['RequestItems'][self.table_name]['ProjectionExpression'] = projection_expression
         return self.boto3_client.batch_get_item(**kwargs)['Responses'][self.table_name]
 
+    def batch_get(self, key_generator, projection_expression=None):
+        """
+        Get the items with the keys yielded by `generator`, in batches.
+        Unlike batch_get_items(), keys and items are in the same untyped format as get_item().
+        Order *not* maintained, items that do not exist are omitted.
+        """
+        items, keys = [], list(key_generator)
+        for i in range(0, len(keys), 100):
+            request = {'Keys': keys[i : i + 100]}
+            if projection_expression:
+                request['ProjectionExpression'] = projection_expression
+            while request:
+                resp = self.resource.batch_get_item(RequestItems={self.table_name: request})
+                items.extend(resp['Responses'][self.table_name])
+                request = resp.get('UnprocessedKeys', {}).get(self.table_name)
+        return items
+
     def update_item(self, query_kwargs, failure_warning=None):
         """
         Update an item and return the new item.
@@ -92,29 +141,57 @@ class DynamoClient:
         }
         return self.table.update_item(**kwargs).get('Attributes')
 
-    def increment_count(self, key, attribute_name):
+    def increment_count(self, key, attribute_name, count=1):
         "Best-effort attempt to increment a counter. Logs a WARNING upon failure."
         query_kwargs = {
             'Key': key,
-            'UpdateExpression': 'ADD #attrName :one',
+            'UpdateExpression': 'ADD #attrName :count',
             'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':one': 1},
+            'ExpressionAttributeValues': {':count': count},
             'ConditionExpression': 'attribute_exists(partitionKey)',
         }
         failure_warning = f'Failed to increment {attribute_name} for key `{key}`'
         return self.update_item(query_kwargs, failure_warning=failure_warning)
 
-    def decrement_count(self, key, attribute_name):
-        "Best-effort attempt to decrement a counter. Logs a WARNING upon failure."
-        query_kwargs = {
-            'Key': key,
-            'UpdateExpression': 'ADD #attrName :neg_one',
-            'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':neg_one': -1, ':zero': 0},
-            'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName > :zero',
-        }
+    def decrement_count(self, key, attribute_name, count=1):
+        """
+        Best-effort attempt to decrement a counter. Logs a WARNING upon failure.
+        If the counter is less than `count` it is decremented to zero instead, also with a WARNING.
+        """
+
+        def decrement(by, cond_op):
+            query_kwargs = {
+                'Key': key,
+                'UpdateExpression': 'ADD #attrName :neg_count',
+                'ExpressionAttributeNames': {'#attrName': attribute_name},
+                'ExpressionAttributeValues': {':neg_count': -by, ':count': by},
+                'ConditionExpression': f'#attrName {cond_op} :count',
+            }
+            return self.update_item(query_kwargs)
+
         failure_warning = f'Failed to decrement {attribute_name} for key `{key}`'
-        return self.update_item(query_kwargs, failure_warning=failure_warning)
+        for _ in range(self.decrement_count_max_attempts if count > 1 else 1):
+            try:
+                return decrement(count, '>=')
+            except self.exceptions.ConditionalCheckFailedException:
+                pass
+            if count == 1:
+                break
+            # decrement by exactly what is there, which fails rather than races if it has changed since
+            item = self.get_item(key, ConsistentRead=True)
+            value = int(item.get(attribute_name, 0)) if item else 0
+            if value <= 0:
+                break
+            if value >= count:
+                # the counter has risen since the decrement failed, so a full decrement may go through now
+                continue
+            try:
+                item = decrement(value, '=')
+            except self.exceptions.ConditionalCheckFailedException:
+                continue
+            logger.warning(f'{failure_warning} by {count}, decremented by {value} to zero instead')
+            return item
+        logger.warning(failure_warning if count == 1 else f'{failure_warning} by {count}')
 
     def batch_put_items(self, generator):
         "Batch put the items yielded by `generator`. Returns count of how many puts requested."
@@ -186,6 +263,104 @@ class DynamoClient:
                 yield item
             last_key = resp.get('LastEvaluatedKey')
 
+    def generate_all_query_pages(self, query_kwargs, exclusive_start_key=None):
+        """
+        Return a generator that iterates over all results of the query, one page at a time.
+        Yields pairs of (items, last_evaluated_key), the latter of which may be used to resume the query.
+        """
+        last_key = exclusive_start_key or False
+        while last_key is not None:
+            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+            resp = self.table.query(**query_kwargs, **start_kwargs)
+            last_key = resp.get('LastEvaluatedKey')
+            yield resp['Items'], last_key
+
+    def get_shard_partition_key(self, partition_key_prefix, shard_by, shard_count):
+        """
+        A partition key for an item in one of `shard_count` shards of what would otherwise be a single
+        hot index partition, chosen by a stable hash of the string `shard_by`.
+        """
+        shard = zlib.crc32(shard_by.encode('utf-8')) % shard_count
+        return f'{partition_key_prefix}#{shard}'
+
+    def get_shard_partition_keys(self, partition_key_prefix, shard_count):
+        "All the partition keys get_shard_partition_key() may return, in shard order"
+        return [f'{partition_key_prefix}#{shard}' for shard in range(shard_count)]
+
+    def generate_all_query_sharded(self, query_kwargs_list, sort_key_name):
+        """
+        Return a generator that iterates over all results of the queries, one per shard, merged
+        into one stream ordered by the `sort_key_name` attribute, respecting ScanIndexForward.
+        The shards are queried concurrently, and each shard's next page is fetched while the
+        current one is being consumed.
+        """
+        reverse = not query_kwargs_list[0].get('ScanIndexForward', True)
+
+        def generate_shard(executor, query_kwargs, future):
+            while future:
+                resp = future.result()
+                last_key = resp.get('LastEvaluatedKey')
+                future = (
+                    executor.submit(self.table.query, **query_kwargs, ExclusiveStartKey=last_key)
+                    if last_key
+                    else None
+                )
+                yield from resp['Items']
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(query_kwargs_list)) as executor:
+            # submit the first page of every shard up front, so they're all in flight at once
+            futures = [executor.submit(self.table.query, **query_kwargs) for query_kwargs in query_kwargs_list]
+            generators = [
+                generate_shard(executor, query_kwargs, future)
+                for query_kwargs, future in zip(query_kwargs_list, futures)
+            ]
+            yield from heapq.merge(*generators, key=lambda item: item[sort_key_name], reverse=reverse)
+
+    def generate_all_query_pages_sharded(
+        self, query_kwargs_list, sort_key_name, page_size, exclusive_start_keys=None
+    ):
+        """
+        Return a generator that iterates over all results of the queries, one per shard, a page at a time.
+        Each page is made up of a page from every shard that has more results, queried concurrently, and is
+        ordered by the `sort_key_name` attribute. Order is *not* maintained across pages.
+
+        Yields pairs of (items, last_evaluated_keys), the latter of which is a list with an entry for each
+        shard and may be used to resume the queries. The entry for a shard with no more results is None.
+        """
+        shard_count = len(query_kwargs_list)
+        last_keys = list(exclusive_start_keys or [False] * shard_count)
+        assert len(last_keys) == shard_count, 'Must have one exclusive start key per shard'
+        shard_limit = math.ceil(page_size / shard_count)
+
+        def query_shard(query_kwargs, last_key):
+            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+            return self.table.query(**query_kwargs, Limit=shard_limit, **start_kwargs)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=shard_count) as executor:
+            while any(last_key is not None for last_key in last_keys):
+                futures = [
+                    executor.submit(query_shard, query_kwargs, last_key) if last_key is not None else None
+                    for query_kwargs, last_key in zip(query_kwargs_list, last_keys)
+                ]
+                items = []
+                for shard, future in enumerate(futures):
+                    if future:
+                        resp = future.result()
+                        items.extend(resp['Items'])
+                        last_keys[shard] = resp.get('LastEvaluatedKey')
+                items.sort(key=lambda item: item[sort_key_name])
+                yield items, list(last_keys)
+
+    def count_all_query(self, query_kwargs):
+        "Return the count of all results of the query"
+        count, last_key = 0, False
+        while last_key is not None:
+            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+            resp = self.table.query(**query_kwargs, Select='COUNT', **start_kwargs)
+            count += resp['Count']
+            last_key = resp.get('LastEvaluatedKey')
+        return count
+
     def generate_all_scan(self, scan_kwargs):
         "Return a generator that iterates over all results of the scan"
         last_key = False
@@ -14,8 +14,19 @@ class PinpointClient:
         self.app_id = app_id
         self.client = boto3.client('pinpoint')
 
+    # max number of users that may be sent a message in one send_users_messages request
+    max_users_per_send = 100
+
+    # max number of endpoints that may be updated in one update_endpoints_batch request
+    max_endpoints_per_batch = 100
+
     def send_user_apns(self, user_id, url, title, body=None):
         "Returns a bool representing if the APNS was successfully sent"
+        return user_id in self.send_users_apns([user_id], url, title, body=body)
+
+    def send_users_apns(self, user_ids, url, title, body=None):
+        "Send the same APNS to many users in one request. Returns the set of user ids it was successfully sent to."
+        assert len(user_ids) <= self.max_users_per_send, f'Max {self.max_users_per_send} users per request'
         apns_msg = {'Action': 'URL', 'Title': title, 'Url': url}
         if body:
             apns_msg['Body'] = body
@@ -23,11 +34,15 @@ class PinpointClient:
             'ApplicationId': self.app_id,
             'SendUsersMessageRequest': {
                 'MessageConfiguration': {'APNSMessage': apns_msg},
-                'Users': {user_id: {}},
+                'Users': {user_id: {} for user_id in user_ids},
             },
         }
-        result = self.client.send_users_messages(**kwargs)['SendUsersMessageResponse']['Result'][user_id]
-        return 'SUCCESSFUL' in (v['DeliveryStatus'] for k, v in result.items())
+        results = self.client.send_users_messages(**kwargs)['SendUsersMessageResponse']['Result']
+        return {
+            user_id
+            for user_id, result in results.items()
+            if 'SUCCESSFUL' in (v['DeliveryStatus'] for k, v in result.items())
+        }
 
     def update_user_endpoint(self, user_id, channel_type, address):
         """
@@ -81,27 +96,72 @@ class PinpointClient:
             if not channel_type or item['ChannelType'] == channel_type
         }
 
-    def enable_user_endpoints(self, user_id):
-        "Disable all of a user's endpoints"
+    def sync_user_endpoints(self, user_id, addresses=None, endpoint_status=None):
+        """
+        Bring the user's endpoints in line with the desired state, with one read of their current
+        endpoints, one batch update of those that need changing and one delete per endpoint to remove.
+
+        `addresses` is a dict of {channel_type: address}, where an address of None indicates the user
+        should have no endpoint of that `channel_type`. The user should have at most one endpoint of each
+        `channel_type`, so extras are deleted. Channel types not included are left alone.
+        If `endpoint_status` ('ACTIVE' or 'INACTIVE') is provided, all of the user's endpoints are set to it.
+
+        Returns a boolean indicating if any changes were made.
+        """
         endpoints = self.get_user_endpoints(user_id)
-        for endpoint_id in endpoints.keys():
+        to_delete_ids, to_update = [], {}
+        for channel_type, address in (addresses or {}).items():
+            # put the endpoint to keep, if any, at the front
+            endpoint_ids = sorted(
+                (
+                    endpoint_id
+                    for endpoint_id, endpoint in endpoints.items()
+                    if endpoint['ChannelType'] == channel_type
+                ),
+                key=lambda endpoint_id: endpoints[endpoint_id].get('Address') != address,
+            )
+            if address is None:
+                to_delete_ids.extend(endpoint_ids)
+                continue
+            to_delete_ids.extend(endpoint_ids[1:])
+            if not endpoint_ids or endpoints[endpoint_ids[0]].get('Address') != address:
+                endpoint_id = endpoint_ids[0] if endpoint_ids else str(uuid.uuid4())
+                to_update[endpoint_id] = {'Address': address, 'ChannelType': channel_type}
+
+        if endpoint_status:
+            for endpoint_id, endpoint in endpoints.items():
+                if endpoint_id not in to_delete_ids and endpoint.get('EndpointStatus') != endpoint_status:
+                    to_update.setdefault(
+                        endpoint_id, {'Address': endpoint['Address'], 'ChannelType': endpoint['ChannelType']}
+                    )
+            for endpoint_request in to_update.values():
+                endpoint_request['EndpointStatus'] = endpoint_status
+
+        for endpoint_id in to_delete_ids:
+            self.delete_endpoint(endpoint_id)
+        self.update_user_endpoints_batch(user_id, to_update)
+        return bool(to_delete_ids or to_update)
+
+    def update_user_endpoints_batch(self, user_id, endpoint_requests):
+        "Create or update the user's endpoints, given a dict of {endpoint_id: endpoint_request}"
+        items = [
+            {'Id': endpoint_id, 'User': {'UserId': user_id}, **endpoint_request}
+            for endpoint_id, endpoint_request in endpoint_requests.items()
+        ]
+        for i in range(0, len(items), self.max_endpoints_per_batch):
             kwargs = {
                 'ApplicationId': self.app_id,
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {'EndpointStatus': 'ACTIVE'},
+                'EndpointBatchRequest': {'Item': items[i : i + self.max_endpoints_per_batch]},
             }
-            self.client.update_endpoint(**kwargs)
+            self.client.update_endpoints_batch(**kwargs)
+
+    def enable_user_endpoints(self, user_id):
+        "Enable all of a user's endpoints"
+        return self.sync_user_endpoints(user_id, endpoint_status='ACTIVE')
 
     def disable_user_endpoints(self, user_id):
         "Disable all of a user's endpoints"
-        endpoints = self.get_user_endpoints(user_id)
-        for endpoint_id in endpoints.keys():
-            kwargs = {
-                'ApplicationId': self.app_id,
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {'EndpointStatus': 'INACTIVE'},
-            }
-            self.client.update_endpoint(**kwargs)
+        return self.sync_user_endpoints(user_id, endpoint_status='INACTIVE')
 
     def delete_endpoint(self, endpoint_id):
         "Delete a specific endpoint"
@@ -1,8 +1,15 @@
+import concurrent.futures
+
 import boto3
 import botocore
 
 
 class S3Client:
+
+    # boto3's default connection pool size. Note concurrent requests go through the low-level client,
+    # as unlike boto3 resources, it is thread safe.
+    max_workers = 10
+
     def __init__(self, bucket_name, create_bucket=False):
         """
         The create_bucket kwarg is intended for use with moto in the test suite.
@@ -18,7 +25,7 @@ class S3Client:
             self.s3.create_bucket(Bucket=bucket_name)
 
     def get_object_data_stream(self, path):
-        return self.bucket.Object(path).get()['Body']
+        return self.boto_client.get_object(Bucket=self.bucket_name, Key=path)['Body']
 
     def get_object_checksum(self, path):
         resp = self.boto_client.head_object(Bucket=self.bucket_name, Key=path)
@@ -47,11 +54,18 @@ class S3Client:
         self.bucket.objects.filter(Prefix=path_prefix).delete()
 
     def copy_object(self, old_path, new_path):
-        new_obj = self.bucket.Object(new_path)
-        new_obj.copy({'Bucket': self.bucket.name, 'Key': old_path})
+        copy_source = {'Bucket': self.bucket_name, 'Key': old_path}
+        self.boto_client.copy_object(Bucket=self.bucket_name, Key=new_path, CopySource=copy_source)
+
+    def copy_objects(self, path_pairs):
+        "Copy multiple objects concurrently, given an iterable of (old_path, new_path) pairs"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.copy_object, old_path, new_path) for old_path, new_path in path_pairs]
+        for future in futures:
+            future.result()
 
     def put_object(self, path, body, content_type):
-        self.bucket.put_object(Key=path, Body=body, ContentType=content_type)
+        self.boto_client.put_object(Bucket=self.bucket_name, Key=path, Body=body, ContentType=content_type)
 
     def exists(self, path):
         # https://stackoverflow.com/a/33843019
@@ -6,6 +6,7 @@ import pendulum
 from app import clients, models
 from app.mixins.flag.enums import FlagStatus
 from app.mixins.flag.exceptions import FlagException
+from app.mixins.trending.exceptions import TrendingException
 from app.models.album.exceptions import AlbumException
 from app.models.appstore.exceptions import AppStoreException
 from app.models.block.enums import BlockStatus
@@ -336,6 +337,28 @@ def add_app_store_receipt(caller_user, arguments, source, context):
     return True
 
 
+def trending_page(manager, arguments):
+    limit = arguments.get('limit') or 20
+    if limit < 1 or limit > 100:
+        raise ClientException('Limit cannot be less than 1 or greater than 100')
+    try:
+        return manager.trending_get_page(limit=limit, next_token=arguments.get('nextToken'))
+    except TrendingException as err:
+        raise ClientException(str(err)) from err
+
+
+@routes.register('Query.trendingUsers')
+def trending_users(caller_user_id, arguments, source, context):
+    # served from the published snapshot, the PaginatedUsers.items pipeline applies per-caller filtering
+    return trending_page(user_manager, arguments)
+
+
+@routes.register('Query.trendingPosts')
+def trending_posts(caller_user_id, arguments, source, context):
+    # served from the published snapshot, the PaginatedPosts.items pipeline applies per-caller filtering
+    return trending_page(post_manager, arguments)
+
+
 @routes.register('User.photo')
 def user_photo(caller_user_id, arguments, source, context):
     user = user_manager.init_user(source)
@@ -12,6 +12,11 @@ S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
 USER_NOTIFICATIONS_ENABLED = os.environ.get('USER_NOTIFICATIONS_ENABLED')
 USER_NOTIFICATIONS_ONLY_USERNAMES = os.environ.get('USER_NOTIFICATIONS_ONLY_USERNAMES')
 
+# leave enough time to finish the page of trending items in progress before lambda times out
+DEFLATE_TRENDING_STOP_MARGIN = pendulum.duration(minutes=2)
+# runs every minute, so stop before the next run starts and let that one resume where this one left off
+SEND_USER_NOTIFICATIONS_MAX_DURATION = pendulum.duration(seconds=50)
+
 logger = logging.getLogger()
 xray.patch_all()
 
@@ -33,22 +38,35 @@ user_manager = managers.get('user') or models.UserManager(clients, managers=mana
 
 @handler_logging
 def deflate_trending_users(event, context):
-    total_cnt, deflated_cnt = user_manager.trending_deflate()
+    stop_at = pendulum.now('utc') + pendulum.duration(milliseconds=context.get_remaining_time_in_millis())
+    stop_at -= DEFLATE_TRENDING_STOP_MARGIN
+    total_cnt, deflated_cnt, deleted_cnt, completed = user_manager.trending_deflate(stop_at=stop_at)
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'Trending users deflated: {deflated_cnt} out of {total_cnt}')
-    deleted_cnt = user_manager.trending_delete_tail(total_cnt)
-    with LogLevelContext(logger, logging.INFO):
         logger.info(f'Trending users removed: {deleted_cnt} out of {total_cnt}')
+        if not completed:
+            logger.info('Trending users deflation stopped early, will resume from checkpoint on next run')
 
 
 @handler_logging
 def deflate_trending_posts(event, context):
-    total_cnt, deflated_cnt = post_manager.trending_deflate()
+    stop_at = pendulum.now('utc') + pendulum.duration(milliseconds=context.get_remaining_time_in_millis())
+    stop_at -= DEFLATE_TRENDING_STOP_MARGIN
+    total_cnt, deflated_cnt, deleted_cnt, completed = post_manager.trending_deflate(stop_at=stop_at)
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'Trending posts deflated: {deflated_cnt} out of {total_cnt}')
-    deleted_cnt = post_manager.trending_delete_tail(total_cnt)
-    with LogLevelContext(logger, logging.INFO):
         logger.info(f'Trending posts removed: {deleted_cnt} out of {total_cnt}')
+        if not completed:
+            logger.info('Trending posts deflation stopped early, will resume from checkpoint on next run')
+
+
+@handler_logging
+def publish_trending_snapshots(event, context):
+    now = pendulum.now('utc')
+    user_cnt = user_manager.trending_publish_snapshot(now=now)
+    post_cnt = post_manager.trending_publish_snapshot(now=now)
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(f'Trending snapshots published: {user_cnt} users, {post_cnt} posts')
 
 
 @handler_logging
@@ -80,7 +98,8 @@ def send_user_notifications(event, context):
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'Preparing to send notifications as needed to users: {only_usernames or "all"}')
     now = pendulum.now('utc')
-    total_cnt, success_cnt = card_manager.notify_users(now=now, only_usernames=only_usernames)
+    stop_at = now + SEND_USER_NOTIFICATIONS_MAX_DURATION
+    total_cnt, success_cnt = card_manager.notify_users(now=now, only_usernames=only_usernames, stop_at=stop_at)
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'User notifications sent successfully: {success_cnt} out of {total_cnt}')
 
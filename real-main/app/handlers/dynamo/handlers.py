@@ -85,6 +85,13 @@ register('chatMessage', '-', ['INSERT'], user_manager.sync_chat_message_creation
 register('chatMessage', '-', ['REMOVE'], chat_manager.on_chat_message_delete)
 register('chatMessage', '-', ['REMOVE'], chat_message_manager.on_item_delete_delete_flags)
 register('chatMessage', '-', ['REMOVE'], user_manager.sync_chat_message_deletion_count)
+register(
+    'chatMessage',
+    '-',
+    ['INSERT', 'MODIFY', 'REMOVE'],
+    chat_message_manager.on_chat_message_change_sync_recent_messages,
+    {'text': None, 'lastEditedAt': None},
+)
 register('chatMessage', 'flag', ['INSERT'], chat_message_manager.on_flag_add)
 register('chatMessage', 'flag', ['REMOVE'], chat_message_manager.on_flag_delete)
 register('comment', '-', ['INSERT'], post_manager.on_comment_add)
@@ -155,6 +162,13 @@ register(
     album_manager.on_post_album_change_update_counts_and_timestamps,
     {'albumId': None, 'gsiK3SortKey': -1},  # all non-completed posts are given rank of -1
 )
+register(
+    'post',
+    '-',
+    ['MODIFY', 'REMOVE'],
+    album_manager.on_post_album_change_delete_art_tiles,
+    {'albumId': None, 'gsiK3SortKey': -1},
+)
 register('post', 'flag', ['INSERT'], post_manager.on_flag_add)
 register('post', 'flag', ['REMOVE'], post_manager.on_flag_delete)
 register('post', 'like', ['INSERT'], post_manager.on_like_add)
@@ -165,6 +179,13 @@ register(
 register(
     'post', 'view', ['INSERT', 'MODIFY'], post_manager.on_post_view_count_change_update_counts, {'viewCount': 0},
 )
+register(
+    'post',
+    'view',
+    ['INSERT', 'MODIFY'],
+    post_manager.on_post_view_count_change_update_trending,
+    {'viewCount': 0},
+)
 register(
     'user',
     'follower',
@@ -288,3 +309,25 @@ def process_records(event, context):
                 func(item_id, **item_kwargs)
             except Exception as err:
                 logger.exception(str(err))
+
+    # apply the trending score increments buffered while processing the batch. Posts must go
+    # first, as flushing a post's trending buffers an increment for the user that posted it.
+    post_manager.trending_flush()
+    user_manager.trending_flush()
+
+    # regenerate the art of albums edited while processing the batch, once per album
+    album_manager.art_flush()
+
+    # sync the pinpoint endpoints of users edited while processing the batch, once per user
+    user_manager.pinpoint_flush()
+
+    # decrement the unviewed counts for messages and comments deleted while processing the batch,
+    # reading the relevant views once per chat and once for all posts
+    chat_manager.deleted_messages_flush()
+    post_manager.deleted_comments_flush()
+
+    # add the like count changes to one counter per post, then roll up the counters onto the posts
+    post_manager.like_counts_flush()
+
+    # write the recent messages cache of chats with messages added, edited or deleted, once per chat
+    chat_message_manager.recent_messages_flush()
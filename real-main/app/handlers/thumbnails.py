@@ -0,0 +1,24 @@
+import logging
+import os
+
+from app import clients
+from app.logging import LogLevelContext, handler_logging
+from app.utils import thumbnails
+
+from . import xray
+
+S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+
+logger = logging.getLogger()
+xray.patch_all()
+
+s3_uploads_client = clients.S3Client(S3_UPLOADS_BUCKET)
+
+
+@handler_logging
+def render_thumbnail(event, context):
+    "Invoked by the CloudFront origin request handler on a cache miss for a thumbnail, see real-cloudfront"
+    path = event['path']
+    with LogLevelContext(logger, logging.INFO):
+        logger.info('Handling render thumbnail request', extra={'s3_key': path})
+    return thumbnails.render_missing_thumbnail(s3_uploads_client, path)
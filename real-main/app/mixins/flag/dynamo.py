@@ -46,6 +46,11 @@ class FlagDynamo:
         generator = self.generate_by_item(item_id, pks_only=True)
         self.client.batch_delete_items(generator)
 
+    def delete_all_by_user(self, user_id):
+        "Batch delete all the flags by the user. Returns count of how many deletes requested."
+        item_ids = self.generate_item_ids_by_user(user_id)
+        return self.client.batch_delete(self.pk(item_id, user_id) for item_id in item_ids)
+
     def generate_by_item(self, item_id, pks_only=False):
         query_kwargs = {
             'KeyConditionExpression': 'partitionKey = :pk AND begins_with(sortKey, :sk_prefix)',
@@ -15,9 +15,12 @@ class FlagManagerMixin:
             self.flag_dynamo = FlagDynamo(self.item_type, clients['dynamo'])
 
     def unflag_all_by_user(self, user_id):
-        for item_id in self.flag_dynamo.generate_item_ids_by_user(user_id):
-            # this could be performance and edge-case optimized
-            self.get_model(item_id).unflag(user_id)
+        """
+        Unflag everything the user has flagged, for use when deleting the user. The flags are batch
+        deleted, and their deletes decrement the flag counts through the stream like any other unflag.
+        Returns count of how many items were unflagged.
+        """
+        return self.flag_dynamo.delete_all_by_user(user_id)
 
     def on_flag_add(self, item_id, new_item):
         raise NotImplementedError('Subclasses must implement')
@@ -99,11 +99,69 @@ class TrendingDynamo:
         except self.client.exceptions.ConditionalCheckFailedException as err:
             raise exceptions.TrendingDNEOrAttributeMismatch(self.item_type, item_id) from err
 
-    def generate_items(self):
-        "Ordered with lowest score first."
-        query_kwargs = {
+    def generate_top_items(self):
+        "Ordered with highest score first."
+        return self.client.generate_all_query({**self.items_query_kwargs(), 'ScanIndexForward': False})
+
+    def generate_item_pages(self, exclusive_start_key=None):
+        "Ordered with lowest score first. Yields pairs of (items, last_evaluated_key)."
+        return self.client.generate_all_query_pages(
+            self.items_query_kwargs(), exclusive_start_key=exclusive_start_key
+        )
+
+    def count_items(self):
+        return self.client.count_all_query(self.items_query_kwargs())
+
+    def items_query_kwargs(self):
+        return {
             'KeyConditionExpression': 'gsiA4PartitionKey = :gsia1pk',
             'ExpressionAttributeValues': {':gsia1pk': f'{self.item_type}/trending'},
             'IndexName': 'GSI-A4',
         }
-        return self.client.generate_all_query(query_kwargs)
+
+    def deflation_checkpoint_pk(self):
+        return {
+            'partitionKey': f'trendingDeflation/{self.item_type}',
+            'sortKey': '-',
+        }
+
+    def get_deflation_checkpoint(self):
+        return self.client.get_item(self.deflation_checkpoint_pk(), ConsistentRead=True)
+
+    def set_deflation_checkpoint(
+        self, deflation_date, total_count, deflated_count, deleted_count, max_to_delete, exclusive_start_key=None
+    ):
+        """
+        Record the progress of the deflation job for the given date.
+        An `exclusive_start_key` of None indicates the job completed.
+        """
+        attributes = {
+            'schemaVersion': 0,
+            'deflationDate': str(deflation_date),
+            'totalCount': total_count,
+            'deflatedCount': deflated_count,
+            'deletedCount': deleted_count,
+            'maxToDelete': max_to_delete,
+            'exclusiveStartKey': exclusive_start_key,
+        }
+        return self.client.set_attributes(self.deflation_checkpoint_pk(), **attributes)
+
+    def snapshot_pk(self):
+        return {
+            'partitionKey': f'trendingSnapshot/{self.item_type}',
+            'sortKey': '-',
+        }
+
+    def get_snapshot(self):
+        return self.client.get_item(self.snapshot_pk())
+
+    def set_snapshot(self, item_ids, scores, now):
+        "Record the ids of the top items, highest score first, along with their scores"
+        assert len(item_ids) == len(scores), 'Must provide one score per item id'
+        attributes = {
+            'schemaVersion': 0,
+            'itemIds': item_ids,
+            'scores': [score.quantize(self.PERCISION).normalize() for score in scores],
+            'createdAt': now.to_iso8601_string(),
+        }
+        return self.client.set_attributes(self.snapshot_pk(), **attributes)
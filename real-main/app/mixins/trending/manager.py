@@ -1,9 +1,15 @@
+import concurrent.futures
+import itertools
 import logging
+import time
 
+import botocore
 import pendulum
 
+from app.logging import LogLevelContext
+
 from .dynamo import TrendingDynamo
-from .exceptions import TrendingDNEOrAttributeMismatch
+from .exceptions import TrendingDNEOrAttributeMismatch, TrendingException
 
 logger = logging.getLogger()
 
@@ -15,24 +21,246 @@ class TrendingManagerMixin:
     min_count_to_keep = 10 * 1000
     min_score_to_keep = 0.5
 
+    trending_deflate_max_workers = 16
+    trending_throttling_backoff_seconds = 1
+    trending_throttling_error_codes = (
+        'ProvisionedThroughputExceededException',
+        'RequestLimitExceeded',
+        'ThrottlingException',
+    )
+
+    trending_snapshot_size = 1000
+    trending_snapshot_ttl = pendulum.duration(seconds=30)
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         if 'dynamo' in clients:
             self.trending_dynamo = TrendingDynamo(self.item_type, clients['dynamo'])
+        # map of item_id to pending (multiplier, now) score increments, applied by trending_flush()
+        self.trending_buffer = {}
+        # in-process copy of the published snapshot, a pair of (fetched_at, item_ids)
+        self.trending_snapshot_cache = None
+
+    def trending_buffer_score(self, item_id, multiplier=1, now=None):
+        """
+        Buffer a score increment for the item, to be applied on the next call to trending_flush().
+        Increments for the same item are combined: multipliers are summed and the latest `now` is kept.
+        """
+        now = now or pendulum.now('utc')
+        prev_multiplier, prev_now = self.trending_buffer.get(item_id, (0, now))
+        self.trending_buffer[item_id] = (prev_multiplier + multiplier, max(prev_now, now))
+
+    def trending_flush(self):
+        """
+        Apply all buffered score increments, with one combined increment per item.
+        Returns the number of items whose score was incremented.
+        """
+        buffer, self.trending_buffer = self.trending_buffer, {}
+        incremented_count = 0
+        for item_id, (multiplier, now) in buffer.items():
+            try:
+                incremented = self.trending_flush_item(item_id, multiplier, now=now)
+            except Exception as err:
+                logger.exception(f'Trending flush failed for item `{self.item_type}:{item_id}`: {err}')
+            else:
+                incremented_count += int(incremented)
+        return incremented_count
+
+    def trending_flush_item(self, item_id, multiplier, now=None):
+        "Return a boolean indicating if the score was incremented or not"
+        model = self.get_model(item_id)
+        if not model:
+            logger.warning(f'Cannot increment trending for DNE item `{self.item_type}:{item_id}`')
+            return False
+        return model.trending_increment_score(now=now, multiplier=multiplier)
 
-    def trending_deflate(self, now=None):
+    def trending_publish_snapshot(self, now=None):
         """
-        Iterate over all trending items and deflate them.
-        Returns a pair of integers: (total_items, deflated_items)
+        Publish the ids and scores of the top `trending_snapshot_size` items, highest score first,
+        for serving trending queries. Returns the number of items in the snapshot.
         """
         now = now or pendulum.now('utc')
-        # iterates from lowest score upward, deflate and count each one
-        total_count, deflated_count = 0, 0
-        for item in self.trending_dynamo.generate_items():
-            deflated = self.trending_deflate_item(item, now=now)
-            deflated_count += int(deflated)
-            total_count += 1
-        return total_count, deflated_count
+        item_ids, scores = self.trending_build_snapshot()
+        self.trending_dynamo.set_snapshot(item_ids, scores, now)
+        return len(item_ids)
+
+    def trending_build_snapshot(self):
+        "Returns a pair of lists: (item_ids, scores), highest score first"
+        item_ids, scores = [], []
+        trending_items = self.trending_dynamo.generate_top_items()
+        while len(item_ids) < self.trending_snapshot_size:
+            batch = list(itertools.islice(trending_items, 100))
+            if not batch:
+                break
+            batch_ids = [item['partitionKey'].split('/')[1] for item in batch]
+            viewable_ids = self.trending_filter_viewable(batch_ids)
+            for item_id, item in zip(batch_ids, batch):
+                if item_id in viewable_ids and len(item_ids) < self.trending_snapshot_size:
+                    item_ids.append(item_id)
+                    scores.append(item['gsiA4SortKey'])
+        return item_ids, scores
+
+    def trending_filter_viewable(self, item_ids):
+        "Returns the set of the given item ids, max 100, that may be shown in trending"
+        return set(item_ids)
+
+    def trending_get_snapshot(self, now=None):
+        """
+        The item ids of the latest published snapshot, highest score first. Served from an
+        in-process copy that is refreshed once older than `trending_snapshot_ttl`.
+        """
+        now = now or pendulum.now('utc')
+        if (
+            not self.trending_snapshot_cache
+            or self.trending_snapshot_cache[0] + self.trending_snapshot_ttl <= now
+        ):
+            snapshot = self.trending_dynamo.get_snapshot()
+            # nothing to serve until the first snapshot is published by the cron job
+            item_ids = snapshot['itemIds'] if snapshot else []
+            self.trending_snapshot_cache = (now, item_ids)
+        return self.trending_snapshot_cache[1]
+
+    def trending_get_page(self, limit=20, next_token=None, now=None):
+        "Returns a page of item ids from the snapshot, in the same format as DynamoClient.query()"
+        item_ids = self.trending_get_snapshot(now=now)
+        if next_token and not next_token.isdigit():
+            raise TrendingException(f'Invalid nextToken `{next_token}`')
+        start = int(next_token or 0)
+        end = start + limit
+        return {
+            'items': item_ids[start:end],
+            'nextToken': str(end) if end < len(item_ids) else None,
+        }
+
+    def trending_deflate(self, now=None, stop_at=None):
+        """
+        In one pass over all trending items, lowest score first, delete the tail of low-scoring
+        items and deflate the rest. Deletes and deflations are done concurrently, both conditional on
+        the item's score not having changed since it was read.
+
+        The index is not split into score-range or key-hash segments: only a single lowest-score-first
+        pass can tell which items make up the tail. The concurrency comes from within each page instead.
+
+        Progress is checkpointed after every page of items. A run that finds a checkpoint from
+        an incomplete run earlier the same day resumes from it, and a run that finds the job
+        already completed today is a no-op. If `stop_at` is provided and that time has been passed
+        after finishing a page, the run stops early.
+
+        Returns a tuple: (total_items, deflated_items, deleted_items, completed)
+        """
+        now = now or pendulum.now('utc')
+        checkpoint = self.trending_dynamo.get_deflation_checkpoint()
+        if checkpoint and checkpoint['deflationDate'] == str(now.date()):
+            if checkpoint['exclusiveStartKey'] is None:
+                logger.warning(f'Trending deflation for `{self.item_type}` already completed today')
+                return (int(checkpoint['totalCount']), 0, 0, True)
+            counts = [int(checkpoint[k]) for k in ('totalCount', 'deflatedCount', 'deletedCount', 'maxToDelete')]
+            total_count, deflated_count, deleted_count, max_to_delete = counts
+            exclusive_start_key = checkpoint['exclusiveStartKey']
+        else:
+            total_count, deflated_count, deleted_count = 0, 0, 0
+            max_to_delete = max(self.trending_dynamo.count_items() - self.min_count_to_keep, 0)
+            exclusive_start_key = None
+
+        max_workers = self.trending_deflate_max_workers
+        last_key = exclusive_start_key
+        for items, last_key in self.trending_dynamo.generate_item_pages(exclusive_start_key=exclusive_start_key):
+            to_deflate, to_delete = [], []
+            for item in items:
+                new_score = self.trending_get_deflated_score(item, now)
+                if deleted_count + len(to_delete) < max_to_delete and new_score < self.min_score_to_keep:
+                    to_delete.append(item)
+                else:
+                    to_deflate.append(item)
+
+            page_deleted_count, max_workers = self.trending_delete_items(to_delete, max_workers)
+            deleted_count += page_deleted_count
+            page_deflated_count, max_workers = self.trending_deflate_items(to_deflate, now, max_workers)
+            deflated_count += page_deflated_count
+            total_count += len(items)
+
+            self.trending_dynamo.set_deflation_checkpoint(
+                now.date(),
+                total_count,
+                deflated_count,
+                deleted_count,
+                max_to_delete,
+                exclusive_start_key=last_key,
+            )
+            with LogLevelContext(logger, logging.INFO):
+                logger.info(
+                    f'Trending `{self.item_type}` deflation progress: {total_count} processed, '
+                    + f'{deflated_count} deflated, {deleted_count} deleted, {max_workers} workers'
+                )
+            if last_key is not None and stop_at and pendulum.now('utc') >= stop_at:
+                break
+
+        return (total_count, deflated_count, deleted_count, last_key is None)
+
+    def trending_deflate_items(self, trending_items, now, max_workers):
+        """
+        Deflate the items concurrently, adapting the number of workers to throttling.
+        Returns a pair: (deflated_items, max_workers), the latter to be used for the next call.
+        """
+        return self.trending_apply_concurrently(
+            lambda item: self.trending_deflate_item(item, now=now), trending_items, max_workers
+        )
+
+    def trending_delete_items(self, trending_items, max_workers):
+        """
+        Delete the items concurrently, adapting the number of workers to throttling.
+        Returns a pair: (deleted_items, max_workers), the latter to be used for the next call.
+        """
+        return self.trending_apply_concurrently(self.trending_delete_tail_item, trending_items, max_workers)
+
+    def trending_apply_concurrently(self, func, trending_items, max_workers):
+        """
+        Call `func`, which returns a boolean, on each item concurrently, retrying throttled calls with
+        fewer workers. Returns a pair: (count of calls that returned True, max_workers).
+        """
+        true_count = 0
+        while trending_items:
+            throttled_items = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(func, item) for item in trending_items]
+            for item, future in zip(trending_items, futures):
+                try:
+                    true_count += int(future.result())
+                except botocore.exceptions.ClientError as err:
+                    if err.response['Error']['Code'] not in self.trending_throttling_error_codes:
+                        raise
+                    throttled_items.append(item)
+
+            if throttled_items:
+                # multiplicative decrease, and a pause to let the table recover
+                max_workers = max(max_workers // 2, 1)
+                logger.warning(f'Trending `{self.item_type}` throttled, retrying with {max_workers} workers')
+                time.sleep(self.trending_throttling_backoff_seconds)
+            else:
+                # additive increase
+                max_workers = min(max_workers + 1, self.trending_deflate_max_workers)
+            trending_items = throttled_items
+        return true_count, max_workers
+
+    def trending_get_deflated_score(self, trending_item, now):
+        "The score the item should have after deflation"
+        current_score = trending_item['gsiA4SortKey']
+        last_deflation_at = pendulum.parse(trending_item['lastDeflatedAt'])
+        days_since_last_deflation = (now - last_deflation_at.start_of('day')).days
+        if days_since_last_deflation < 1:
+            return current_score
+        return current_score / (self.score_inflation_per_day ** days_since_last_deflation)
+
+    def trending_delete_tail_item(self, trending_item):
+        "Return a boolean indicating if the item was deleted or not"
+        item_id = trending_item['partitionKey'].split('/')[1]
+        try:
+            self.trending_dynamo.delete(item_id, expected_score=trending_item['gsiA4SortKey'])
+        except TrendingDNEOrAttributeMismatch:
+            # race condition, the item must have received a boost in score
+            logging.warning(f'Lost race condition, not deleting trending for `{self.item_type}:{item_id}`')
+            return False
+        return True
 
     def trending_deflate_item(self, trending_item, now=None, retry_count=0):
         item_id = trending_item['partitionKey'].split('/')[1]
@@ -47,14 +275,12 @@ class TrendingManagerMixin:
             return False
 
         now = now or pendulum.now('utc')
-        last_deflation_at = pendulum.parse(trending_item['lastDeflatedAt'])
-        days_since_last_deflation = (now - last_deflation_at.start_of('day')).days
-        if days_since_last_deflation < 1:
+        new_score = self.trending_get_deflated_score(trending_item, now)
+        if new_score == current_score:
             logging.warning(f'Trending for item `{self.item_type}:{item_id}` has already been deflated today')
             return False
 
-        new_score = current_score / (self.score_inflation_per_day ** days_since_last_deflation)
-
+        last_deflation_at = pendulum.parse(trending_item['lastDeflatedAt'])
         try:
             self.trending_dynamo.deflate_score(item_id, current_score, new_score, last_deflation_at.date(), now)
         except TrendingDNEOrAttributeMismatch:
@@ -62,26 +288,3 @@ class TrendingManagerMixin:
             trending_item = self.trending_dynamo.get(item_id, strongly_consistent=True)
             return self.trending_deflate_item(trending_item, now=now, retry_count=retry_count + 1)
         return True
-
-    def trending_delete_tail(self, total_count):
-        max_to_delete = total_count - self.min_count_to_keep
-        if max_to_delete <= 0:
-            return 0
-
-        deleted = 0
-        for item in self.trending_dynamo.generate_items():
-            item_id = item['partitionKey'].split('/')[1]
-            current_score = item['gsiA4SortKey']
-            if current_score >= self.min_score_to_keep:
-                break
-            try:
-                self.trending_dynamo.delete(item_id, expected_score=current_score)
-            except TrendingDNEOrAttributeMismatch:
-                # race condition, the item must have recieved a boost in score
-                logging.warning(f'Lost race condition, not deleting trending for `{self.item_type}:{item_id}`')
-            else:
-                deleted += 1
-            if deleted >= max_to_delete:
-                break
-
-        return deleted
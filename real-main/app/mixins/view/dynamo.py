@@ -21,6 +21,14 @@ class ViewDynamo:
     def get_view(self, item_id, user_id, strongly_consistent=False):
         return self.client.get_item(self.pk(item_id, user_id), ConsistentRead=strongly_consistent)
 
+    def batch_get_views(self, item_ids, user_id):
+        "Order not maintained, views that do not exist are omitted"
+        return self.client.batch_get(self.pk(item_id, user_id) for item_id in item_ids)
+
+    def batch_get_views_by_item_and_user(self, item_user_ids):
+        "Given pairs of (item_id, user_id). Order not maintained, views that do not exist are omitted"
+        return self.client.batch_get(self.pk(item_id, user_id) for item_id, user_id in item_user_ids)
+
     def generate_views(self, item_id, pks_only=False):
         # no ordering guarantees
         pk = self.pk(item_id, None)
@@ -1,11 +1,16 @@
+import concurrent.futures
 import logging
 
 from .dynamo import ViewDynamo
+from .exceptions import ViewAlreadyExists
 
 logger = logging.getLogger()
 
 
 class ViewManagerMixin:
+
+    record_views_max_workers = 16
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         if 'dynamo' in clients:
@@ -14,6 +19,41 @@ class ViewManagerMixin:
     def record_views(self, item_ids, user_id, viewed_at=None):
         raise NotImplementedError  # subclasses must implement
 
+    def record_view_counts(self, view_counts, user_id, viewed_at):
+        """
+        Record views by one user of many items at once, given a map of item_id to view_count.
+        Existing view items are read in one batch up front and the writes are done concurrently.
+        Returns the set of item ids the user viewed for the first time.
+        """
+        existing_item_ids = {
+            item['partitionKey'].split('/')[1] for item in self.view_dynamo.batch_get_views(view_counts, user_id)
+        }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.record_views_max_workers) as executor:
+            futures = {
+                item_id: executor.submit(
+                    self.record_view_count_write,
+                    item_id,
+                    user_id,
+                    view_count,
+                    viewed_at,
+                    view_exists=item_id in existing_item_ids,
+                )
+                for item_id, view_count in view_counts.items()
+            }
+        return {item_id for item_id, future in futures.items() if future.result()}
+
+    def record_view_count_write(self, item_id, user_id, view_count, viewed_at, view_exists=False):
+        "Returns a boolean indicating if this was the user's first view of the item"
+        if not view_exists:
+            try:
+                self.view_dynamo.add_view(item_id, user_id, view_count, viewed_at)
+            except ViewAlreadyExists:
+                pass  # we lost a race condition to add the view, so still need to record our data
+            else:
+                return True
+        self.view_dynamo.increment_view_count(item_id, user_id, view_count, viewed_at)
+        return False
+
     def on_item_delete_delete_views(self, item_id, old_item):
         pk_generator = self.view_dynamo.generate_views(item_id, pks_only=True)
         self.view_dynamo.delete_views(pk_generator)
@@ -2,6 +2,8 @@ import math
 
 import PIL.Image
 
+GRID_WIDTH, GRID_HEIGHT = 3840, 2160
+
 
 def generate_basic_grid(pil_images):
     """
@@ -31,50 +33,60 @@ def generate_basic_grid(pil_images):
     return target_image
 
 
-def generate_zoomed_grid(pil_images):
-    """
-    Given a square number (4, 9 or 16) of image data buffers, generate an buffer with a
-    jpeg-encoded grid of those images.
+def get_cell_dimensions(image_count):
+    "The dimensions of each cell in a zoomed grid of `image_count` (4, 9 or 16) images"
+    assert image_count in (4, 9, 16), f'Unexpected number of inputs: `{image_count}`'
+    stride = int(math.sqrt(image_count))
+    return (GRID_WIDTH // stride, GRID_HEIGHT // stride)
 
-    Zoom in or out and crop each image as needed so that it fills its cell perfectly.
-    """
-    assert len(pil_images) in (4, 9, 16), f'Unexpected number of inputs: `{len(pil_images)}`'
 
-    output_width, output_height = 3840, 2160
-    stride = int(math.sqrt(len(pil_images)))
-    cell_width, cell_height = output_width // stride, output_height // stride
+def generate_zoomed_cell(image, cell_dimensions):
+    "Zoom in or out and crop the image as needed so that it fills a cell of the given dimensions perfectly"
+    cell_width, cell_height = cell_dimensions
+    image_width, image_height = image.size
 
-    # collect and resize (zoom in or out as needed so each image fills its cell)
-    images = []
-    for image in pil_images:
-        image_width, image_height = image.size
-
-        # comparing aspect ratios without rounding errors
-        if image_width * cell_height > image_height * cell_width:
-            # image is wider than cell
-            new_image_width = image_height * cell_width / cell_height
-            margin = (image_width - new_image_width) / 2
-            box = (margin, 0, image_width - margin, image_height)
-        elif image_width * cell_height < image_height * cell_width:
-            # image is taller than cell
-            new_image_height = image_width * cell_height / cell_width
-            margin = (image_height - new_image_height) / 2
-            box = (0, margin, image_width, image_height - margin)
-        else:
-            # aspect ratios equal
-            box = None
-
-        if image_width != cell_width or image_height != cell_height:
-            image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
-
-        images.append(image)
+    # comparing aspect ratios without rounding errors
+    if image_width * cell_height > image_height * cell_width:
+        # image is wider than cell
+        new_image_width = image_height * cell_width / cell_height
+        margin = (image_width - new_image_width) / 2
+        box = (margin, 0, image_width - margin, image_height)
+    elif image_width * cell_height < image_height * cell_width:
+        # image is taller than cell
+        new_image_height = image_width * cell_height / cell_width
+        margin = (image_height - new_image_height) / 2
+        box = (0, margin, image_width, image_height - margin)
+    else:
+        # aspect ratios equal
+        box = None
 
-    # paste those thumbs together as a grid
-    # Min size will be 4k since max_width and max_height come from 1080p thumbs
-    target_image = PIL.Image.new('RGB', (output_width, output_height))
+    if image_width != cell_width or image_height != cell_height:
+        image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
+    return image
+
+
+def generate_grid(cell_images):
+    """
+    Given a square number (4, 9 or 16) of images that have already been zoomed to fill
+    their cells with generate_zoomed_cell(), paste them together into a 4K grid.
+    """
+    cell_width, cell_height = get_cell_dimensions(len(cell_images))
+    stride = GRID_WIDTH // cell_width
+    target_image = PIL.Image.new('RGB', (GRID_WIDTH, GRID_HEIGHT))
     for row in range(0, stride):
         for column in range(0, stride):
-            image = images[row * stride + column]
-            loc = (column * cell_width, row * cell_height)
-            target_image.paste(image, loc)
+            image = cell_images[row * stride + column]
+            assert image.size == (cell_width, cell_height), f'Unexpected cell size: `{image.size}`'
+            target_image.paste(image, (column * cell_width, row * cell_height))
     return target_image
+
+
+def generate_zoomed_grid(pil_images):
+    """
+    Given a square number (4, 9 or 16) of image data buffers, generate an buffer with a
+    jpeg-encoded grid of those images.
+
+    Zoom in or out and crop each image as needed so that it fills its cell perfectly.
+    """
+    cell_dimensions = get_cell_dimensions(len(pil_images))
+    return generate_grid([generate_zoomed_cell(image, cell_dimensions) for image in pil_images])
@@ -10,6 +10,10 @@ logger = logging.getLogger()
 
 
 class AlbumDynamo:
+
+    # keep in sync with migrations.scheduling_0_0_shard_gsi_k1
+    delete_at_shard_count = 4
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
@@ -93,7 +97,13 @@ class AlbumDynamo:
         query_kwargs = {
             'Key': self.pk(album_id),
             'UpdateExpression': 'SET gsiK1PartitionKey = :pk, gsiK1SortKey = :sk',
-            'ExpressionAttributeValues': {':pk': 'album', ':sk': delete_at.to_iso8601_string(), ':zero': 0},
+            'ExpressionAttributeValues': {
+                ':pk': self.client.get_shard_partition_key(
+                    'album', f'album/{album_id}', self.delete_at_shard_count
+                ),
+                ':sk': delete_at.to_iso8601_string(),
+                ':zero': 0,
+            },
             'ConditionExpression': 'NOT postCount > :zero',
         }
         return self.client.update_item(
@@ -162,10 +172,15 @@ class AlbumDynamo:
         return self.client.generate_all_query(query_kwargs)
 
     def generate_keys_to_delete(self, cutoff_at):
-        query_kwargs = {
-            'KeyConditionExpression': 'gsiK1PartitionKey = :pk AND gsiK1SortKey < :sk_max',
-            'IndexName': 'GSI-K1',
-            'ExpressionAttributeValues': {':pk': 'album', ':sk_max': cutoff_at.to_iso8601_string()},
-            'ProjectionExpression': 'partitionKey, sortKey',
-        }
-        return self.client.generate_all_query(query_kwargs)
+        "Ordered by deleteAt"
+        query_kwargs_list = [
+            {
+                'KeyConditionExpression': 'gsiK1PartitionKey = :pk AND gsiK1SortKey < :sk_max',
+                'IndexName': 'GSI-K1',
+                'ExpressionAttributeValues': {':pk': pk, ':sk_max': cutoff_at.to_iso8601_string()},
+                'ProjectionExpression': 'partitionKey, sortKey, gsiK1SortKey',
+            }
+            for pk in self.client.get_shard_partition_keys('album', self.delete_at_shard_count)
+        ]
+        gen = self.client.generate_all_query_sharded(query_kwargs_list, 'gsiK1SortKey')
+        return ({'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']} for item in gen)
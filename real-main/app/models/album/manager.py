@@ -23,6 +23,8 @@ class AlbumManager:
         self.clients = clients
         if 'dynamo' in clients:
             self.dynamo = AlbumDynamo(clients['dynamo'])
+        # map of album_id to latest album item, for albums whose art is to be updated by art_flush()
+        self.art_buffer = {}
 
     def get_album(self, album_id):
         album_item = self.dynamo.get_album(album_id)
@@ -66,8 +68,21 @@ class AlbumManager:
             self.dynamo.clear_delete_at(album_id)
 
     def on_album_posts_last_updated_at_change_update_art_if_needed(self, album_id, new_item, old_item=None):
-        album = self.init_album(new_item)
-        album.update_art_if_needed()
+        # buffered so that rapid successive edits to an album in one stream batch result in a single update
+        self.art_buffer[album_id] = new_item
+
+    def art_flush(self):
+        """
+        Update the art of all albums with buffered changes, once per album.
+        Returns the number of albums whose art was checked.
+        """
+        buffer, self.art_buffer = self.art_buffer, {}
+        for album_id, album_item in buffer.items():
+            try:
+                self.init_album(album_item).update_art_if_needed()
+            except Exception as err:
+                logger.exception(f'Art update failed for album `{album_id}`: {err}')
+        return len(buffer)
 
     def on_post_album_change_update_counts_and_timestamps(self, post_id, new_item=None, old_item=None):
         new_album_id = (new_item or {}).get('albumId')
@@ -92,3 +107,15 @@ class AlbumManager:
                 self.dynamo.increment_post_count(new_album_id, now=now)
             if old_album_rank != -1:
                 self.dynamo.decrement_post_count(old_album_id, now=now)
+
+    def on_post_album_change_delete_art_tiles(self, post_id, new_item=None, old_item=None):
+        new_album_id = (new_item or {}).get('albumId')
+        old_album_id = (old_item or {}).get('albumId')
+        # all non-completed posts are given rank of -1
+        new_album_rank = (new_item or {}).get('gsiK3SortKey', -1)
+        if not old_album_id or (new_album_id == old_album_id and new_album_rank != -1):
+            return
+
+        # the post has left the album's art grid, so its cached tiles will never be used again
+        path_prefix = Album.get_art_tiles_path_prefix(old_item['postedByUserId'], old_album_id, post_id)
+        self.clients['s3_uploads'].delete_objects_with_prefix(path_prefix)
@@ -1,12 +1,12 @@
+import concurrent.futures
 import hashlib
 import io
 import itertools
 import logging
 import os
 
-import PIL.Image
-
-from app.utils import image_size
+from app.models.post.enums import PostType
+from app.utils import image_size, thumbnails
 
 from . import art
 from .exceptions import AlbumException
@@ -15,10 +15,15 @@ logger = logging.getLogger()
 
 CLOUDFRONT_FRONTEND_RESOURCES_DOMAIN = os.environ.get('CLOUDFRONT_FRONTEND_RESOURCES_DOMAIN')
 
+ART_TILES_DIR = 'tiles'
+
 
 class Album:
 
     jpeg_content_type = 'image/jpeg'
+    art_tiles_max_workers = 16
+
+    prefetched_thumbnail_sizes = image_size.PREFETCHED_THUMBNAILS
 
     def __init__(
         self,
@@ -92,6 +97,15 @@ class Album:
             return None
         return '/'.join([self.get_art_image_path_prefix(), art_hash, size.filename])
 
+    @staticmethod
+    def get_art_tiles_path_prefix(user_id, album_id, post_id):
+        "Prefix of the paths of all cached art tiles of the post in the album, of any size"
+        return '/'.join([user_id, 'album', album_id, ART_TILES_DIR, post_id, ''])
+
+    def get_art_tile_path(self, post_id, cell_dimensions):
+        width, height = cell_dimensions
+        return self.get_art_tiles_path_prefix(self.user_id, self.id, post_id) + f'{width}x{height}.jpg'
+
     def get_post_ids_for_art(self):
         # we only want a square number of post ids, max of 4x4
         post_ids_gen = self.post_manager.dynamo.generate_post_ids_in_album(self.id, completed=True)
@@ -120,21 +134,24 @@ class Album:
         if new_art_hash == old_art_hash:
             return self  # no changes
 
-        posts = [self.post_manager.get_post(post_id) for post_id in post_ids]
+        posts_by_id = {post.id: post for post in self.post_manager.batch_get_posts(post_ids)}
+        posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
         if len(posts) == 0:
             new_native_image = None
         elif len(posts) == 1:
-            new_native_image = posts[0].k4_jpeg_cache.readonly_image
+            new_native_image = self.get_art_native_image(posts[0])
         else:
-            images = [post.p1080_jpeg_cache.readonly_image for post in posts]
-            new_native_image = art.generate_zoomed_grid(images)
+            cell_dimensions = art.get_cell_dimensions(len(posts))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.art_tiles_max_workers) as executor:
+                futures = [executor.submit(self.get_art_tile, post, cell_dimensions) for post in posts]
+            new_native_image = art.generate_grid([future.result() for future in futures])
 
         if new_native_image:
             # convert to jpeg
             buf_out = io.BytesIO()
             new_native_image.save(buf_out, format='JPEG', quality=100)
             buf_out.seek(0)
-            self.save_art_images(new_art_hash, buf_out)
+            self.save_art_images(new_art_hash, buf_out, native_image=new_native_image)
 
         self.item = self.dynamo.set_album_art_hash(self.id, new_art_hash)
 
@@ -143,24 +160,75 @@ class Album:
 
         return self
 
+    def get_art_native_image(self, post):
+        "For art made of a single post, the post's image at 4K"
+        if post.type == PostType.TEXT_ONLY or image_size.K4 in post.prefetched_thumbnail_sizes:
+            return post.k4_jpeg_cache.readonly_image
+        # the post's 4K thumbnail is rendered on demand, so may not exist
+        max_dimensions = image_size.K4.max_dimensions
+        return thumbnails.resize_to_fit(post.native_jpeg_cache.get_readonly_image(max_dimensions), max_dimensions)
+
+    def get_art_tile(self, post, cell_dimensions):
+        """
+        The post's image zoomed and cropped to fill a cell of the art grid. Tiles are cached in S3 per
+        (post, cell dimensions) until the post leaves the album or the album is deleted, so a post that
+        stays in the grid is only downloaded and resampled once. Text-only posts are rendered locally and
+        may have their text edited, so their tiles are not cached.
+        """
+        if post.type == PostType.TEXT_ONLY:
+            return art.generate_zoomed_cell(post.p1080_jpeg_cache.readonly_image, cell_dimensions)
+
+        path = self.get_art_tile_path(post.id, cell_dimensions)
+        try:
+            fh = self.s3_uploads_client.get_object_data_stream(path)
+        except self.s3_uploads_client.exceptions.NoSuchKey:
+            pass
+        else:
+            with fh:
+                tile, _ = thumbnails.open_jpeg(io.BytesIO(fh.read()))
+            if tile.size == tuple(cell_dimensions):
+                return tile
+            logger.warning(f'Album `{self.id}` art tile at `{path}` has wrong size `{tile.size}`, regenerating')
+
+        tile = art.generate_zoomed_cell(post.p1080_jpeg_cache.readonly_image, cell_dimensions)
+        in_mem_file = io.BytesIO()
+        tile.save(in_mem_file, format='JPEG', quality=100)
+        self.s3_uploads_client.put_object(path, in_mem_file.getvalue(), self.jpeg_content_type)
+        return tile
+
     def delete_art_images(self, art_hash):
         # remove the images from s3
-        for size in image_size.JPEGS:
-            path = self.get_art_image_path(size, art_hash=art_hash)
-            self.s3_uploads_client.delete_object(path)
-
-    def save_art_images(self, art_hash, native_image_buf):
-        # save the native size to S3
-        path = self.get_art_image_path(image_size.NATIVE, art_hash=art_hash)
-        self.s3_uploads_client.put_object(path, native_image_buf.read(), self.jpeg_content_type)
-
-        # generate and save thumbnails
-        native_image_buf.seek(0)
-        image = PIL.Image.open(native_image_buf)
-        for size in image_size.THUMBNAILS:  # ordered by decreasing size
-            image.thumbnail(size.max_dimensions, resample=PIL.Image.LANCZOS)
-            in_mem_file = io.BytesIO()
-            image.save(in_mem_file, format='JPEG', quality=100, icc_profile=image.info.get('icc_profile'))
-            in_mem_file.seek(0)
-            path = self.get_art_image_path(size, art_hash=art_hash)
-            self.s3_uploads_client.put_object(path, in_mem_file.read(), self.jpeg_content_type)
+        paths = [self.get_art_image_path(size, art_hash=art_hash) for size in image_size.JPEGS]
+        self.s3_uploads_client.delete_objects(paths)
+
+    def save_art_images(self, art_hash, native_image_buf, native_image=None):
+        """
+        Pass `native_image` if the decoded native image is already at hand, to avoid decoding it again.
+        Each image is encoded and uploaded on its own thread while the next thumbnail is generated.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(image_size.JPEGS)) as executor:
+            # save the native size to S3
+            path = self.get_art_image_path(image_size.NATIVE, art_hash=art_hash)
+            futures = [
+                executor.submit(
+                    self.s3_uploads_client.put_object, path, native_image_buf.getvalue(), self.jpeg_content_type
+                )
+            ]
+
+            # generate and save thumbnails
+            if native_image is None:
+                native_image, _ = thumbnails.open_jpeg(
+                    io.BytesIO(native_image_buf.getvalue()), max_dimensions=image_size.K4.max_dimensions
+                )
+            max_dimensions_list = [size.max_dimensions for size in self.prefetched_thumbnail_sizes]
+            pyramid = thumbnails.generate_thumbnails(native_image, max_dimensions_list)
+            for size, image in zip(self.prefetched_thumbnail_sizes, pyramid):  # ordered by decreasing size
+                futures.append(executor.submit(self.save_art_image, art_hash, size, image))
+        for future in futures:
+            future.result()
+
+    def save_art_image(self, art_hash, size, image):
+        in_mem_file = io.BytesIO()
+        image.save(in_mem_file, format='JPEG', quality=100, icc_profile=image.info.get('icc_profile'))
+        path = self.get_art_image_path(size, art_hash=art_hash)
+        self.s3_uploads_client.put_object(path, in_mem_file.getvalue(), self.jpeg_content_type)
@@ -8,6 +8,10 @@ logger = logging.getLogger()
 
 
 class AppStoreReceiptDynamo:
+
+    # keep in sync with migrations.scheduling_0_0_shard_gsi_k1
+    verify_at_shard_count = 4
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
@@ -53,7 +57,9 @@ class AppStoreReceiptDynamo:
         }
         if next_at:
             query_kwargs['UpdateExpression'] += ', gsiK1PartitionKey = :pk, gsiK1SortKey = :sk'
-            query_kwargs['ExpressionAttributeValues'][':pk'] = 'appStoreReceipt'
+            query_kwargs['ExpressionAttributeValues'][':pk'] = self.client.get_shard_partition_key(
+                'appStoreReceipt', key['partitionKey'], self.verify_at_shard_count
+            )
             query_kwargs['ExpressionAttributeValues'][':sk'] = next_at.to_iso8601_string()
         if first:
             query_kwargs['UpdateExpression'] += ', #vafa = :at'
@@ -63,14 +69,19 @@ class AppStoreReceiptDynamo:
         )
 
     def generate_keys_to_verify(self, now=None):
+        "Ordered by next verification attempt"
         now = now or pendulum.now('utc')
-        query_kwargs = {
-            'KeyConditionExpression': 'gsiK1PartitionKey = :pk AND gsiK1SortKey <= :sk_max',
-            'ExpressionAttributeValues': {':pk': 'appStoreReceipt', ':sk_max': now.to_iso8601_string()},
-            'ProjectionExpression': 'partitionKey, sortKey',
-            'IndexName': 'GSI-K1',
-        }
-        return self.client.generate_all_query(query_kwargs)
+        query_kwargs_list = [
+            {
+                'KeyConditionExpression': 'gsiK1PartitionKey = :pk AND gsiK1SortKey <= :sk_max',
+                'ExpressionAttributeValues': {':pk': pk, ':sk_max': now.to_iso8601_string()},
+                'ProjectionExpression': 'partitionKey, sortKey, gsiK1SortKey',
+                'IndexName': 'GSI-K1',
+            }
+            for pk in self.client.get_shard_partition_keys('appStoreReceipt', self.verify_at_shard_count)
+        ]
+        gen = self.client.generate_all_query_sharded(query_kwargs_list, 'gsiK1SortKey')
+        return ({'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']} for item in gen)
 
     def generate_keys_by_user(self, user_id):
         query_kwargs = {
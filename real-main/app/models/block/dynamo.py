@@ -18,6 +18,10 @@ class BlockDynamo:
     def get_block(self, blocker_user_id, blocked_user_id):
         return self.client.get_item(self.pk(blocker_user_id, blocked_user_id))
 
+    def batch_get_blocks(self, blocker_blocked_user_ids):
+        "Get the blocks for the (blocker_user_id, blocked_user_id) pairs in batches. Blocks that DNE are omitted."
+        return self.client.batch_get(self.pk(*user_ids) for user_ids in blocker_blocked_user_ids)
+
     def add_block(self, blocker_user_id, blocked_user_id, now=None):
         now = now or pendulum.now('utc')
         blocked_at_str = now.to_iso8601_string()
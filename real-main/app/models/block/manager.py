@@ -31,6 +31,25 @@ class BlockManager:
         block_item = self.dynamo.get_block(blocker_user_id, blocked_user_id)
         return BlockStatus.BLOCKING if block_item else BlockStatus.NOT_BLOCKING
 
+    def get_block_statuses(self, blocker_blocked_user_ids):
+        """
+        Same as get_block_status(), but for many (blocker_user_id, blocked_user_id) pairs at once,
+        with the block items read in batches. Returns a map of pair to block status.
+        """
+        pairs = set(blocker_blocked_user_ids)
+        blocked_pairs = {
+            (item['blockerUserId'], item['blockedUserId'])
+            for item in self.dynamo.batch_get_blocks(pair for pair in pairs if pair[0] != pair[1])
+        }
+        return {
+            pair: BlockStatus.SELF
+            if pair[0] == pair[1]
+            else BlockStatus.BLOCKING
+            if pair in blocked_pairs
+            else BlockStatus.NOT_BLOCKING
+            for pair in pairs
+        }
+
     def block(self, blocker_user, blocked_user):
         block_item = self.dynamo.add_block(blocker_user.id, blocked_user.id)
 
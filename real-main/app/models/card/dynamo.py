@@ -8,6 +8,10 @@ logger = logging.getLogger()
 
 
 class CardDynamo:
+
+    # keep in sync with migrations.scheduling_0_0_shard_gsi_k1
+    notify_user_at_shard_count = 8
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
@@ -20,6 +24,10 @@ class CardDynamo:
     def get_card(self, card_id, strongly_consistent=False):
         return self.client.get_item(self.pk(card_id), ConsistentRead=strongly_consistent)
 
+    def batch_get_cards(self, card_ids):
+        "Order not maintained, cards that do not exist are omitted"
+        return self.client.batch_get(self.pk(card_id) for card_id in card_ids)
+
     def add_card(
         self,
         card_id,
@@ -46,7 +54,9 @@ class CardDynamo:
         if sub_title:
             query_kwargs['Item']['subTitle'] = sub_title
         if notify_user_at:
-            query_kwargs['Item']['gsiK1PartitionKey'] = 'card'
+            query_kwargs['Item']['gsiK1PartitionKey'] = self.client.get_shard_partition_key(
+                'card', f'card/{card_id}', self.notify_user_at_shard_count
+            )
             query_kwargs['Item']['gsiK1SortKey'] = notify_user_at.to_iso8601_string() + '/' + user_id
         if post_id:
             query_kwargs['Item']['postId'] = post_id
@@ -72,12 +82,49 @@ class CardDynamo:
     def delete_card(self, card_id):
         return self.client.delete_item(self.pk(card_id))
 
-    def clear_notify_user_at(self, card_id):
+    def clear_notify_user_at(self, card_id, fail_soft=False):
+        "Set `fail_soft` to log a warning, rather than raise an exception, if the card does not exist"
         query_kwargs = {
             'Key': self.pk(card_id),
-            'UpdateExpression': 'REMOVE gsiK1PartitionKey, gsiK1SortKey',
+            'UpdateExpression': 'REMOVE gsiK1PartitionKey, gsiK1SortKey, notifyUserAttemptCount',
         }
-        return self.client.update_item(query_kwargs)
+        failure_warning = f'Failed to clear notifyUserAt for DNE card `{card_id}`' if fail_soft else None
+        return self.client.update_item(query_kwargs, failure_warning=failure_warning)
+
+    def retry_notify_user_at(self, card_id, user_id, notify_user_at):
+        """
+        Push back the notifyUserAt of a card whose notification failed, counting the failed attempt.
+        Best effort, logs WARNING on failure, which includes the notifyUserAt having been cleared since.
+        """
+        query_kwargs = {
+            'Key': self.pk(card_id),
+            'UpdateExpression': 'SET gsiK1SortKey = :sk ADD notifyUserAttemptCount :one',
+            'ConditionExpression': 'attribute_exists(gsiK1PartitionKey)',
+            'ExpressionAttributeValues': {':sk': notify_user_at.to_iso8601_string() + '/' + user_id, ':one': 1},
+        }
+        failure_warning = f'Failed to retry notifyUserAt for card `{card_id}`'
+        return self.client.update_item(query_kwargs, failure_warning=failure_warning)
+
+    def notify_users_checkpoint_pk(self):
+        return {
+            'partitionKey': 'cardNotifyUsers/checkpoint',
+            'sortKey': '-',
+        }
+
+    def get_notify_users_checkpoint(self):
+        return self.client.get_item(self.notify_users_checkpoint_pk(), ConsistentRead=True)
+
+    def set_notify_users_checkpoint(self, exclusive_start_keys, now):
+        """
+        Record how far through the cards due for notification the last run got, with one key per shard.
+        An `exclusive_start_keys` of None indicates the run got through all of them.
+        """
+        attributes = {
+            'schemaVersion': 1,
+            'exclusiveStartKeys': exclusive_start_keys,
+            'updatedAt': now.to_iso8601_string(),
+        }
+        return self.client.set_attributes(self.notify_users_checkpoint_pk(), **attributes)
 
     def generate_cards_by_user(self, user_id, pks_only=False):
         query_kwargs = {
@@ -112,15 +159,36 @@ class CardDynamo:
         return self.client.generate_all_query(query_kwargs)
 
     def generate_card_ids_by_notify_user_at(self, cutoff_at, only_user_ids=None):
-        query_kwargs = {
-            'KeyConditionExpression': 'gsiK1PartitionKey = :c AND gsiK1SortKey < :at_trailing',
-            'ExpressionAttributeValues': {':c': 'card', ':at_trailing': cutoff_at.to_iso8601_string() + '/~'},
-            'IndexName': 'GSI-K1',
-        }
-        gen = self.client.generate_all_query(query_kwargs)
+        "Ordered by notifyUserAt"
+        gen = self.client.generate_all_query_sharded(
+            self.notify_user_at_query_kwargs_list(cutoff_at), 'gsiK1SortKey'
+        )
         # Note dynamo does not let you apply a FilterExpression to the index/key used in a query
         # 'Filter Expression can only contain non-primary key attributes'
         if only_user_ids:
             gen = (item for item in gen if item['gsiK1SortKey'].split('/')[-1] in only_user_ids)
         gen = (item['partitionKey'].split('/')[1] for item in gen)
         return gen
+
+    def generate_card_key_pages_by_notify_user_at(self, cutoff_at, page_size=100, exclusive_start_keys=None):
+        """
+        Yields pairs of (items, last_evaluated_keys), the items being keys only and ordered by notifyUserAt
+        within each page. See DynamoClient.generate_all_query_pages_sharded().
+        """
+        return self.client.generate_all_query_pages_sharded(
+            self.notify_user_at_query_kwargs_list(cutoff_at),
+            'gsiK1SortKey',
+            page_size,
+            exclusive_start_keys=exclusive_start_keys,
+        )
+
+    def notify_user_at_query_kwargs_list(self, cutoff_at):
+        "One query per shard"
+        return [
+            {
+                'KeyConditionExpression': 'gsiK1PartitionKey = :pk AND gsiK1SortKey < :at_trailing',
+                'ExpressionAttributeValues': {':pk': pk, ':at_trailing': cutoff_at.to_iso8601_string() + '/~'},
+                'IndexName': 'GSI-K1',
+            }
+            for pk in self.client.get_shard_partition_keys('card', self.notify_user_at_shard_count)
+        ]
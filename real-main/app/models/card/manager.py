@@ -1,4 +1,7 @@
+import collections
+import concurrent.futures
 import logging
+import time
 from functools import partialmethod
 
 import pendulum
@@ -16,6 +19,15 @@ logger = logging.getLogger()
 
 
 class CardManager:
+
+    notify_users_page_size = 100
+    notify_users_max_users_per_send = 100  # max allowed by pinpoint
+    notify_users_max_workers = 10
+    notify_users_max_requests_per_second = 50
+    # cards whose notification failed are retried after a backoff that doubles with each failed attempt
+    notify_users_retry_backoff = pendulum.duration(minutes=15)
+    notify_users_max_attempts = 5
+
     def __init__(self, clients, managers=None):
         managers = managers or {}
         managers['card'] = self
@@ -79,10 +91,19 @@ class CardManager:
         key_generator = self.dynamo.generate_card_keys_by_comment(comment_id)
         self.dynamo.client.batch_delete_items(key_generator)
 
-    def notify_users(self, now=None, only_usernames=None):
+    def notify_users(self, now=None, only_usernames=None, stop_at=None):
         """
         Send out push notifications to all users for cards as needed.
         Use `only_usernames` if you don't want to send notifcations to all users.
+
+        Due cards are processed a page at a time: the page of cards is read in one batch, their
+        notifications are sent with as few requests as possible, and then their notifyUserAt is cleared.
+        Cards in failed requests have their notifyUserAt pushed back instead, up to a maximum number of attempts.
+        Progress is checkpointed after every page. A run resumes from where the last run left off,
+        which is the start if the last run got through all due cards. If `stop_at` is provided and
+        that time has been passed after finishing a page, the run stops early.
+
+        Returns a pair: (total_count, success_count)
         """
         # determine which users we should be sending notifcations to, if we're only doing some
         if only_usernames is None:
@@ -91,18 +112,108 @@ class CardManager:
             return 0, 0
         else:
             only_users = [self.user_manager.get_user_by_username(username) for username in only_usernames]
-            only_user_ids = [user.id for user in only_users if user]
+            only_user_ids = {user.id for user in only_users if user}
 
         # send on notifcations for cards for those users
-        now = pendulum.now('utc')
+        now = now or pendulum.now('utc')
+        checkpoint = self.dynamo.get_notify_users_checkpoint()
+        exclusive_start_keys = checkpoint.get('exclusiveStartKeys') if checkpoint else None
+        if exclusive_start_keys and len(exclusive_start_keys) != self.dynamo.notify_user_at_shard_count:
+            logger.warning('Ignoring card notify users checkpoint with the wrong number of shards')
+            exclusive_start_keys = None
         total_count, success_count = 0, 0
-        for card_id in self.dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=only_user_ids):
-            card = self.get_card(card_id)
-            success_count += card.notify_user()
-            total_count += 1
-            card.clear_notify_user_at()
+        pages = self.dynamo.generate_card_key_pages_by_notify_user_at(
+            now, page_size=self.notify_users_page_size, exclusive_start_keys=exclusive_start_keys
+        )
+        for key_items, last_keys in pages:
+            if only_user_ids is not None:
+                key_items = [item for item in key_items if item['gsiK1SortKey'].split('/')[-1] in only_user_ids]
+            card_ids = [item['partitionKey'].split('/')[1] for item in key_items]
+            cards = [self.init_card(item) for item in self.dynamo.batch_get_cards(card_ids)] if card_ids else []
+            sent_count, failed_cards = self.send_card_notifications(cards)
+            success_count += sent_count
+            total_count += len(cards)
+            self.clear_cards_notify_user_at([card for card in cards if card not in failed_cards])
+            self.retry_cards_notify_user_at(failed_cards, now)
+            done = all(last_key is None for last_key in last_keys)
+            if not done or exclusive_start_keys is not None:
+                self.dynamo.set_notify_users_checkpoint(None if done else last_keys, now)
+            if not done and stop_at and pendulum.now('utc') >= stop_at:
+                break
         return total_count, success_count
 
+    def send_card_notifications(self, cards):
+        """
+        Send the push notifications for the cards. Cards with identical notifications are sent in shared
+        requests, which are made concurrently up to a maximum rate.
+
+        Returns a pair: (success_count, failed_cards), where failed_cards are those in requests that failed.
+        """
+        user_ids_by_message = collections.defaultdict(set)
+        for card in cards:
+            user_ids_by_message[(card.action, card.title, card.sub_title)].add(card.user_id)
+
+        max_users = self.notify_users_max_users_per_send
+        requests = [
+            (message, user_ids[i : i + max_users])
+            for message, user_ids in ((k, sorted(v)) for k, v in user_ids_by_message.items())
+            for i in range(0, len(user_ids), max_users)
+        ]
+        min_interval = 1 / self.notify_users_max_requests_per_second
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.notify_users_max_workers) as executor:
+            futures, next_at = [], time.monotonic()
+            for (action, title, sub_title), user_ids in requests:
+                time.sleep(max(next_at - time.monotonic(), 0))
+                next_at = time.monotonic() + min_interval
+                futures.append(
+                    executor.submit(self.pinpoint_client.send_users_apns, user_ids, action, title, body=sub_title)
+                )
+
+        sent, failed = set(), set()
+        for (message, user_ids), future in zip(requests, futures):
+            try:
+                sent.update((*message, user_id) for user_id in future.result())
+            except Exception as err:
+                logger.exception(f'Failed to send notifications to users `{user_ids}`: {err}')
+                failed.update((*message, user_id) for user_id in user_ids)
+        keys = [(card.action, card.title, card.sub_title, card.user_id) for card in cards]
+        success_count = sum(key in sent for key in keys)
+        failed_cards = [card for card, key in zip(cards, keys) if key in failed]
+        return success_count, failed_cards
+
+    def clear_cards_notify_user_at(self, cards):
+        "Clear the notifyUserAt of the cards, concurrently"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.notify_users_max_workers) as executor:
+            futures = [
+                executor.submit(self.dynamo.clear_notify_user_at, card.id, fail_soft=True) for card in cards
+            ]
+        for future in futures:
+            future.result()
+
+    def retry_cards_notify_user_at(self, cards, now):
+        """
+        Push back the notifyUserAt of the cards, whose notifications failed, by an exponential backoff.
+        Cards that have used up their attempts have their notifyUserAt cleared instead. Done concurrently.
+        """
+        retries, give_ups = [], []
+        for card in cards:
+            attempt_count = int(card.item.get('notifyUserAttemptCount', 0)) + 1
+            if attempt_count >= self.notify_users_max_attempts:
+                logger.warning(f'Giving up on notifying user of card `{card.id}` after {attempt_count} attempts')
+                give_ups.append(card)
+            else:
+                retries.append((card, now + self.notify_users_retry_backoff * 2 ** (attempt_count - 1)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.notify_users_max_workers) as executor:
+            futures = [
+                executor.submit(self.dynamo.retry_notify_user_at, card.id, card.user_id, retry_at)
+                for card, retry_at in retries
+            ]
+            futures += [
+                executor.submit(self.dynamo.clear_notify_user_at, card.id, fail_soft=True) for card in give_ups
+            ]
+        for future in futures:
+            future.result()
+
     def on_card_add(self, card_id, new_item):
         self.init_card(new_item).trigger_notification(CardNotificationType.ADDED)
 
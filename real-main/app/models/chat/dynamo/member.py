@@ -54,8 +54,12 @@ class ChatMemberDynamo:
     def delete(self, chat_id, user_id):
         return self.client.delete_item(self.pk(chat_id, user_id))
 
-    def update_last_message_activity_at(self, chat_id, user_id, now):
-        "Best effort to update last message activity at. Logs WARNING on failure."
+    def update_last_message_activity_at(self, chat_id, user_id, now, increment_messages_unviewed_count=False):
+        """
+        Best effort to update last message activity at, and optionally increment the unviewed messages count,
+        in one write. If last message activity at is already past `now` only the increment, if any,
+        is written. Logs WARNING on failure to update last message activity at.
+        """
         now_str = now.to_iso8601_string()
         query_kwargs = {
             'Key': self.pk(chat_id, user_id),
@@ -63,14 +67,20 @@ class ChatMemberDynamo:
             'ExpressionAttributeValues': {':gsik2sk': 'chat/' + now_str},
             'ConditionExpression': 'attribute_exists(partitionKey) AND NOT :gsik2sk < gsiK2SortKey',
         }
+        if increment_messages_unviewed_count:
+            query_kwargs['UpdateExpression'] += ' ADD messagesUnviewedCount :one'
+            query_kwargs['ExpressionAttributeValues'][':one'] = 1
         msg = f'Failed to update last message activity for chat `{chat_id}` and member `{user_id}` to `{now_str}`'
-        return self.client.update_item(query_kwargs, failure_warning=msg)
+        item = self.client.update_item(query_kwargs, failure_warning=msg)
+        if item is None and increment_messages_unviewed_count:
+            item = self.increment_messages_unviewed_count(chat_id, user_id)
+        return item
 
     def increment_messages_unviewed_count(self, chat_id, user_id):
         return self.client.increment_count(self.pk(chat_id, user_id), 'messagesUnviewedCount')
 
-    def decrement_messages_unviewed_count(self, chat_id, user_id):
-        return self.client.decrement_count(self.pk(chat_id, user_id), 'messagesUnviewedCount')
+    def decrement_messages_unviewed_count(self, chat_id, user_id, count=1):
+        return self.client.decrement_count(self.pk(chat_id, user_id), 'messagesUnviewedCount', count=count)
 
     def clear_messages_unviewed_count(self, chat_id, user_id):
         query_kwargs = {
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import logging
 
 import pendulum
@@ -20,6 +21,8 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
 
     item_type = 'chat'
 
+    member_update_max_workers = 16
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         managers = managers or {}
@@ -34,6 +37,8 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         if 'dynamo' in clients:
             self.dynamo = ChatDynamo(clients['dynamo'])
             self.member_dynamo = ChatMemberDynamo(clients['dynamo'])
+        # map of chat_id to (user_id, created_at) of its deleted messages, applied by deleted_messages_flush()
+        self.deleted_messages_buffer = collections.defaultdict(list)
 
     def get_model(self, item_id, strongly_consistent=False):
         return self.get_chat(item_id, strongly_consistent=strongly_consistent)
@@ -138,32 +143,84 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         self.dynamo.update_last_message_activity_at(message.chat_id, message.created_at)
         self.dynamo.increment_messages_count(message.chat_id)
 
-        # for each memeber of the chat
+        # for each memeber of the chat, in one write per member
         #   - update the last message activity timestamp (controls chat ordering)
         #   - for everyone except the author, increment their 'messagesUnviewedCount'
-        for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id):
-            self.member_dynamo.update_last_message_activity_at(message.chat_id, user_id, message.created_at)
-            if user_id != message.user_id:
-                # Note that dynamo has no support for batch updates.
-                self.member_dynamo.increment_messages_unviewed_count(message.chat_id, user_id)
-                # TODO
-                # we can be in a state where the user manually dismissed a card, and this view does not
-                # change the user's overall count of chats with unread messages, but should still create a card
+        # Note that dynamo has no support for batch updates, so the writes are done concurrently.
+        # TODO
+        # we can be in a state where the user manually dismissed a card, and this view does not
+        # change the user's overall count of chats with unread messages, but should still create a card
+        user_ids = list(self.member_dynamo.generate_user_ids_by_chat(message.chat_id))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.member_update_max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.member_dynamo.update_last_message_activity_at,
+                    message.chat_id,
+                    user_id,
+                    message.created_at,
+                    increment_messages_unviewed_count=user_id != message.user_id,
+                )
+                for user_id in user_ids
+            ]
+        for future in futures:
+            future.result()
 
     def on_chat_message_delete(self, message_id, old_item):
         message = self.chat_message_manager.init_chat_message(old_item)
         self.dynamo.decrement_messages_count(message.chat_id)
 
-        # for each memeber of the chat other than the author
-        #   - delete any view record that exists directly on the message
-        #   - determine if the message had status 'unviewed', and if so, then decrement the unviewed message counter
-        for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id):
-            if user_id != message.user_id:
-                chat_view_item = self.view_dynamo.get_view(message.chat_id, user_id)
-                chat_last_viewed_at = pendulum.parse(chat_view_item['lastViewedAt']) if chat_view_item else None
-                if not (chat_last_viewed_at and chat_last_viewed_at > message.created_at):
-                    # Note that dynamo has no support for batch updates.
-                    self.member_dynamo.decrement_messages_unviewed_count(message.chat_id, user_id)
+        # whether the message was unviewed by each member depends on their view of the chat, which is
+        # read once for all the messages of the chat deleted in the stream batch by deleted_messages_flush()
+        self.deleted_messages_buffer[message.chat_id].append((message.user_id, message.created_at))
+
+    def deleted_messages_flush(self):
+        """
+        For each chat with buffered message deletes, decrement each member's unviewed message count by
+        the number of those messages, not by the member, that the member had not viewed. The members'
+        views of the chat are read in one batch, and the decrements are applied concurrently.
+        Returns the number of member counts decremented.
+        """
+        buffer, self.deleted_messages_buffer = self.deleted_messages_buffer, collections.defaultdict(list)
+        decrements = {}
+        for chat_id, messages in buffer.items():
+            try:
+                user_ids = list(self.member_dynamo.generate_user_ids_by_chat(chat_id))
+                view_items = self.view_dynamo.batch_get_views_by_item_and_user(
+                    (chat_id, user_id) for user_id in user_ids
+                )
+            except Exception as err:
+                logger.exception(f'Unviewed count decrements failed for chat `{chat_id}`: {err}')
+                continue
+            last_viewed_ats = {
+                item['sortKey'].split('/')[1]: pendulum.parse(item['lastViewedAt']) for item in view_items
+            }
+            for user_id in user_ids:
+                last_viewed_at = last_viewed_ats.get(user_id)
+                count = sum(
+                    1
+                    for author_user_id, created_at in messages
+                    if author_user_id != user_id and not (last_viewed_at and last_viewed_at > created_at)
+                )
+                if count:
+                    decrements[(chat_id, user_id)] = count
+
+        # Note that dynamo has no support for batch updates.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.member_update_max_workers) as executor:
+            futures = {
+                (chat_id, user_id): executor.submit(
+                    self.member_dynamo.decrement_messages_unviewed_count, chat_id, user_id, count=count
+                )
+                for (chat_id, user_id), count in decrements.items()
+            }
+        decremented_count = 0
+        for (chat_id, user_id), future in futures.items():
+            try:
+                decremented_count += int(future.result() is not None)
+            except Exception as err:
+                logger.exception(
+                    f'Unviewed count decrement failed for chat `{chat_id}` member `{user_id}`: {err}'
+                )
+        return decremented_count
 
     def sync_member_messages_unviewed_count(self, chat_id, new_item, old_item=None):
         if new_item.get('viewCount', 0) > (old_item or {}).get('viewCount', 0):
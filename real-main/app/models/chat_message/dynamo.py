@@ -4,6 +4,9 @@ from boto3.dynamodb.conditions import Key
 
 logger = logging.getLogger()
 
+# the attributes of chat messages kept in the recent messages cache of their chat
+RECENT_MESSAGE_ATTRIBUTES = ('messageId', 'chatId', 'userId', 'text', 'textTags', 'createdAt', 'lastEditedAt')
+
 
 class ChatMessageDynamo:
     def __init__(self, dynamo_client):
@@ -67,3 +70,46 @@ class ChatMessageDynamo:
         if pks_only:
             gen = ({'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']} for item in gen)
         return gen
+
+    def recent_messages_pk(self, chat_id):
+        return {
+            'partitionKey': f'chat/{chat_id}',
+            'sortKey': 'recentMessages',
+        }
+
+    def compact_chat_message(self, item):
+        "The form a chat message item takes in the recent messages cache"
+        return {k: item[k] for k in RECENT_MESSAGE_ATTRIBUTES if k in item}
+
+    def get_recent_messages(self, chat_id, strongly_consistent=False):
+        return self.client.get_item(self.recent_messages_pk(chat_id), ConsistentRead=strongly_consistent)
+
+    def put_recent_messages(self, chat_id, messages, from_created_at, version):
+        """
+        Write the recent messages cache of the chat, which holds all the chat's messages created at
+        or after `from_created_at`, ordered oldest first. The write is conditional on the cache
+        being at the previous version, or not existing if `version` is zero.
+        Returns a boolean indicating success.
+        """
+        query_kwargs = {
+            'Item': {
+                **self.recent_messages_pk(chat_id),
+                'schemaVersion': 0,
+                'version': version,
+                'fromCreatedAt': from_created_at,
+                'messages': messages,
+            },
+        }
+        if version > 0:
+            query_kwargs['ConditionExpression'] = 'version = :pv'
+            query_kwargs['ExpressionAttributeValues'] = {':pv': version - 1}
+        else:
+            query_kwargs['ConditionExpression'] = 'attribute_not_exists(partitionKey)'
+        try:
+            self.client.table.put_item(**query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def delete_recent_messages(self, chat_id):
+        return self.client.delete_item(self.recent_messages_pk(chat_id))
@@ -1,3 +1,5 @@
+import collections
+import json
 import logging
 import uuid
 
@@ -19,6 +21,10 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
 
     item_type = 'chatMessage'
 
+    # bounds on the recent messages cache of each chat, by number of messages and by encoded size
+    recent_messages_count = 50
+    recent_messages_max_bytes = 64 * 1024
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         managers = managers or {}
@@ -33,6 +39,9 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
         if 'dynamo' in clients:
             self.dynamo = ChatMessageDynamo(clients['dynamo'])
 
+        # map of chat_id to map of message_id to (is_add, compacted message item or None if deleted)
+        self.recent_messages_buffer = collections.defaultdict(dict)
+
     def get_model(self, item_id, strongly_consistent=False):
         return self.get_chat_message(item_id, strongly_consistent=strongly_consistent)
 
@@ -102,5 +111,74 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
             chat_message.delete(forced=True)
 
     def on_chat_delete_delete_messages(self, chat_id, old_item):
+        self.recent_messages_buffer.pop(chat_id, None)
+        self.dynamo.delete_recent_messages(chat_id)
         generator = self.dynamo.generate_chat_messages_by_chat(chat_id, pks_only=True)
         self.dynamo.client.batch_delete_items(generator)
+
+    def on_chat_message_change_sync_recent_messages(self, message_id, old_item=None, new_item=None):
+        # the recent messages cache is written once per chat by recent_messages_flush()
+        chat_id = (new_item or old_item)['chatId']
+        is_add = not old_item
+        if message_id in self.recent_messages_buffer[chat_id]:
+            is_add = is_add or self.recent_messages_buffer[chat_id][message_id][0]
+        message = self.dynamo.compact_chat_message(new_item) if new_item else None
+        self.recent_messages_buffer[chat_id][message_id] = (is_add, message)
+
+    def recent_messages_flush(self):
+        """
+        Apply the buffered message adds, edits and deletes to the recent messages cache of each chat,
+        in one conditional write per chat. Returns the number of chats whose cache was written.
+        """
+        buffer, self.recent_messages_buffer = self.recent_messages_buffer, collections.defaultdict(dict)
+        written_count = 0
+        for chat_id, changes in buffer.items():
+            try:
+                written_count += self.sync_recent_messages(chat_id, changes)
+            except Exception as err:
+                logger.exception(f'Recent messages cache sync failed for chat `{chat_id}`: {err}')
+        return written_count
+
+    def sync_recent_messages(self, chat_id, changes, retry_count=0):
+        "Returns a boolean indicating if the cache was written"
+        if retry_count > 2:
+            raise Exception(f'sync_recent_messages() failed for chat `{chat_id}` after {retry_count} tries')
+
+        item = self.dynamo.get_recent_messages(chat_id, strongly_consistent=retry_count > 0)
+        messages, from_created_at = self.apply_recent_messages_changes(
+            item['messages'] if item else [], item['fromCreatedAt'] if item else None, changes
+        )
+        if not item and not messages:
+            return False  # nothing to start a cache from
+        if item and messages == item['messages'] and from_created_at == item['fromCreatedAt']:
+            return False
+        version = item['version'] + 1 if item else 0
+        if self.dynamo.put_recent_messages(chat_id, messages, from_created_at, version):
+            return True
+
+        # someone else wrote the cache since we read it, so re-read and try again
+        return self.sync_recent_messages(chat_id, changes, retry_count=retry_count + 1)
+
+    def apply_recent_messages_changes(self, messages, from_created_at, changes):
+        """
+        The cache holds all messages of the chat created at or after `from_created_at`, so adds of
+        older messages are dropped. Messages over the size bounds are trimmed off the old end.
+        Returns a pair: (new messages, new from_created_at).
+        """
+        messages_by_id = {m['messageId']: m for m in messages}
+        for message_id, (is_add, message) in changes.items():
+            if message is None:
+                messages_by_id.pop(message_id, None)
+            elif message_id in messages_by_id or (is_add and message['createdAt'] >= (from_created_at or '')):
+                messages_by_id[message_id] = message
+        if from_created_at is None and messages_by_id:
+            # a new cache, starting from its oldest message
+            from_created_at = min(m['createdAt'] for m in messages_by_id.values())
+
+        messages = sorted(messages_by_id.values(), key=lambda m: m['createdAt'])
+        messages = messages[-self.recent_messages_count :]
+        while len(messages) > 1 and len(json.dumps(messages)) > self.recent_messages_max_bytes:
+            messages = messages[1:]
+        if len(messages) < len(messages_by_id):
+            from_created_at = messages[0]['createdAt']
+        return messages, from_created_at
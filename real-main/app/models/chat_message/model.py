@@ -1,4 +1,5 @@
 import decimal
+import itertools
 import json
 import logging
 
@@ -48,6 +49,8 @@ class ChatMessage(FlagModelMixin):
         self.chat_id = self.item['chatId']
         self.user_id = self.item.get('userId')  # system messages have no userId
         self.created_at = pendulum.parse(self.item['createdAt'])
+        # map of user_id to author encoded for that user, filled by cache_authors_encoded()
+        self.authors_encoded = {}
 
     @property
     def author(self):
@@ -100,16 +103,17 @@ class ChatMessage(FlagModelMixin):
         """
         user_ids = user_ids or []
         already_notified_user_ids = set([self.user_id])  # don't notify the msg author
+        member_user_ids = self.chat_manager.member_dynamo.generate_user_ids_by_chat(self.chat_id)
 
-        for user_id in user_ids:
+        notify_user_ids = []
+        for user_id in itertools.chain(user_ids, member_user_ids):
             if user_id in already_notified_user_ids:
                 continue
-            self.appsync.trigger_notification(notification_type, user_id, self)
+            notify_user_ids.append(user_id)
             already_notified_user_ids.add(user_id)
 
-        for user_id in self.chat_manager.member_dynamo.generate_user_ids_by_chat(self.chat_id):
-            if user_id in already_notified_user_ids:
-                continue
+        self.cache_authors_encoded(notify_user_ids)
+        for user_id in notify_user_ids:
             self.appsync.trigger_notification(notification_type, user_id, self)
 
     def get_author_encoded(self, user_id):
@@ -117,6 +121,8 @@ class ChatMessage(FlagModelMixin):
         Return the author in a serialized, stringified form if they exist and there is no
         blocking relationship between the given user and the author.
         """
+        if user_id in self.authors_encoded:
+            return self.authors_encoded[user_id]
         if not self.author:
             return None
         serialized = self.author.serialize(user_id)
@@ -127,6 +133,35 @@ class ChatMessage(FlagModelMixin):
             return None
         return json.dumps(serialized, cls=DecimalJsonEncoder)
 
+    def cache_authors_encoded(self, user_ids):
+        """
+        Fill the cache used by get_author_encoded() for many users at once. The block and follow
+        items between the author and the users are read in batches, and the author is serialized
+        once per distinct combination of statuses rather than once per user.
+        """
+        if not self.author:
+            return
+        author_id = self.author.id
+        block_statuses = self.block_manager.get_block_statuses(
+            itertools.chain.from_iterable(((author_id, uid), (uid, author_id)) for uid in user_ids)
+        )
+        follow_statuses = self.block_manager.follower_manager.get_follow_statuses(
+            (uid, author_id) for uid in user_ids
+        )
+        # map of (blocker_status, followed_status, blocked_status) to the author encoded with them
+        encoded_by_statuses = {}
+        for user_id in user_ids:
+            blocker_status = block_statuses[(author_id, user_id)]
+            blocked_status = block_statuses[(user_id, author_id)]
+            if BlockStatus.BLOCKING in (blocker_status, blocked_status):
+                self.authors_encoded[user_id] = None
+                continue
+            key = (blocker_status, follow_statuses[(user_id, author_id)], blocked_status)
+            if key not in encoded_by_statuses:
+                statuses = dict(zip(('blockerStatus', 'followedStatus', 'blockedStatus'), key))
+                encoded_by_statuses[key] = json.dumps({**self.author.item, **statuses}, cls=DecimalJsonEncoder)
+            self.authors_encoded[user_id] = encoded_by_statuses[key]
+
     def is_crowdsourced_forced_removal_criteria_met(self):
         # force-delete the chat message if at least 10% of the members of the chat have flagged it
         flag_count = self.item.get('flagCount', 0)
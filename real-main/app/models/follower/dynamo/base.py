@@ -21,6 +21,10 @@ class FollowerDynamo:
         pk = self.pk(follower_user_id, followed_user_id)
         return self.client.get_item(pk, ConsistentRead=strongly_consistent)
 
+    def batch_get_followings(self, follower_followed_user_ids):
+        "Get the follows for the (follower_user_id, followed_user_id) pairs in batches. Follows that DNE are omitted."
+        return self.client.batch_get(self.pk(*user_ids) for user_ids in follower_followed_user_ids)
+
     def add_following(self, follower_user_id, followed_user_id, follow_status):
         followed_at_str = pendulum.now('utc').to_iso8601_string()
         query_kwargs = {
@@ -53,6 +53,23 @@ class FollowerManager:
             return FollowStatus.NOT_FOLLOWING
         return follow.status
 
+    def get_follow_statuses(self, follower_followed_user_ids):
+        """
+        Same as get_follow_status(), but for many (follower_user_id, followed_user_id) pairs at once,
+        with the follow items read in batches. Returns a map of pair to follow status.
+        """
+        pairs = set(follower_followed_user_ids)
+        follow_statuses = {
+            (item['followerUserId'], item['followedUserId']): item['followStatus']
+            for item in self.dynamo.batch_get_followings(pair for pair in pairs if pair[0] != pair[1])
+        }
+        return {
+            pair: FollowStatus.SELF
+            if pair[0] == pair[1]
+            else follow_statuses.get(pair, FollowStatus.NOT_FOLLOWING)
+            for pair in pairs
+        }
+
     def generate_follower_user_ids(self, followed_user_id, follow_status=None):
         "Return a generator that produces user ids of users that follow the given user"
         gen = self.dynamo.generate_follower_items(followed_user_id, follow_status=follow_status)
@@ -69,16 +69,20 @@ class LikeManager:
 
     def dislike_all_of_post(self, post_id):
         "Dislike all likes of a post"
-        for like_item in self.dynamo.generate_of_post(post_id):
-            self.init_like(like_item).dislike()
+        self.bulk_dislike(self.dynamo.generate_of_post(post_id))
 
     def dislike_all_by_user(self, liked_by_user_id):
         "Dislike all likes by a user"
-        for like_item in self.dynamo.generate_by_liked_by(liked_by_user_id):
-            self.init_like(like_item).dislike()
+        self.bulk_dislike(self.dynamo.generate_by_liked_by(liked_by_user_id))
 
     def dislike_all_by_user_from_user(self, liked_by_user_id, posted_by_user_id):
         "Dislike all likes by one user on posts from another user"
-        for like_pk in self.dynamo.generate_pks_by_liked_by_for_posted_by(liked_by_user_id, posted_by_user_id):
-            liked_by_user_id, post_id = self.dynamo.parse_pk(like_pk)
-            self.get_like(liked_by_user_id, post_id).dislike()
+        self.bulk_dislike(self.dynamo.generate_pks_by_liked_by_for_posted_by(liked_by_user_id, posted_by_user_id))
+
+    def bulk_dislike(self, like_items):
+        """
+        Dislike many likes at once, given their items or keys. The like items are deleted in batches.
+        Their deletes are counted into the posts' like counts by the stream, which applies them with one
+        write per post per batch of stream records. Returns the number of likes disliked.
+        """
+        return self.dynamo.delete_likes(like_items)
@@ -1,11 +1,60 @@
+import hashlib
 import io
+import tempfile
 
 import PIL.Image
-import PIL.ImageOps
 import pyheif
 
+from app.utils import thumbnails
+
 from .exceptions import PostException
 
+# encoded image data bigger than this is spooled to a temporary file rather than held in memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageData:
+    """
+    Encoded image data, held in memory if small or spooled to a temporary file if large. It is never
+    modified, so it is shared rather than copied and any number of independent readers may be open at once.
+    """
+
+    def __init__(self, checksum, data=None, temp_file=None):
+        "`checksum` is the hex md5 digest of the data"
+        assert (data is None) != (temp_file is None), 'Exactly one of data or temp_file kwargs required'
+        self.checksum = checksum
+        self._data = data
+        self._temp_file = temp_file
+
+    @classmethod
+    def from_stream(cls, fh):
+        """
+        Read the stream from its current position, in chunks, so it is never held in memory twice.
+        The checksum is computed along the way.
+        """
+        if isinstance(fh, io.BytesIO) and fh.tell() == 0:
+            data = fh.getvalue()  # shares the underlying bytes object where possible
+            return cls(hashlib.md5(data).hexdigest(), data=data)
+        buf, temp_file, md5 = io.BytesIO(), None, hashlib.md5()
+        while chunk := fh.read(READ_CHUNK_SIZE):
+            md5.update(chunk)
+            if temp_file is None and buf.tell() + len(chunk) > SPOOL_MAX_SIZE:
+                temp_file = tempfile.NamedTemporaryFile()
+                temp_file.write(buf.getbuffer())
+                buf = None
+            (buf if temp_file is None else temp_file).write(chunk)
+        if temp_file is None:
+            return cls(md5.hexdigest(), data=buf.getvalue())
+        temp_file.flush()
+        return cls(md5.hexdigest(), temp_file=temp_file)
+
+    def open(self):
+        "A new file-like object positioned at the start of the data, independent of any other readers"
+        if self._data is not None:
+            return io.BytesIO(self._data)  # a BytesIO initialized with bytes shares them until written to
+        return open(self._temp_file.name, 'rb')
+
 
 class CachedImage:
     def __init__(self, post_id, image_size=None, s3_client=None, s3_path=None, source=None, content_type=None):
@@ -23,6 +72,10 @@ class CachedImage:
         self._data = None
         self._image = None
 
+        # hex md5 digest of the encoded data, if known. Unlike an S3 etag, it is a true md5 even for
+        # objects uploaded in multiple parts.
+        self.checksum = None
+
         # Possible values and meanings:
         #   - True: what's in the cache is known to match the source
         #   - False: what's in the cache is thought to be different than the source
@@ -34,6 +87,9 @@ class CachedImage:
         """
         It's not really readonly, the name is just to scare the client into not mutating it.
         Use readonly_image.copy() first if you want to make changes.
+
+        Images are copy-on-write: the cache never mutates an image in place, edits such as crop()
+        replace it with a new one. So the same image may be shared between caches without copying.
         """
         if not self._image and not self._data:
             self.refresh()
@@ -41,38 +97,57 @@ class CachedImage:
             self._fill_image_from_data()
         return self._image
 
+    def get_readonly_image(self, max_dimensions=None):
+        """
+        Same as readonly_image, except that if the caller only needs the image shrunk to fit within
+        `max_dimensions`, a jpeg that has not yet been decoded may be decoded at a reduced resolution.
+        Reduced resolution images are not kept in the cache.
+        """
+        if not self._image and not self._data:
+            self.refresh()
+        if self._image or not max_dimensions or self.content_type != 'image/jpeg':
+            return self.readonly_image
+        image, is_reduced = self._decode_jpeg(max_dimensions=max_dimensions)
+        if not is_reduced:
+            self._image = image
+        return image
+
+    def _decode_jpeg(self, max_dimensions=None):
+        try:
+            with self._data.open() as fh:
+                return thumbnails.open_jpeg(fh, max_dimensions=max_dimensions)
+        except Exception as err:
+            raise PostException(f'Unable to decode native jpeg data for post `{self.post_id}`: {err}') from err
+
     def _fill_image_from_data(self):
-        fh = io.BytesIO(self._data)
         if self.content_type == 'image/heic':
             try:
-                heif_file = pyheif.read(fh)
+                with self._data.open() as fh:
+                    heif_file = pyheif.read(fh)
             except (ValueError, pyheif.error.HeifError) as err:
                 raise PostException(f'Unable to read HEIC file for post `{self.post_id}`: {err}') from err
             self._image = PIL.Image.frombytes(
                 heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
             )
         elif self.content_type == 'image/jpeg':
-            try:
-                self._image = PIL.ImageOps.exif_transpose(PIL.Image.open(fh))
-            except PostException:
-                raise
-            except Exception as err:
-                raise PostException(
-                    f'Unable to decode native jpeg data for post `{self.post_id}`: {err}'
-                ) from err
+            self._image, _ = self._decode_jpeg()
         else:
             raise PostException(f'Unrecognized content-type `{self.content_type}`')
 
     def set_image(self, image):
+        "The image is shared, not copied, so the caller must not mutate it afterwards"
         self._data = None
-        self._image = image.copy()
+        self._image = image
+        self.checksum = None
         self.is_synced = False
         return self
 
     def set_data(self, fh):
+        "A BytesIO is taken over without copying its contents, so the caller must not write to it afterwards"
         fh.seek(0)
-        self._data = fh.read()
+        self._data = ImageData.from_stream(fh)
         self._image = None
+        self.checksum = self._data.checksum
         self.is_synced = False
         return self
 
@@ -80,6 +155,7 @@ class CachedImage:
         if not (self.is_synced and self._image is None and self._data is None):
             self._data = None
             self._image = None
+            self.checksum = None
             self.is_synced = False
         return self
 
@@ -87,13 +163,16 @@ class CachedImage:
         if self.source:
             self._data = None
             self._image = self.source()
+            self.checksum = None
         else:
             try:
                 fh = self.s3_client.get_object_data_stream(self.s3_path)
             except self.s3_client.exceptions.NoSuchKey as err:
                 raise PostException(f'{self.s3_path} image data not found for post `{self.post_id}`') from err
-            self._data = fh.read()
+            # stream the body in chunks rather than reading it whole
+            self._data = ImageData.from_stream(fh)
             self._image = None
+            self.checksum = self._data.checksum
         self.is_synced = True
         return self
 
@@ -116,6 +195,7 @@ class CachedImage:
             raise PostException(f'Unable to crop image for post `{self.id}`: {err}') from err
 
         self._data = None
+        self.checksum = None
         self.is_synced = False
         return self
 
@@ -130,7 +210,7 @@ class CachedImage:
                 self.s3_client.delete_object(self.s3_path)
             else:
                 if self._data:
-                    fh = io.BytesIO(self._data)
+                    fh = self._data.open()
                 elif self._image:
                     assert self.content_type == 'image/jpeg', 'Non-jpeg images can only be flushed back empty'
                     fh = io.BytesIO()
@@ -149,6 +229,8 @@ class CachedImage:
                     except Exception as err:
                         raise PostException(f'Unable to save pil image for post `{self.post_id}`: {err}') from err
                     fh.seek(0)
-                self.s3_client.put_object(self.s3_path, fh, self.content_type)
+                    self.checksum = hashlib.md5(fh.getbuffer()).hexdigest()
+                with fh:
+                    self.s3_client.put_object(self.s3_path, fh, self.content_type)
             self.is_synced = True
         return self
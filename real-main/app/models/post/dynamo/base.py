@@ -25,6 +25,17 @@ class PostDynamo:
     def get_post(self, post_id, strongly_consistent=False):
         return self.client.get_item(self.pk(post_id), ConsistentRead=strongly_consistent)
 
+    def batch_get_posts(self, post_ids, projection_expression=None):
+        "Order not maintained, posts that do not exist are omitted"
+        return self.client.batch_get(
+            (self.pk(post_id) for post_id in post_ids), projection_expression=projection_expression
+        )
+
+    def get_post_statuses(self, post_ids):
+        "Returns a dict of post_id -> post status, for the posts that exist"
+        items = self.batch_get_posts(post_ids, projection_expression='postId, postStatus')
+        return {item['postId']: item['postStatus'] for item in items}
+
     def delete_post(self, post_id):
         return self.client.delete_item(self.pk(post_id))
 
@@ -343,17 +354,35 @@ class PostDynamo:
         }
         return self.client.update_item(update_query_kwargs)
 
-    def increment_onymous_like_count(self, post_id):
-        return self.client.increment_count(self.pk(post_id), 'onymousLikeCount')
-
-    def decrement_onymous_like_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'onymousLikeCount')
-
-    def increment_anonymous_like_count(self, post_id):
-        return self.client.increment_count(self.pk(post_id), 'anonymousLikeCount')
-
-    def decrement_anonymous_like_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'anonymousLikeCount')
+    def add_like_counts(self, post_id, onymous_count, anonymous_count):
+        """
+        Add to the post's like counts, in one write. Counts may be negative. A count that would go below
+        zero is instead decremented to zero, with a WARNING. Fails softly if the post does not exist.
+        """
+        changes = {'onymousLikeCount': onymous_count, 'anonymousLikeCount': anonymous_count}
+        changes = {name: count for name, count in changes.items() if count}
+        query_kwargs = {
+            'Key': self.pk(post_id),
+            'UpdateExpression': 'ADD ' + ', '.join(f'{name} :{name}' for name in changes),
+            'ExpressionAttributeValues': {f':{name}': count for name, count in changes.items()},
+        }
+        decrements = {name: -count for name, count in changes.items() if count < 0}
+        if decrements:
+            query_kwargs['ConditionExpression'] = ' AND '.join(f'{name} >= :min_{name}' for name in decrements)
+            query_kwargs['ExpressionAttributeValues'].update({f':min_{n}': c for n, c in decrements.items()})
+        try:
+            return self.client.update_item(query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+        # the post is gone, or one of the counts would go below zero, so fall back to one write per count
+        item = None
+        for name, count in changes.items():
+            if count > 0:
+                item = self.client.increment_count(self.pk(post_id), name, count=count) or item
+            else:
+                item = self.client.decrement_count(self.pk(post_id), name, count=-count) or item
+        return item
 
     def increment_comment_count(self, post_id, viewed=False):
         query_kwargs = {
@@ -372,8 +401,8 @@ class PostDynamo:
     def decrement_comment_count(self, post_id):
         return self.client.decrement_count(self.pk(post_id), 'commentCount')
 
-    def decrement_comments_unviewed_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'commentsUnviewedCount')
+    def decrement_comments_unviewed_count(self, post_id, count=1):
+        return self.client.decrement_count(self.pk(post_id), 'commentsUnviewedCount', count=count)
 
     def clear_comments_unviewed_count(self, post_id):
         query_kwargs = {
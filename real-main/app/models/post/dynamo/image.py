@@ -1,5 +1,9 @@
 import logging
 
+from boto3.dynamodb.conditions import Key
+
+from app.utils import perceptual_hash
+
 logger = logging.getLogger()
 
 
@@ -7,6 +11,10 @@ class PostImageDynamo:
 
     schema_version = 0
 
+    # a hash of 64 bits split into bands of 16 bits
+    image_hash_band_count = 4
+    image_hash_query_page_size = 100
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
@@ -42,3 +50,58 @@ class PostImageDynamo:
         assert color_tuples, 'No support for deleting colors, yet'
         color_maps = [{'r': ct[0], 'g': ct[1], 'b': ct[2]} for ct in color_tuples]
         return self.client.set_attributes(self.pk(post_id), schemaVersion=self.schema_version, colors=color_maps)
+
+    def image_hash_band_key(self, post_id, band_index):
+        return {'partitionKey': f'post/{post_id}', 'sortKey': f'imageHash/{band_index}'}
+
+    def set_image_hash(self, post_id, posted_at_str, image_hash):
+        """
+        Store the perceptual hash of the image. Each band of the hash also gets an item of its own
+        indexed on GSI-K2, so that posts with similar hashes can be found with one query per band.
+        """
+        band_items = (
+            {
+                **self.image_hash_band_key(post_id, band_index),
+                'schemaVersion': 0,
+                'gsiK2PartitionKey': f'postImageHash/{band_index}/{band}',
+                'gsiK2SortKey': f'{posted_at_str}/{image_hash}',
+            }
+            for band_index, band in enumerate(perceptual_hash.split_bands(image_hash, self.image_hash_band_count))
+        )
+        self.client.batch_put_items(band_items)
+        return self.client.set_attributes(
+            self.pk(post_id), schemaVersion=self.schema_version, imageHash=image_hash
+        )
+
+    def delete_image_hash(self, post_id):
+        keys = (self.image_hash_band_key(post_id, band_index) for band_index in range(self.image_hash_band_count))
+        self.client.batch_delete(keys)
+
+    def get_first_image_hash_match(self, image_hash, max_distance, posted_before_str):
+        """
+        Return a pair of (post_id, posted_at_str) for the earliest post, posted before `posted_before_str`,
+        with an image hash within `max_distance` bits of the given one. Or None if there is no such post.
+
+        Only posts with a hash that shares at least one band with the given one can be found, which
+        covers all hashes within `max_distance` as long as it is less than the number of bands. Each band
+        is queried oldest first and only until its first match, so a crowded band costs no more than needed.
+        """
+        assert max_distance < self.image_hash_band_count, 'Max distance must be less than the band count'
+        first = None
+        for band_index, band in enumerate(perceptual_hash.split_bands(image_hash, self.image_hash_band_count)):
+            query_kwargs = {
+                'KeyConditionExpression': (
+                    Key('gsiK2PartitionKey').eq(f'postImageHash/{band_index}/{band}')
+                    & Key('gsiK2SortKey').lt(posted_before_str)
+                ),
+                'IndexName': 'GSI-K2',
+                'Limit': self.image_hash_query_page_size,
+            }
+            for keys in self.client.generate_all_query(query_kwargs):
+                posted_at_str, match_image_hash = keys['gsiK2SortKey'].rsplit('/', 1)
+                if first and posted_at_str >= first[1]:
+                    break  # can't beat what we found in an earlier band
+                if perceptual_hash.hamming_distance(image_hash, match_image_hash) <= max_distance:
+                    first = (keys['partitionKey'].split('/')[1], posted_at_str)
+                    break
+        return first
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import itertools
 import logging
 
@@ -16,7 +17,7 @@ from .appsync import PostAppSync
 from .dynamo import PostDynamo, PostImageDynamo, PostOriginalMetadataDynamo
 from .enums import PostStatus, PostType
 from .exceptions import PostException
-from .model import Post
+from .model import Post, PostView
 
 logger = logging.getLogger()
 
@@ -25,6 +26,8 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
 
     item_type = 'post'
 
+    like_counts_max_workers = 16
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         managers = managers or {}
@@ -43,14 +46,35 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             self.dynamo = PostDynamo(clients['dynamo'])
             self.image_dynamo = PostImageDynamo(clients['dynamo'])
             self.original_metadata_dynamo = PostOriginalMetadataDynamo(clients['dynamo'])
+        # map of post_id to (user_id, created_at) of its deleted comments, applied by deleted_comments_flush()
+        self.deleted_comments_buffer = collections.defaultdict(list)
+        # map of post_id to changes to its like counts, applied by like_counts_flush()
+        self.like_counts_buffer = collections.defaultdict(collections.Counter)
+        # map of post_id to the count of its buffered trending views by each viewer, so that views by
+        # the post owner can be left out once trending_flush() has read the post
+        self.trending_viewers_buffer = collections.defaultdict(collections.Counter)
+        self.trending_viewers_flushing = {}
 
     def get_model(self, item_id, strongly_consistent=False):
         return self.get_post(item_id, strongly_consistent=strongly_consistent)
 
+    def batch_get_posts(self, post_ids):
+        "Order not maintained, posts that do not exist are omitted"
+        return [self.init_post(post_item) for post_item in self.dynamo.batch_get_posts(post_ids)]
+
     def get_post(self, post_id, strongly_consistent=False):
         post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
         return self.init_post(post_item) if post_item else None
 
+    def get_post_view(self, post_id, strongly_consistent=False):
+        "A read-only PostView, for callers that only need the post's attributes"
+        post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
+        return PostView(post_item) if post_item else None
+
+    def batch_get_post_views(self, post_ids):
+        "Order not maintained, posts that do not exist are omitted"
+        return [PostView(post_item) for post_item in self.dynamo.batch_get_posts(post_ids)]
+
     def init_post(self, post_item):
         kwargs = {
             'post_appsync': getattr(self, 'appsync', None),
@@ -197,17 +221,55 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         grouped_post_ids = dict(collections.Counter(post_ids))
         if not grouped_post_ids:
             return
+        viewed_at = viewed_at or pendulum.now('utc')
+
+        posts = {post.id: post for post in self.batch_get_post_views(grouped_post_ids)}
+        original_post_ids = {post.original_post_id for post in posts.values()} - posts.keys()
+        posts.update({post.id: post for post in self.batch_get_post_views(original_post_ids)})
 
-        results = []
+        viewed = []
         for post_id, view_count in grouped_post_ids.items():
-            post = self.get_post(post_id)
+            post = posts.get(post_id)
             if not post:
                 logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
                 continue
-            results.append(post.record_view_count(user_id, view_count, viewed_at=viewed_at))
+            viewed.append((post, view_count))
+            # views of a non-original post by a non-owner count as views of the original post as well
+            original_post = posts.get(post.original_post_id, post)
+            if post.status == PostStatus.COMPLETED and post.user_id != user_id and original_post is not post:
+                viewed.append((original_post, view_count))
+
+        view_counts = collections.Counter()
+        for post, view_count in viewed:
+            if post.status != PostStatus.COMPLETED:
+                logger.warning(f'Cannot record views by user `{user_id}` on non-COMPLETED post `{post.id}`')
+                continue
+            view_counts[post.id] += view_count
+        if not view_counts:
+            return
 
-        if any(results):
-            self.user_manager.dynamo.update_last_post_view_at(user_id, now=viewed_at)
+        # note that trending is incremented in a buffered fashion by the dynamo stream handler for views
+        first_view_post_ids = self.record_view_counts(view_counts, user_id, viewed_at)
+
+        # Record the viewedBy on the posts and their authors, with one write per post and per author.
+        # The post owner's own views are recorded, but don't count here and are filtered out of Post.viewedBy.
+        viewed_by_post_ids = [post_id for post_id in first_view_post_ids if posts[post_id].user_id != user_id]
+        author_viewed_by_counts = collections.Counter(posts[post_id].user_id for post_id in viewed_by_post_ids)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.record_views_max_workers) as executor:
+            futures = [
+                executor.submit(self.dynamo.increment_viewed_by_count, post_id) for post_id in viewed_by_post_ids
+            ]
+            futures += [
+                executor.submit(
+                    self.user_manager.dynamo.increment_post_viewed_by_count, author_user_id, count=count
+                )
+                for author_user_id, count in author_viewed_by_counts.items()
+            ]
+            futures.append(
+                executor.submit(self.user_manager.dynamo.update_last_post_view_at, user_id, now=viewed_at)
+            )
+        for future in futures:
+            future.result()
 
     def delete_recently_expired_posts(self, now=None):
         "Delete posts that expired yesterday or today"
@@ -273,35 +335,105 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         comment = self.comment_manager.init_comment(old_item)
         self.dynamo.decrement_comment_count(comment.post_id)
 
-        if comment.post and comment.user_id != comment.post.user_id:
-            # has the post owner 'viewed' that comment via reporting a view on the post?
-            post_view_item = self.view_dynamo.get_view(comment.post_id, comment.post.user_id)
-            post_last_viewed_at = pendulum.parse(post_view_item['lastViewedAt']) if post_view_item else None
-            if not (post_last_viewed_at and post_last_viewed_at > comment.created_at):
-                post_item = self.dynamo.decrement_comments_unviewed_count(comment.post_id)
-                # if the comment unviewed count hit zero, then remove post from 'posts with unviewed comments' index
-                if post_item and post_item.get('commentsUnviewedCount', 0) == 0:
-                    self.dynamo.set_last_unviewed_comment_at(post_item, None)
+        # whether the comment was unviewed depends on the post owner's view of the post, which is
+        # read for all the posts with comments deleted in the stream batch at once by deleted_comments_flush()
+        self.deleted_comments_buffer[comment.post_id].append((comment.user_id, comment.created_at))
+
+    def deleted_comments_flush(self):
+        """
+        For each post with buffered comment deletes, decrement the post's unviewed comment count by the
+        number of those comments, not by the post owner, that the post owner had not viewed. The posts and
+        their owners' views of them are each read in one batch, and the decrements are applied concurrently.
+        Returns the number of post counts decremented.
+        """
+        buffer, self.deleted_comments_buffer = self.deleted_comments_buffer, collections.defaultdict(list)
+        if not buffer:
+            return 0
+        try:
+            posts = self.batch_get_post_views(buffer.keys())
+            # has the post owner 'viewed' the comments via reporting a view on the post?
+            view_items = self.view_dynamo.batch_get_views_by_item_and_user(
+                (post.id, post.user_id) for post in posts
+            )
+        except Exception as err:
+            logger.exception(f'Unviewed count decrements failed for posts `{sorted(buffer.keys())}`: {err}')
+            return 0
+        last_viewed_ats = {
+            item['partitionKey'].split('/')[1]: pendulum.parse(item['lastViewedAt']) for item in view_items
+        }
+        decrements = {}
+        for post in posts:
+            last_viewed_at = last_viewed_ats.get(post.id)
+            count = sum(
+                1
+                for user_id, created_at in buffer[post.id]
+                if user_id != post.user_id and not (last_viewed_at and last_viewed_at > created_at)
+            )
+            if count:
+                decrements[post.id] = count
+
+        # Note that dynamo has no support for batch updates.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.record_views_max_workers) as executor:
+            futures = {
+                post_id: executor.submit(self.decrement_comments_unviewed_count, post_id, count)
+                for post_id, count in decrements.items()
+            }
+        decremented_count = 0
+        for post_id, future in futures.items():
+            try:
+                decremented_count += int(future.result() is not None)
+            except Exception as err:
+                logger.exception(f'Unviewed count decrement failed for post `{post_id}`: {err}')
+        return decremented_count
+
+    def decrement_comments_unviewed_count(self, post_id, count):
+        post_item = self.dynamo.decrement_comments_unviewed_count(post_id, count=count)
+        # if the comment unviewed count hit zero, then remove post from 'posts with unviewed comments' index
+        if post_item and post_item.get('commentsUnviewedCount', 0) == 0:
+            self.dynamo.set_last_unviewed_comment_at(post_item, None)
+        return post_item
+
+    def like_count_attribute(self, like_status):
+        if like_status == LikeStatus.ONYMOUSLY_LIKED:
+            return 'onymousLikeCount'
+        if like_status == LikeStatus.ANONYMOUSLY_LIKED:
+            return 'anonymousLikeCount'
+        raise Exception(f'Unrecognized like status `{like_status}`')
 
     def on_like_add(self, post_id, new_item):
-        like_status = new_item['likeStatus']
-        if like_status == LikeStatus.ONYMOUSLY_LIKED:
-            incrementor = self.dynamo.increment_onymous_like_count
-        elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
-            incrementor = self.dynamo.increment_anonymous_like_count
-        else:
-            raise Exception(f'Unrecognized like status `{like_status}`')
-        incrementor(post_id)
+        # the like counts are written once per post by like_counts_flush()
+        attribute_name = self.like_count_attribute(new_item['likeStatus'])
+        self.like_counts_buffer[post_id][attribute_name] += 1
 
     def on_like_delete(self, post_id, old_item):
-        like_status = old_item['likeStatus']
-        if like_status == LikeStatus.ONYMOUSLY_LIKED:
-            decrementor = self.dynamo.decrement_onymous_like_count
-        elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
-            decrementor = self.dynamo.decrement_anonymous_like_count
-        else:
-            raise Exception(f'Unrecognized like status `{like_status}`')
-        decrementor(post_id)
+        attribute_name = self.like_count_attribute(old_item['likeStatus'])
+        self.like_counts_buffer[post_id][attribute_name] -= 1
+
+    def like_counts_flush(self):
+        """
+        Add the buffered like count changes of each post onto the post item, with one write per post.
+        The writes are done concurrently. Returns the number of posts whose like counts were written.
+        """
+        buffer, self.like_counts_buffer = self.like_counts_buffer, collections.defaultdict(collections.Counter)
+        # likes that were added and deleted again in the same batch cancel out
+        buffer = {post_id: changes for post_id, changes in buffer.items() if any(changes.values())}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.like_counts_max_workers) as executor:
+            futures = {
+                post_id: executor.submit(
+                    self.dynamo.add_like_counts,
+                    post_id,
+                    changes['onymousLikeCount'],
+                    changes['anonymousLikeCount'],
+                )
+                for post_id, changes in buffer.items()
+            }
+        written_count = 0
+        for post_id, future in futures.items():
+            try:
+                written_count += int(future.result() is not None)
+            except Exception as err:
+                logger.exception(f'Like counts write failed for post `{post_id}`: {err}')
+        return written_count
 
     def on_post_view_count_change_update_counts(self, post_id, new_item, old_item=None):
         if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
@@ -321,14 +453,52 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             if post.refresh_item().item:
                 raise
 
+    def on_post_view_count_change_update_trending(self, post_id, new_item, old_item=None):
+        if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
+            return  # view count did not increase
+
+        # buffered so that all views of a post in one stream batch result in a single trending write.
+        # Whether the viewer is the post owner, whose views don't count, is checked when flushing.
+        _, viewed_by_user_id = new_item['sortKey'].split('/')
+        self.trending_viewers_buffer[post_id][viewed_by_user_id] += 1
+        self.trending_buffer_score(post_id, now=pendulum.parse(new_item['lastViewedAt']))
+
+    def trending_flush(self):
+        self.trending_viewers_flushing = self.trending_viewers_buffer
+        self.trending_viewers_buffer = collections.defaultdict(collections.Counter)
+        try:
+            return super().trending_flush()
+        finally:
+            self.trending_viewers_flushing = {}
+
+    def trending_flush_item(self, post_id, multiplier, now=None):
+        post = self.get_post(post_id)
+        if not post or post.status != PostStatus.COMPLETED:
+            return False
+
+        # post owner's views don't count for trending
+        multiplier -= self.trending_viewers_flushing.get(post_id, {}).get(post.user_id, 0)
+        if multiplier <= 0:
+            return False
+
+        multiplier *= post.get_trending_multiplier()
+        recorded = post.trending_increment_score(now=now, multiplier=multiplier)
+        if recorded:
+            self.user_manager.trending_buffer_score(post.user_id, multiplier=multiplier, now=now)
+        return recorded
+
+    def trending_filter_viewable(self, post_ids):
+        statuses = self.dynamo.get_post_statuses(post_ids)
+        return {post_id for post_id, status in statuses.items() if status == PostStatus.COMPLETED}
+
     def on_album_delete_remove_posts(self, album_id, old_item):
         for post_id in self.dynamo.generate_post_ids_in_album(album_id):
             if post := self.get_post(post_id):
                 post.set_album(None)
 
     def on_post_status_change_fire_gql_notifications(self, post_id, new_item, old_item):
-        old_post = self.init_post(old_item)
-        new_post = self.init_post(new_item)
+        old_post = PostView(old_item)
+        new_post = PostView(new_item)
         kwargs = {'postId': post_id}
 
         if new_post.status == PostStatus.ERROR:
@@ -1,10 +1,10 @@
 import base64
+import concurrent.futures
 import io
 import logging
+import os
 
-import colorthief
 import pendulum
-import PIL.Image
 
 from app.mixins.flag.model import FlagModelMixin
 from app.mixins.trending.model import TrendingModelMixin
@@ -12,15 +12,17 @@ from app.mixins.view.model import ViewModelMixin
 from app.models.follower.enums import FollowStatus
 from app.models.user.enums import UserPrivacyStatus, UserSubscriptionLevel
 from app.models.user.exceptions import UserException
-from app.utils import image_size
+from app.utils import image_size, palette, perceptual_hash, thumbnails
 
 from .cached_image import CachedImage
 from .enums import PostNotificationType, PostStatus, PostType
 from .exceptions import PostException
-from .text_image import generate_text_image
+from .text_image import get_text_image
 
 logger = logging.getLogger()
 
+POST_IMAGE_HASH_MAX_DISTANCE = os.environ.get('POST_IMAGE_HASH_MAX_DISTANCE')
+
 # keep in sync with object created handlers defined serverless.yml
 VIDEO_ORIGINAL_FILENAME = 'video-original.mov'
 VIDEO_HLS_PREFIX = 'video-hls/video'
@@ -28,15 +30,41 @@ VIDEO_POSTER_PREFIX = 'video-poster/poster'
 IMAGE_DIR = 'image'
 
 
-class ColorThiefFromImage(colorthief.ColorThief):
-    def __init__(self, image):
-        self.image = image
+class PostItemMixin:
+    "Properties read from the post item, shared by Post and PostView"
+
+    __slots__ = ()
+
+    @property
+    def status(self):
+        return self.item['postStatus']
+
+    @property
+    def posted_at(self):
+        return pendulum.parse(self.item['postedAt'])
+
+    @property
+    def is_verified(self):
+        return self.item.get('isVerified')
+
+    @property
+    def original_post_id(self):
+        return self.item.get('originalPostId', self.id)
+
+    @property
+    def viewed_by_count(self):
+        return self.item.get('viewedByCount', 0)
 
 
-class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
+class Post(PostItemMixin, FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     item_type = 'post'
 
+    # max number of bits the perceptual hashes of two images may differ by for them to count as duplicates
+    image_hash_max_distance = int(POST_IMAGE_HASH_MAX_DISTANCE or 3)
+
+    prefetched_thumbnail_sizes = image_size.PREFETCHED_THUMBNAILS
+
     def __init__(
         self,
         item,
@@ -98,61 +126,6 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         self.type = self.item['postType']
         self.user_id = item['postedByUserId']
 
-        # lazy caches
-        if self.type == PostType.TEXT_ONLY:
-            text = self.item['text']
-            self.k4_jpeg_cache = CachedImage(
-                self.id, source=lambda: generate_text_image(text, image_size.K4.max_dimensions)
-            )
-            self.p1080_jpeg_cache = CachedImage(
-                self.id, source=lambda: generate_text_image(text, image_size.P1080.max_dimensions)
-            )
-        elif s3_uploads_client:
-            self.native_heic_cache = CachedImage(
-                self.id,
-                image_size=image_size.NATIVE_HEIC,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.NATIVE_HEIC),
-            )
-            self.native_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.NATIVE,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.NATIVE),
-            )
-            self.k4_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.K4,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.K4),
-            )
-            self.p1080_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P1080,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P1080),
-            )
-            self.p480_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P480,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P480),
-            )
-            self.p64_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P64,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P64),
-            )
-
-    @property
-    def status(self):
-        return self.item['postStatus']
-
-    @property
-    def posted_at(self):
-        return pendulum.parse(self.item['postedAt'])
-
     @property
     def s3_prefix(self):
         return '/'.join([self.user_id, 'post', self.id])
@@ -163,22 +136,54 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return this._image_item
 
     @property
-    def user(self):
-        if not hasattr(self, '_user'):
-            self._user = self.user_manager.get_user(self.user_id)
-        return self._user
+    def native_heic_cache(self):
+        return self.get_image_cache(image_size.NATIVE_HEIC)
 
     @property
-    def is_verified(self):
-        return self.item.get('isVerified')
+    def native_jpeg_cache(self):
+        return self.get_image_cache(image_size.NATIVE)
 
     @property
-    def original_post_id(self):
-        return self.item.get('originalPostId', self.id)
+    def k4_jpeg_cache(self):
+        return self.get_image_cache(image_size.K4)
 
     @property
-    def viewed_by_count(self):
-        return self.item.get('viewedByCount', 0)
+    def p1080_jpeg_cache(self):
+        return self.get_image_cache(image_size.P1080)
+
+    @property
+    def p480_jpeg_cache(self):
+        return self.get_image_cache(image_size.P480)
+
+    @property
+    def p64_jpeg_cache(self):
+        return self.get_image_cache(image_size.P64)
+
+    @property
+    def user(self):
+        if not hasattr(self, '_user'):
+            self._user = self.user_manager.get_user(self.user_id)
+        return self._user
+
+    def get_image_cache(self, size):
+        "The CachedImage of the given size, constructed on first access"
+        if not hasattr(self, '_image_caches'):
+            self._image_caches = {}
+        if size not in self._image_caches:
+            self._image_caches[size] = self.init_image_cache(size)
+        return self._image_caches[size]
+
+    def init_image_cache(self, size):
+        if self.type == PostType.TEXT_ONLY:
+            if size not in (image_size.K4, image_size.P1080):
+                raise AttributeError(f'Text-only post `{self.id}` has no `{size.filename}` image')
+            text = self.item['text']
+            return CachedImage(self.id, source=lambda: get_text_image(text, size.max_dimensions))
+        if not hasattr(self, 's3_uploads_client'):
+            raise AttributeError(f'Post `{self.id}` has no s3 client to cache its `{size.filename}` image')
+        return CachedImage(
+            self.id, image_size=size, s3_client=self.s3_uploads_client, s3_path=self.get_image_path(size)
+        )
 
     def refresh_item(self, strongly_consistent=False):
         self.item = self.dynamo.get_post(self.id, strongly_consistent=strongly_consistent)
@@ -245,15 +250,27 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return resp
 
     def build_image_thumbnails(self):
-        image = self.native_jpeg_cache.readonly_image.copy()
-        # ordered by decreasing size
-        for cache in (self.k4_jpeg_cache, self.p1080_jpeg_cache, self.p480_jpeg_cache, self.p64_jpeg_cache):
-            try:
-                image.thumbnail(cache.image_size.max_dimensions, resample=PIL.Image.LANCZOS)
-            except Exception as err:
-                raise PostException(f'Unable to thumbnail image as jpeg for post `{self.id}`: {err}') from err
-            cache.set_image(image)
-            cache.flush()
+        """
+        Generate and save the prefetched thumbnails, flushing back the native jpeg too if it has unsaved changes.
+        Each image is encoded and uploaded on its own thread while the next thumbnail is generated.
+        """
+        caches = [self.get_image_cache(size) for size in self.prefetched_thumbnail_sizes]
+        max_dimensions_list = [cache.image_size.max_dimensions for cache in caches]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(caches) + 1) as executor:
+            futures = []
+            if self.native_jpeg_cache.is_synced is False:
+                futures.append(executor.submit(self.native_jpeg_cache.flush))
+            # only thumbnails are needed, so the native jpeg may be decoded at a reduced resolution
+            image = self.native_jpeg_cache.get_readonly_image(max_dimensions=max_dimensions_list[0])
+            pyramid = thumbnails.generate_thumbnails(image, max_dimensions_list)
+            for cache in caches:
+                try:
+                    thumbnail = next(pyramid)
+                except Exception as err:
+                    raise PostException(f'Unable to thumbnail image as jpeg for post `{self.id}`: {err}') from err
+                futures.append(executor.submit(cache.set_image(thumbnail).flush))
+        for future in futures:
+            future.result()
 
     def process_image_upload(self, image_data=None, now=None):
         assert self.type == PostType.IMAGE, 'Can only process_image_upload() for IMAGE posts'
@@ -277,19 +294,17 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             source_cached_image.crop(crop)
 
         if source_cached_image != self.native_jpeg_cache:
-            self.native_jpeg_cache.set_image(source_cached_image.readonly_image)  # set_image makes a copy
-
-        if self.native_jpeg_cache.is_synced is False:
-            self.native_jpeg_cache.flush()
+            self.native_jpeg_cache.set_image(source_cached_image.readonly_image)
 
         if self.native_heic_cache.is_synced is False:
             # the HEIC image was edited (cropped) but we can't save that as HEIC, so we just delete it
             self.native_heic_cache.clear()
             self.native_heic_cache.flush(include_deletes=True)
 
-        self.build_image_thumbnails()
+        self.build_image_thumbnails()  # also flushes back the native jpeg
         self.set_height_and_width()
         self.set_colors()
+        self.set_image_hash()
         self.set_is_verified()
         self.set_checksum()
         self.complete(now=now)
@@ -342,6 +357,9 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             post_id = self.dynamo.get_first_with_checksum(checksum)
             if post_id and post_id != self.id:
                 original_post_id = post_id
+            else:
+                # no exact copy came before us, but a re-encode or resize of the same image may have
+                original_post_id = self.get_first_with_similar_image()
         set_as_user_photo = self.item.get('setAsUserPhoto')
 
         album_id = self.item.get('albumId')
@@ -443,6 +461,8 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         # do the deletes for real
         self.s3_uploads_client.delete_objects_with_prefix(self.s3_prefix)
         if self.image_item:
+            if self.image_item.get('imageHash'):
+                self.image_dynamo.delete_image_hash(self.id)
             self.image_dynamo.delete(self.id)
         self.original_metadata_dynamo.delete(self.id)
         self.dynamo.delete_post(self.id)
@@ -482,17 +502,43 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return self
 
     def set_colors(self):
+        # the 480p thumbnail has more than enough pixels for a palette, and is already at hand after processing
         try:
-            colors = ColorThiefFromImage(self.native_jpeg_cache.readonly_image).get_palette(color_count=5)
+            colors = palette.get_palette(self.p480_jpeg_cache.readonly_image, color_count=5)
         except Exception as err:
-            logger.warning(f'ColorTheif failed to get palette with error `{err}` for post `{self.id}`')
+            logger.warning(f'Palette extraction failed with error `{err}` for post `{self.id}`')
         else:
             self._image_item = self.image_dynamo.set_colors(self.id, colors)
         return self
 
+    def set_image_hash(self):
+        try:
+            image_hash = perceptual_hash.dhash(self.p64_jpeg_cache.readonly_image)
+        except Exception as err:
+            logger.warning(f'Perceptual hash failed with error `{err}` for post `{self.id}`')
+        else:
+            self._image_item = self.image_dynamo.set_image_hash(self.id, self.item['postedAt'], image_hash)
+        return self
+
+    def get_first_with_similar_image(self):
+        """
+        The id of the first post posted before this one with a perceptual image hash within
+        `image_hash_max_distance` of ours, if there is one.
+        """
+        image_hash = self.image_item.get('imageHash')
+        if not image_hash:
+            return None
+        first = self.image_dynamo.get_first_image_hash_match(
+            image_hash, self.image_hash_max_distance, self.item['postedAt']
+        )
+        return first[0] if first else None
+
     def set_checksum(self):
-        path = self.get_image_path(image_size.NATIVE)
-        checksum = self.s3_uploads_client.get_object_checksum(path)
+        # if the native jpeg passed through our hands on its way to or from S3, we already know its md5
+        checksum = self.native_jpeg_cache.checksum if hasattr(self, 'native_jpeg_cache') else None
+        if not checksum:
+            path = self.get_image_path(image_size.NATIVE)
+            checksum = self.s3_uploads_client.get_object_checksum(path)
         self.item = self.dynamo.set_checksum(self.id, self.item['postedAt'], checksum)
         return self
 
@@ -610,10 +656,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         if self.user_id == user_id:
             return True  # post owner's views don't count for trending, etc.
 
-        trending_kwargs = {'now': viewed_at, 'multiplier': self.get_trending_multiplier()}
-        recorded = self.trending_increment_score(**trending_kwargs)
-        if recorded:
-            self.user.trending_increment_score(**trending_kwargs)
+        # note that trending is incremented in a buffered fashion by the dynamo stream handler for views
 
         # record the viewedBy on the post and user
         if is_new_view:
@@ -652,3 +695,20 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             return False
 
         return super().trending_increment_score(now=now, **kwargs)
+
+
+class PostView(PostItemMixin):
+    """
+    A compact, read-only view of a post item, for code that only reads the post's attributes.
+
+    Much cheaper to construct than a Post as it has no dependencies, no instance dict and builds
+    no image caches. Has no methods that read from or write to any backend.
+    """
+
+    __slots__ = ('item', 'id', 'type', 'user_id')
+
+    def __init__(self, item):
+        self.item = item
+        self.id = item['postId']
+        self.type = item['postType']
+        self.user_id = item['postedByUserId']
@@ -1,5 +1,13 @@
+import bisect
+import collections
+import functools
+import hashlib
+import io
+import itertools
 import logging
+import math
 import os.path
+import threading
 
 import PIL.Image
 import PIL.ImageDraw
@@ -8,6 +16,51 @@ import PIL.ImageFont
 font_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'fonts', 'OpenSans-Regular.ttf')
 logger = logging.getLogger()
 
+# Max total pixels of rendered images kept by get_text_image(): room for a few 1080p renders, about 25MB of
+# RGB data, but no more than 5% of the memory of the lambda function we are running in, if we are.
+LAMBDA_MEMORY_MB = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+RENDER_CACHE_MAX_PIXELS = min(
+    4 * 1920 * 1080, int(LAMBDA_MEMORY_MB) * 1024 * 1024 // 20 // 3 if LAMBDA_MEMORY_MB else math.inf
+)
+
+_render_cache = collections.OrderedDict()  # (text digest, dimensions) -> image, least recently used first
+_render_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_font_data():
+    with open(font_path, 'rb') as fh:
+        return fh.read()
+
+
+@functools.lru_cache(maxsize=64)
+def get_font(font_size):
+    "The font parsed at the given size. Font objects are cached, so do not modify them."
+    return PIL.ImageFont.truetype(io.BytesIO(_get_font_data()), size=font_size)
+
+
+def get_text_image(text, dimensions):
+    """
+    Same as generate_text_image(), except rendered images are kept in an in-process LRU cache keyed
+    by (text digest, dimensions), so repeat renders of the same text, for example when regenerating
+    album art, are free. The image returned is shared, so do not modify it.
+    """
+    key = (hashlib.sha256(text.encode('utf-8')).hexdigest(), tuple(dimensions))
+    with _render_cache_lock:
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            return _render_cache[key]
+
+    image = generate_text_image(text, dimensions)
+
+    with _render_cache_lock:
+        _render_cache[key] = image
+        pixels = sum(cached.size[0] * cached.size[1] for cached in _render_cache.values())
+        while pixels > RENDER_CACHE_MAX_PIXELS and len(_render_cache) > 1:
+            _, evicted = _render_cache.popitem(last=False)
+            pixels -= evicted.size[0] * evicted.size[1]
+    return image
+
 
 def generate_text_image(text, dimensions, font_size=None):
     "Generate an image with text nicely wrapped and centered"
@@ -18,9 +71,7 @@ def generate_text_image(text, dimensions, font_size=None):
     img = PIL.Image.new('RGB', dimensions)
 
     font_size = font_size or image_height // 10
-
-    with open(font_path, 'rb') as fh:
-        font = PIL.ImageFont.truetype(fh, size=font_size)
+    font = get_font(font_size)
 
     # we want our text to match, more or less, the aspect ratio of the overall image
     draw = PIL.ImageDraw.Draw(img)
@@ -32,15 +83,15 @@ def generate_text_image(text, dimensions, font_size=None):
     line_height = size_1[1]
     line_spacing = size_2[1] - 2 * size_1[1]
 
-    # tokenize then wrap the text so it looks good
+    # tokenize then wrap the text so it looks good, measuring each distinct token just once
     raw_tokens = text.split()
-    token_widths = [draw.textsize(raw_token, font=font)[0] for raw_token in raw_tokens]
-    text, text_width, text_height = rectangle_wrap(
+    raw_token_widths = {raw_token: draw.textsize(raw_token, font=font)[0] for raw_token in set(raw_tokens)}
+    token_widths = [raw_token_widths[raw_token] for raw_token in raw_tokens]
+    wrapped_text, text_width, text_height = rectangle_wrap(
         raw_tokens, token_widths, token_spacing, line_spacing, line_height, image_aspect_ratio
     )
 
     logger.debug(f'Computed text size: ({text_width}, {text_height})')
-    logger.debug(f'Actual text size:   {draw.textsize(text, font=font)}')
 
     # if it's too big to fit in the image, shrink the font size and re-run the algo
     max_text_width = image_width * 0.9
@@ -50,48 +101,24 @@ def generate_text_image(text, dimensions, font_size=None):
 
     # write out the text in center of the image
     xy = ((image_width - text_width) / 2, (image_height - text_height) / 2 - line_spacing / 2)
-    draw.text(xy, text, align='center', fill=(255, 255, 255), font=font)
+    draw.text(xy, wrapped_text, align='center', fill=(255, 255, 255), font=font)
     return img
 
 
-class Token:
-    "A word in a variable-width font"
-
-    def __init__(self, token, token_width):
-        self._token = token
-        self._token_width = token_width
-
-    def __str__(self):
-        return self._token
-
-    def __len__(self):
-        return self._token_width
-
-
-class Line:
-    "A line of text in a variable-width font"
-
-    def __init__(self, tokens, token_spacing):
-        self._tokens = tokens
-        self._token_spacing = token_spacing
-
-    @property
-    def first_token(self):
-        return self._tokens[0] if self._tokens else None
-
-    def pop_first_token(self):
-        return self._tokens.pop(0)
-
-    def append_token(self, token):
-        self._tokens.append(token)
-
-    def __str__(self):
-        return ' '.join(str(t) for t in self._tokens)
-
-    def __len__(self):
-        if not self._tokens:
-            return 0
-        return sum(len(t) for t in self._tokens) + (len(self._tokens) - 1) * self._token_spacing
+def _greedy_wrap(prefix_widths, token_spacing, max_line_width):
+    """
+    Break tokens into lines no wider than `max_line_width`, filling each line before starting the next.
+    `prefix_widths[i]` is the width of the first i tokens including one token spacing after each.
+    Returns a list of (start, end) token index ranges, one per line.
+    """
+    lines, start, token_count = [], 0, len(prefix_widths) - 1
+    while start < token_count:
+        # the line holding tokens [start, end) is `prefix_widths[end] - prefix_widths[start] - token_spacing` wide
+        limit = prefix_widths[start] + max_line_width + token_spacing
+        end = max(bisect.bisect_right(prefix_widths, limit, lo=start + 1) - 1, start + 1)
+        lines.append((start, end))
+        start = end
+    return lines
 
 
 def rectangle_wrap(raw_tokens, token_widths, token_spacing, line_spacing, line_height, desired_aspect_ratio):
@@ -99,49 +126,30 @@ def rectangle_wrap(raw_tokens, token_widths, token_spacing, line_spacing, line_h
     Given a series of tokens, their widths, information about spacing and a desired aspect ratio,
     return a block of text that closely matches the desired aspect ratio.
 
+    Binary searches for the narrowest maximum line width at which the greedily wrapped text
+    is at least as wide, relative to its height, as the desired aspect ratio.
+
     Note that python standard library textwrap module assumes a monospace font, where as this
     utility is designed to work with variable width font.
     """
-    tokens = [Token(*args) for args in zip(raw_tokens, token_widths)]
-
-    # start all tokens in separate lines, we will iteratively move tokens up lines
-    lines = [Line([token], token_spacing) for token in tokens]
-    text_width = max(len(line) for line in lines)
-    text_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
-
-    # iteratively flow tokens up the paragraph until we have just passed our desired aspect ratio
-    while (line_cnt := len(lines)) > 1 and text_width / text_height < desired_aspect_ratio:
-
-        # operate until we have shrunk our line cnt
-        while len(lines) == line_cnt:
-
-            # determine what our next text_width needs to be to change the token distribution
-            this_line, next_line = lines[0], lines[1]
-            min_new_text_width = len(this_line) + token_spacing + len(next_line.first_token)
-            line_num_to_grow = 0
-            for i, this_line in enumerate(lines[1:-1]):
-                next_line = lines[i + 2]
-                this_new_text_width = len(this_line) + token_spacing + len(next_line.first_token)
-                if this_new_text_width < min_new_text_width:
-                    min_new_text_width = this_new_text_width
-                    line_num_to_grow = i
-
-            # flow tokens up for subsequent lines
-            line_num = line_num_to_grow
-            while line_num < len(lines) - 1:
-                this_line, next_line = lines[line_num], lines[line_num + 1]
-                if len(next_line) == 0:
-                    lines.pop(line_num + 1)
-                    break
-                new_line_width = len(this_line) + token_spacing + len(next_line.first_token)
-                if new_line_width <= min_new_text_width:
-                    this_line.append_token(next_line.pop_first_token())
-                    continue
-                line_num += 1
-
-        # re-compute our overall size
-        text_width = max(len(line) for line in lines)
-        text_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
+    prefix_widths = list(itertools.accumulate((width + token_spacing for width in token_widths), initial=0))
 
-    # serialize to our rectangle of text
-    return ('\n'.join(str(line) for line in lines), text_width, text_height)
+    def layout(max_line_width):
+        lines = _greedy_wrap(prefix_widths, token_spacing, max_line_width)
+        text_width = max(prefix_widths[end] - prefix_widths[start] - token_spacing for start, end in lines)
+        text_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
+        return lines, text_width, text_height
+
+    # between one token per line and everything on a single line
+    lo, hi = max(token_widths), prefix_widths[-1] - token_spacing
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _, text_width, text_height = layout(mid)
+        if text_width / text_height < desired_aspect_ratio:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    lines, text_width, text_height = layout(lo)
+    text = '\n'.join(' '.join(raw_tokens[start:end]) for start, end in lines)
+    return (text, text_width, text_height)
@@ -26,6 +26,16 @@ class UserDynamo:
     def get_user(self, user_id, strongly_consistent=False):
         return self.client.get_item(self.pk(user_id), ConsistentRead=strongly_consistent)
 
+    def batch_get_users(self, user_ids, projection_expression=None):
+        "Order not maintained, users that do not exist are omitted"
+        key_generator = (self.pk(user_id) for user_id in user_ids)
+        return self.client.batch_get(key_generator, projection_expression=projection_expression)
+
+    def get_user_statuses(self, user_ids):
+        "Returns a dict of user_id -> user status, for the users that exist"
+        items = self.batch_get_users(user_ids, projection_expression='userId, userStatus')
+        return {item['userId']: item.get('userStatus', UserStatus.ACTIVE) for item in items}
+
     def get_user_by_username(self, username):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA1PartitionKey').eq(f'username/{username}'),
@@ -336,5 +346,5 @@ class UserDynamo:
     def increment_post_forced_archiving_count(self, user_id):
         return self.client.increment_count(self.pk(user_id), 'postForcedArchivingCount')
 
-    def increment_post_viewed_by_count(self, user_id):
-        return self.client.increment_count(self.pk(user_id), 'postViewedByCount')
+    def increment_post_viewed_by_count(self, user_id, count=1):
+        return self.client.increment_count(self.pk(user_id), 'postViewedByCount', count=count)
@@ -65,6 +65,9 @@ class UserManager(TrendingManagerMixin, ManagerBase):
             self.phone_number_dynamo = UserContactAttributeDynamo(clients['dynamo'], 'userPhoneNumber')
         self.validate = UserValidate()
         self.placeholder_photos_directory = placeholder_photos_directory
+        # map of user_id to the pinpoint endpoint state to sync, a pair of (addresses, user_status),
+        # applied by pinpoint_flush()
+        self.pinpoint_buffer = {}
 
     @property
     def real_user_id(self):
@@ -74,6 +77,13 @@ class UserManager(TrendingManagerMixin, ManagerBase):
             self._real_user_id = real_user.id if real_user else None
         return self._real_user_id
 
+    def get_model(self, item_id, strongly_consistent=False):
+        return self.get_user(item_id, strongly_consistent=strongly_consistent)
+
+    def trending_filter_viewable(self, user_ids):
+        statuses = self.dynamo.get_user_statuses(user_ids)
+        return {user_id for user_id, status in statuses.items() if status == UserStatus.ACTIVE}
+
     def get_user(self, user_id, strongly_consistent=False):
         user_item = self.dynamo.get_user(user_id, strongly_consistent=strongly_consistent)
         return self.init_user(user_item) if user_item else None
@@ -262,6 +272,8 @@ class UserManager(TrendingManagerMixin, ManagerBase):
 
     def on_user_delete(self, user_id, old_item):
         self.elasticsearch_client.delete_user(user_id)
+        # drop any pending sync, so it doesn't recreate endpoints for the deleted user
+        self.pinpoint_buffer.pop(user_id, None)
         self.pinpoint_client.delete_user_endpoints(user_id)
 
     def sync_user_status_due_to(self, check_method_name, forced_by, user_id, new_item, old_item=None):
@@ -283,23 +295,41 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         self.elasticsearch_client.put_user(user_id, new_item['username'], new_item.get('fullName'))
 
     def sync_pinpoint_attribute(self, dynamo_name, pinpoint_name, user_id, new_item, old_item=None):
-        value = new_item.get(dynamo_name)
-        if value is not None:
-            self.pinpoint_client.update_user_endpoint(user_id, pinpoint_name, value)
-        else:
-            self.pinpoint_client.delete_user_endpoint(user_id, pinpoint_name)
+        addresses, user_status = self.pinpoint_buffer.get(user_id, ({}, None))
+        addresses[pinpoint_name] = new_item.get(dynamo_name)
+        self.pinpoint_buffer[user_id] = (addresses, user_status)
 
     sync_pinpoint_email = partialmethod(sync_pinpoint_attribute, 'email', 'EMAIL')
     sync_pinpoint_phone = partialmethod(sync_pinpoint_attribute, 'phoneNumber', 'SMS')
 
     def sync_pinpoint_user_status(self, user_id, new_item, old_item=None):
-        status = new_item.get('userStatus', UserStatus.ACTIVE)
-        if status == UserStatus.ACTIVE:
-            self.pinpoint_client.enable_user_endpoints(user_id)
-        if status == UserStatus.DISABLED:
-            self.pinpoint_client.disable_user_endpoints(user_id)
-        if status == UserStatus.DELETING:
-            self.pinpoint_client.delete_user_endpoints(user_id)
+        addresses, _ = self.pinpoint_buffer.get(user_id, ({}, None))
+        self.pinpoint_buffer[user_id] = (addresses, new_item.get('userStatus', UserStatus.ACTIVE))
+
+    def pinpoint_flush(self):
+        """
+        Sync the buffered endpoint state of each user to pinpoint, combining all changes to a
+        user into one sync. Returns the number of users whose endpoints were changed.
+        """
+        buffer, self.pinpoint_buffer = self.pinpoint_buffer, {}
+        changed_count = 0
+        for user_id, (addresses, user_status) in buffer.items():
+            try:
+                if user_status == UserStatus.DELETING:
+                    self.pinpoint_client.delete_user_endpoints(user_id)
+                    changed = True
+                else:
+                    endpoint_status = {UserStatus.ACTIVE: 'ACTIVE', UserStatus.DISABLED: 'INACTIVE'}.get(
+                        user_status
+                    )
+                    changed = self.pinpoint_client.sync_user_endpoints(
+                        user_id, addresses=addresses, endpoint_status=endpoint_status
+                    )
+            except Exception as err:
+                logger.exception(f'Pinpoint sync failed for user `{user_id}`: {err}')
+            else:
+                changed_count += int(changed)
+        return changed_count
 
     def sync_chats_with_unviewed_messages_count(self, chat_id, new_item=None, old_item=None):
         "Sync User.chatsWithUnviewedMessagesCount to changes to chat member items"
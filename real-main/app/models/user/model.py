@@ -288,10 +288,10 @@ class User(TrendingModelMixin):
 
     def add_photo_s3_objects(self, post):
         assert post.type == PostType.IMAGE
-        for size in image_size.JPEGS:
-            source_path = post.get_s3_image_path(size)
-            dest_path = self.get_photo_path(size, photo_post_id=post.id)
-            self.s3_uploads_client.copy_object(source_path, dest_path)
+        self.s3_uploads_client.copy_objects(
+            (post.get_s3_image_path(size), self.get_photo_path(size, photo_post_id=post.id))
+            for size in (image_size.NATIVE, *post.prefetched_thumbnail_sizes)
+        )
 
     def update_details(
         self,
@@ -1,3 +1,8 @@
+import os
+
+THUMBNAILS_ON_DEMAND_ENABLED = os.environ.get('THUMBNAILS_ON_DEMAND_ENABLED')
+
+
 # keep in sync with object created handlers defined serverless.yml
 
 
@@ -19,3 +24,8 @@ P64 = _ImageSize('64p', (114, 64))
 
 JPEGS = (NATIVE, K4, P1080, P480, P64)
 THUMBNAILS = (K4, P1080, P480, P64)  # ordered by decreasing size
+
+# Thumbnails rendered on upload, ordered by decreasing size. Any others are rendered on first request by the
+# CloudFront origin. The sizes read by the backend itself (album art, palette, hash) are always here.
+# Keep in sync with ON_DEMAND_THUMBNAIL_FILENAMES in real-cloudfront/edge_app/handlers.py
+PREFETCHED_THUMBNAILS = (P1080, P480, P64) if THUMBNAILS_ON_DEMAND_ENABLED else THUMBNAILS
@@ -0,0 +1,100 @@
+import math
+
+# colors are binned by their most significant bits per channel before quantizing, as colorthief does
+SIGNIFICANT_BITS = 5
+
+# pixels with all channels above this are ignored as background, as colorthief does
+WHITE_THRESHOLD = 250
+
+# fraction of the boxes to split by population alone, the rest are split by population times volume
+POPULATION_SPLIT_FRACTION = 0.75
+
+
+class _Box:
+    """
+    A box in color space, holding (count, binned_color) histogram entries. As in colorthief, the
+    bounds of a box come from the cuts that made it, rather than shrinking to fit its entries.
+    """
+
+    def __init__(self, entries, ranges=None):
+        self.entries = entries
+        self.count = sum(count for count, _ in entries)
+        self.ranges = ranges or [(min(c[i] for _, c in entries), max(c[i] for _, c in entries)) for i in range(3)]
+        self.volume = math.prod(hi - lo + 1 for lo, hi in self.ranges)
+
+    def is_splittable(self):
+        return len(self.entries) > 1
+
+    def split(self):
+        """
+        Split along the channel with the widest range. As in colorthief, the cut is made halfway
+        between the weighted median and the further edge of the box.
+        """
+        channel = max(range(3), key=lambda i: self.ranges[i][1] - self.ranges[i][0])
+        lo, hi = self.ranges[channel]
+        channel_counts = [0] * (hi - lo + 1)
+        for count, color in self.entries:
+            channel_counts[color[channel] - lo] += count
+        running_count = 0
+        for median, count in enumerate(channel_counts, lo):
+            running_count += count
+            if running_count * 2 > self.count:
+                break
+        left, right = median - lo, hi - median
+        cut = min(hi - 1, int(median + right / 2)) if left <= right else max(lo, int(median - 1 - left / 2))
+        # move the cut so that neither side is empty
+        while not any(channel_counts[: cut - lo + 1]):
+            cut += 1
+        while not any(channel_counts[cut - lo + 1 :]):
+            cut -= 1
+
+        lower_ranges, upper_ranges = list(self.ranges), list(self.ranges)
+        lower_ranges[channel], upper_ranges[channel] = (lo, cut), (cut + 1, hi)
+        return (
+            _Box([entry for entry in self.entries if entry[1][channel] <= cut], lower_ranges),
+            _Box([entry for entry in self.entries if entry[1][channel] > cut], upper_ranges),
+        )
+
+    def average_color(self, bin_size):
+        return tuple(
+            round((sum(count * color[i] for count, color in self.entries) / self.count + 0.5) * bin_size)
+            for i in range(3)
+        )
+
+
+def get_palette(image, color_count=5):
+    """
+    The dominant colors of the image, as a list of up to `color_count` (r, g, b) tuples, most common first.
+
+    Uses median cut quantization like colorthief, but Pillow does the per-pixel work of binning colors
+    into a histogram in C, and the cut runs over that histogram rather than over the pixels. Pass a
+    thumbnail, a few hundred pixels on a side is plenty for a palette.
+    Raises ValueError if the image has no non-background pixels.
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    shift = 8 - SIGNIFICANT_BITS
+    binned = image.point(lambda value: value >> shift)
+    white = WHITE_THRESHOLD >> shift
+    entries = [
+        (count, color)
+        for count, color in binned.getcolors(maxcolors=image.size[0] * image.size[1])
+        if not all(value >= white for value in color)
+    ]
+    if not entries:
+        raise ValueError('Image has no non-background pixels')
+
+    boxes = [_Box(entries)]
+    population_split_count = math.ceil(color_count * POPULATION_SPLIT_FRACTION)
+    for key in (lambda box: box.count, lambda box: box.count * box.volume):
+        target = population_split_count if len(boxes) < population_split_count else color_count
+        while len(boxes) < target:
+            splittable = [box for box in boxes if box.is_splittable()]
+            if not splittable:
+                break
+            box = max(splittable, key=key)
+            boxes.remove(box)
+            boxes.extend(box.split())
+
+    boxes.sort(key=lambda box: box.count, reverse=True)
+    return [box.average_color(1 << shift) for box in boxes]
@@ -0,0 +1,37 @@
+import PIL.Image
+
+# a dHash compares each pixel of a (HASH_SIZE + 1) x HASH_SIZE grayscale thumbnail with its neighbour to the right
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+HASH_HEX_DIGITS = HASH_BITS // 4
+
+
+def dhash(image):
+    """
+    The difference hash of the image, as a hex string. Images that look alike, such as re-encodes and
+    resizes of the same photo, have hashes that differ in only a few bits. Any small thumbnail works as
+    input, the image is shrunk to 9x8 pixels first.
+    """
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), resample=PIL.Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left, right = pixels[row * (HASH_SIZE + 1) + col], pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | int(left > right)
+    return f'{value:0{HASH_HEX_DIGITS}x}'
+
+
+def hamming_distance(hash1, hash2):
+    "The number of bits that differ between two hex string hashes"
+    return bin(int(hash1, 16) ^ int(hash2, 16)).count('1')
+
+
+def split_bands(image_hash, band_count):
+    """
+    Split the hex string hash into `band_count` equal hex string bands. Two hashes within a Hamming
+    distance less than `band_count` of each other are guaranteed to have at least one band in common.
+    """
+    assert HASH_HEX_DIGITS % band_count == 0, 'Hash must split evenly into bands'
+    band_digits = HASH_HEX_DIGITS // band_count
+    return [image_hash[i : i + band_digits] for i in range(0, HASH_HEX_DIGITS, band_digits)]
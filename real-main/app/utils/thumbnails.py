@@ -0,0 +1,135 @@
+import io
+import logging
+import math
+
+import PIL.Image
+import PIL.ImageOps
+
+from . import image_size
+
+logger = logging.getLogger()
+
+# How much bigger than the target size an image is kept before the final resample, when first shrinking
+# it by integer factors. Same as the default used by PIL's Image.thumbnail() and Image.resize().
+REDUCING_GAP = 2.0
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+# exif orientations for which the stored image is flipped or rotated relative to how it is displayed
+REORIENTED_ORIENTATIONS = (2, 3, 4, 5, 6, 7, 8)
+
+# exif orientations for which the stored image is rotated a quarter turn relative to how it is displayed
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def fit_dimensions(dimensions, max_dimensions):
+    """
+    The dimensions of an image of size `dimensions` after shrinking it to fit within `max_dimensions`,
+    preserving aspect ratio. Matches what PIL's Image.thumbnail() does.
+    """
+    width, height = dimensions
+    x, y = map(math.floor, max_dimensions)
+    if x >= width and y >= height:
+        return (width, height)
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return (x, y)
+
+
+def open_jpeg(fh, max_dimensions=None):
+    """
+    Decode a jpeg, applying its exif orientation.
+
+    If `max_dimensions` is provided, the caller only needs the image shrunk to fit within them. In that
+    case the jpeg decoder is allowed to scale down in the DCT domain by 1/2, 1/4 or 1/8 while decoding,
+    as long as the result is still no smaller than the fitted size, which saves most of the decode time
+    and memory for large images. The image is fully decoded before returning, so `fh` may be closed
+    afterwards. Returns a pair: (image, is_reduced).
+    """
+    image = PIL.Image.open(fh)
+    full_size = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG)
+    if max_dimensions and image.format == 'JPEG':
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            max_dimensions = tuple(reversed(max_dimensions))
+        # draft() picks the largest scale-down that keeps both dimensions at least the requested size
+        image.draft(image.mode, fit_dimensions(full_size, max_dimensions))
+    is_reduced = image.size != full_size
+    if orientation not in REORIENTED_ORIENTATIONS:
+        # exif_transpose() would return a full copy of the image, so just decode it in place instead
+        image.load()
+        return image, is_reduced
+    return PIL.ImageOps.exif_transpose(image), is_reduced
+
+
+def resize_to_fit(image, max_dimensions):
+    """
+    Shrink the image to fit within `max_dimensions`, preserving aspect ratio. The image is first
+    shrunk by integer factors with Image.reduce(), then a LANCZOS resample produces the final size.
+    Returns a new image, or the image itself if it already fits.
+    """
+    size = fit_dimensions(image.size, max_dimensions)
+    if size == image.size:
+        return image
+    return image.resize(size, resample=PIL.Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+
+def generate_thumbnails(image, max_dimensions_list):
+    """
+    Yield a thumbnail of the image for each of `max_dimensions_list`, which must be ordered by
+    decreasing size. Each thumbnail is resized from the previous one rather than from the full
+    image, and the source image is never copied or modified.
+    """
+    for max_dimensions in max_dimensions_list:
+        image = resize_to_fit(image, max_dimensions)
+        yield image
+
+
+def get_thumbnail_size(path):
+    """
+    If `path` is that of a thumbnail, which sits next to the native jpeg it is generated from
+    (for posts, profile photos and album art alike), return the thumbnail's size. Else None.
+    """
+    directory, _, filename = path.rpartition('/')
+    if not directory:
+        return None
+    return next((size for size in image_size.THUMBNAILS if size.filename == filename), None)
+
+
+def get_native_path(path):
+    "The path of the native jpeg a thumbnail at `path` is generated from"
+    return '/'.join([path.rpartition('/')[0], image_size.NATIVE.filename])
+
+
+def render_missing_thumbnail(s3_client, path):
+    """
+    Render the thumbnail at `path` from the native jpeg next to it and save it to S3, if it isn't there
+    already. Returns a boolean indicating if the thumbnail was rendered.
+    """
+    size = get_thumbnail_size(path)
+    if not size:
+        raise ValueError(f'Path `{path}` is not that of a thumbnail')
+    if s3_client.exists(path):
+        return False
+
+    native_path = get_native_path(path)
+    try:
+        fh = s3_client.get_object_data_stream(native_path)
+    except s3_client.exceptions.NoSuchKey:
+        logger.warning(f'Unable to render thumbnail `{path}`: no native jpeg at `{native_path}`')
+        return False
+    with fh:
+        image, _ = open_jpeg(io.BytesIO(fh.read()), max_dimensions=size.max_dimensions)
+
+    image = resize_to_fit(image, size.max_dimensions)
+    in_mem_file = io.BytesIO()
+    image.save(in_mem_file, format='JPEG', quality=100, icc_profile=image.info.get('icc_profile'))
+    s3_client.put_object(path, in_mem_file.getvalue(), size.content_type)
+    return True
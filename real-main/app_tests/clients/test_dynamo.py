@@ -0,0 +1,175 @@
+import concurrent.futures
+import logging
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+
+@pytest.fixture
+def sharded_items(dynamo_client):
+    "Twelve items spread over three shards, with sort keys 00 through 11"
+    items = []
+    for i in range(12):
+        item = {
+            'partitionKey': f'thing/{uuid4()}',
+            'sortKey': '-',
+            'gsiK1PartitionKey': f'thing#{i % 3}',
+            'gsiK1SortKey': f'{i:02}',
+        }
+        dynamo_client.add_item({'Item': item})
+        items.append(item)
+    yield items
+
+
+def sharded_query_kwargs_list(dynamo_client, **kwargs):
+    return [
+        {
+            'KeyConditionExpression': 'gsiK1PartitionKey = :pk',
+            'ExpressionAttributeValues': {':pk': pk},
+            'IndexName': 'GSI-K1',
+            **kwargs,
+        }
+        for pk in dynamo_client.get_shard_partition_keys('thing', 3)
+    ]
+
+
+def test_table_per_thread(dynamo_client):
+    key = {'partitionKey': f'thing/{uuid4()}', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': key})
+    assert dynamo_client.table is dynamo_client.table
+
+    # other threads get their own table resource, which works against the same table
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        table, item = executor.submit(lambda: (dynamo_client.table, dynamo_client.get_item(key))).result()
+    assert table is not dynamo_client.table
+    assert item == key
+
+
+def test_get_shard_partition_key(dynamo_client):
+    assert dynamo_client.get_shard_partition_keys('thing', 3) == ['thing#0', 'thing#1', 'thing#2']
+
+    # stable, and spread over all the shards
+    assert dynamo_client.get_shard_partition_key('thing', 'a', 3) == dynamo_client.get_shard_partition_key(
+        'thing', 'a', 3
+    )
+    pks = {dynamo_client.get_shard_partition_key('thing', str(uuid4()), 3) for _ in range(100)}
+    assert pks == {'thing#0', 'thing#1', 'thing#2'}
+
+
+def test_generate_all_query_sharded(dynamo_client, sharded_items):
+    # merged in order of the sort key, over multiple pages from each shard
+    query_kwargs_list = sharded_query_kwargs_list(dynamo_client, Limit=2)
+    items = list(dynamo_client.generate_all_query_sharded(query_kwargs_list, 'gsiK1SortKey'))
+    assert items == sharded_items
+
+    # reverse order
+    query_kwargs_list = sharded_query_kwargs_list(dynamo_client, Limit=2, ScanIndexForward=False)
+    items = list(dynamo_client.generate_all_query_sharded(query_kwargs_list, 'gsiK1SortKey'))
+    assert items == list(reversed(sharded_items))
+
+    # empty shards
+    query_kwargs_list = sharded_query_kwargs_list(dynamo_client)
+    query_kwargs_list[0]['ExpressionAttributeValues'][':pk'] = 'thing#3'
+    items = list(dynamo_client.generate_all_query_sharded(query_kwargs_list, 'gsiK1SortKey'))
+    assert items == [item for item in sharded_items if item['gsiK1PartitionKey'] != 'thing#0']
+
+
+def test_generate_all_query_pages_sharded(dynamo_client, sharded_items):
+    # each page has two items from each shard, in order of the sort key
+    query_kwargs_list = sharded_query_kwargs_list(dynamo_client)
+    pages = list(dynamo_client.generate_all_query_pages_sharded(query_kwargs_list, 'gsiK1SortKey', 6))
+    assert [[item['gsiK1SortKey'] for item in items] for items, _ in pages[:2]] == [
+        ['00', '01', '02', '03', '04', '05'],
+        ['06', '07', '08', '09', '10', '11'],
+    ]
+    assert [len(last_keys) for _, last_keys in pages] == [3] * len(pages)
+    assert pages[-1][1] == [None, None, None]
+
+    # resume from the first page
+    resumed_pages = list(
+        dynamo_client.generate_all_query_pages_sharded(
+            query_kwargs_list, 'gsiK1SortKey', 6, exclusive_start_keys=pages[0][1]
+        )
+    )
+    assert [item for items, _ in resumed_pages for item in items] == sharded_items[6:]
+
+    # resume with all shards done
+    assert (
+        list(
+            dynamo_client.generate_all_query_pages_sharded(
+                query_kwargs_list, 'gsiK1SortKey', 6, exclusive_start_keys=[None, None, None]
+            )
+        )
+        == []
+    )
+
+
+def test_decrement_count(dynamo_client, caplog):
+    key = {'partitionKey': f'thing/{uuid4()}', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': {**key, 'theCount': 5}})
+
+    assert dynamo_client.decrement_count(key, 'theCount')['theCount'] == 4
+    assert dynamo_client.decrement_count(key, 'theCount', count=3)['theCount'] == 1
+
+    # more than the counter, bottoms out at zero
+    with caplog.at_level(logging.WARNING):
+        assert dynamo_client.decrement_count(key, 'theCount', count=3)['theCount'] == 0
+    assert len(caplog.records) == 1
+    assert 'Failed to decrement theCount' in caplog.records[0].msg
+    assert 'by 3, decremented by 1 to zero instead' in caplog.records[0].msg
+
+    # already at zero
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        assert dynamo_client.decrement_count(key, 'theCount', count=2) is None
+        assert dynamo_client.decrement_count(key, 'theCount') is None
+    assert len(caplog.records) == 2
+    assert 'by 2' in caplog.records[0].msg
+    assert 'by' not in caplog.records[1].msg
+    assert dynamo_client.get_item(key)['theCount'] == 0
+
+    # no such item
+    caplog.clear()
+    missing_key = {'partitionKey': f'thing/{uuid4()}', 'sortKey': '-'}
+    with caplog.at_level(logging.WARNING):
+        assert dynamo_client.decrement_count(missing_key, 'theCount', count=2) is None
+    assert len(caplog.records) == 1
+    assert dynamo_client.get_item(missing_key) is None
+
+
+def test_decrement_count_to_zero_does_not_race_increments(dynamo_client, caplog):
+    key = {'partitionKey': f'thing/{uuid4()}', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': {**key, 'theCount': 1}})
+
+    # simulate an increment landing between the read of the counter and the decrement to zero
+    get_item = dynamo_client.get_item
+
+    def get_item_then_increment(*args, **kwargs):
+        item = get_item(*args, **kwargs)
+        if item['theCount'] == 1:
+            dynamo_client.increment_count(key, 'theCount')
+        return item
+
+    with patch.object(dynamo_client, 'get_item', side_effect=get_item_then_increment):
+        with caplog.at_level(logging.WARNING):
+            assert dynamo_client.decrement_count(key, 'theCount', count=2)['theCount'] == 0
+    assert len(caplog.records) == 0
+
+
+def test_decrement_count_retries_full_decrement_if_counter_rises(dynamo_client, caplog):
+    key = {'partitionKey': f'thing/{uuid4()}', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': {**key, 'theCount': 1}})
+
+    # simulate increments landing between the failed decrement and the read of the counter
+    get_item = dynamo_client.get_item
+
+    def increment_then_get_item(*args, **kwargs):
+        if get_item(key)['theCount'] == 1:
+            dynamo_client.increment_count(key, 'theCount', count=5)
+        return get_item(*args, **kwargs)
+
+    with patch.object(dynamo_client, 'get_item', side_effect=increment_then_get_item):
+        with caplog.at_level(logging.WARNING):
+            assert dynamo_client.decrement_count(key, 'theCount', count=3)['theCount'] == 3
+    assert len(caplog.records) == 0
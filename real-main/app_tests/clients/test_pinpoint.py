@@ -2,7 +2,7 @@
 
 import os
 import uuid
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 
 import dotenv
 import pytest
@@ -102,6 +102,107 @@ def test_send_user_apns(mocked_pinpoint_client):
     ]
 
 
+def test_send_users_apns(mocked_pinpoint_client):
+    user_id_1, user_id_2 = str(uuid.uuid4()), str(uuid.uuid4())
+    mocked_pinpoint_client.client.configure_mock(
+        **{
+            'send_users_messages.return_value': {
+                'SendUsersMessageResponse': {
+                    'Result': {
+                        user_id_1: {str(uuid.uuid4()): {'DeliveryStatus': 'SUCCESSFUL', 'StatusCode': 200}},
+                        user_id_2: {
+                            str(uuid.uuid4()): {'DeliveryStatus': 'PERMANENT_FAILURE', 'StatusCode': 400}
+                        },
+                    }
+                }
+            }
+        }
+    )
+    resp = mocked_pinpoint_client.send_users_apns([user_id_1, user_id_2], 'the-url', 'the-title')
+    assert resp == {user_id_1}
+    assert mocked_pinpoint_client.client.mock_calls == [
+        call.send_users_messages(
+            ApplicationId='testing-pinpoint-app-id',
+            SendUsersMessageRequest={
+                'MessageConfiguration': {
+                    'APNSMessage': {'Action': 'URL', 'Title': 'the-title', 'Url': 'the-url'}
+                },
+                'Users': {user_id_1: {}, user_id_2: {}},
+            },
+        )
+    ]
+
+    # too many users for one request
+    mocked_pinpoint_client.client.reset_mock()
+    user_ids = [str(uuid.uuid4()) for _ in range(mocked_pinpoint_client.max_users_per_send + 1)]
+    with pytest.raises(AssertionError):
+        mocked_pinpoint_client.send_users_apns(user_ids, 'the-url', 'the-title')
+    assert mocked_pinpoint_client.client.mock_calls == []
+
+
+def test_sync_user_endpoints(mocked_pinpoint_client):
+    user_id = str(uuid.uuid4())
+    endpoints = [
+        {'Id': 'email-1', 'ChannelType': 'EMAIL', 'Address': 'old@real.app', 'EndpointStatus': 'ACTIVE'},
+        {'Id': 'email-2', 'ChannelType': 'EMAIL', 'Address': 'new@real.app', 'EndpointStatus': 'ACTIVE'},
+        {'Id': 'sms-1', 'ChannelType': 'SMS', 'Address': '+12125551212', 'EndpointStatus': 'ACTIVE'},
+        {'Id': 'apns-1', 'ChannelType': 'APNS', 'Address': 'token', 'EndpointStatus': 'INACTIVE'},
+    ]
+    mocked_pinpoint_client.client.configure_mock(
+        **{'get_user_endpoints.return_value': {'EndpointsResponse': {'Item': endpoints}}}
+    )
+
+    # nothing to change
+    assert mocked_pinpoint_client.sync_user_endpoints(user_id, addresses={'SMS': '+12125551212'}) is False
+    assert mocked_pinpoint_client.client.mock_calls == [
+        call.get_user_endpoints(ApplicationId='testing-pinpoint-app-id', UserId=user_id)
+    ]
+
+    # keep the matching email endpoint and delete the extra, remove sms, add a new endpoint, enable all
+    mocked_pinpoint_client.client.reset_mock()
+    addresses = {'EMAIL': 'new@real.app', 'SMS': None, 'VOICE': '+14155551212'}
+    with patch.object(uuid, 'uuid4', return_value='voice-1'):
+        assert mocked_pinpoint_client.sync_user_endpoints(user_id, addresses=addresses, endpoint_status='ACTIVE')
+    user = {'UserId': user_id}
+    assert mocked_pinpoint_client.client.mock_calls == [
+        call.get_user_endpoints(ApplicationId='testing-pinpoint-app-id', UserId=user_id),
+        call.delete_endpoint(ApplicationId='testing-pinpoint-app-id', EndpointId='email-1'),
+        call.delete_endpoint(ApplicationId='testing-pinpoint-app-id', EndpointId='sms-1'),
+        call.update_endpoints_batch(
+            ApplicationId='testing-pinpoint-app-id',
+            EndpointBatchRequest={
+                'Item': [
+                    {
+                        'Id': 'voice-1',
+                        'User': user,
+                        'Address': '+14155551212',
+                        'ChannelType': 'VOICE',
+                        'EndpointStatus': 'ACTIVE',
+                    },
+                    {
+                        'Id': 'apns-1',
+                        'User': user,
+                        'Address': 'token',
+                        'ChannelType': 'APNS',
+                        'EndpointStatus': 'ACTIVE',
+                    },
+                ]
+            },
+        ),
+    ]
+
+    # disable all, in one batch
+    mocked_pinpoint_client.client.reset_mock()
+    assert mocked_pinpoint_client.disable_user_endpoints(user_id)
+    assert mocked_pinpoint_client.client.mock_calls[0] == call.get_user_endpoints(
+        ApplicationId='testing-pinpoint-app-id', UserId=user_id
+    )
+    assert len(mocked_pinpoint_client.client.mock_calls) == 2
+    items = mocked_pinpoint_client.client.mock_calls[1].kwargs['EndpointBatchRequest']['Item']
+    assert [item['Id'] for item in items] == ['email-1', 'email-2', 'sms-1']
+    assert all(item['EndpointStatus'] == 'INACTIVE' for item in items)
+
+
 @pytest.mark.skip(reason='Requires live Pinpoint Application')
 @pytest.mark.parametrize(
     'channel_type, address1, address2',
@@ -88,6 +88,27 @@ def test_delete_all_for_item(flag_dynamo):
     assert list(flag_dynamo.generate_by_item(item_id_2)) == [dummy]
 
 
+def test_delete_all_by_user(flag_dynamo):
+    user_id, item_id_1, item_id_2 = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+
+    # add a flag by another user as a distraction, should not be touched
+    flag_dynamo.add(item_id_1, 'uid-other')
+    dummy = flag_dynamo.get(item_id_1, 'uid-other')
+
+    # test deleting none
+    assert flag_dynamo.delete_all_by_user(user_id) == 0
+    assert flag_dynamo.get(item_id_1, 'uid-other') == dummy
+
+    # add two flags by the user, test deleting them
+    flag_dynamo.add(item_id_1, user_id)
+    flag_dynamo.add(item_id_2, user_id)
+    assert flag_dynamo.delete_all_by_user(user_id) == 2
+    assert flag_dynamo.get(item_id_1, user_id) is None
+    assert flag_dynamo.get(item_id_2, user_id) is None
+    assert list(flag_dynamo.generate_item_ids_by_user(user_id)) == []
+    assert flag_dynamo.get(item_id_1, 'uid-other') == dummy
+
+
 def test_generate_by_item(flag_dynamo):
     item_id = str(uuid.uuid4())
 
@@ -57,7 +57,7 @@ def test_unflag_all_by_user(manager, model1, model2, user2):
     assert list(manager.flag_dynamo.generate_item_ids_by_user(user2.id)) == []
 
     # unflag all, check
-    manager.unflag_all_by_user(user2.id)
+    assert manager.unflag_all_by_user(user2.id) == 0
     assert list(manager.flag_dynamo.generate_item_ids_by_user(user2.id)) == []
 
     # user flags both those posts
@@ -66,7 +66,7 @@ def test_unflag_all_by_user(manager, model1, model2, user2):
     assert list(manager.flag_dynamo.generate_item_ids_by_user(user2.id)) == [model1.id, model2.id]
 
     # unflag all, check
-    manager.unflag_all_by_user(user2.id)
+    assert manager.unflag_all_by_user(user2.id) == 2
     assert list(manager.flag_dynamo.generate_item_ids_by_user(user2.id)) == []
 
 
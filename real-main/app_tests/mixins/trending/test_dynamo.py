@@ -216,22 +216,85 @@ def test_delete_success(trending_dynamo):
     assert trending_dynamo.get(item_id) is None
 
 
-def test_generate_items(trending_dynamo, trending_dynamo_itype2):
+def test_generate_item_pages_and_count_items(trending_dynamo, trending_dynamo_itype2):
     # add a distraction
     trending_dynamo_itype2.add(str(uuid4()), Decimal(42))
 
-    # test generate none
-    keys = list(trending_dynamo.generate_items())
-    assert len(keys) == 0
+    # test none
+    assert trending_dynamo.count_items() == 0
+    assert list(trending_dynamo.generate_item_pages()) == [([], None)]
 
-    # test generate one
+    # test two, in correct order
     item1 = trending_dynamo.add(str(uuid4()), Decimal(42))
-    assert list(trending_dynamo.generate_items()) == [item1]
+    item2 = trending_dynamo.add(str(uuid4()), Decimal(40))
+    assert trending_dynamo.count_items() == 2
+    assert list(trending_dynamo.generate_item_pages()) == [([item2, item1], None)]
+
+    # test resuming from a page boundary
+    exclusive_start_key = {k: item2[k] for k in ('partitionKey', 'sortKey', 'gsiA4PartitionKey', 'gsiA4SortKey')}
+    assert list(trending_dynamo.generate_item_pages(exclusive_start_key=exclusive_start_key)) == [([item1], None)]
+
+
+def test_deflation_checkpoint(trending_dynamo, trending_dynamo_itype2):
+    assert trending_dynamo.get_deflation_checkpoint() is None
+
+    # set an incomplete checkpoint
+    deflation_date = pendulum.now('utc').date()
+    key = {'partitionKey': 'itype/pid', 'sortKey': 'trending'}
+    item = trending_dynamo.set_deflation_checkpoint(deflation_date, 100, 90, 5, 20, exclusive_start_key=key)
+    assert trending_dynamo.get_deflation_checkpoint() == item
+    assert trending_dynamo_itype2.get_deflation_checkpoint() is None
+    assert item.pop('partitionKey') == 'trendingDeflation/itype'
+    assert item.pop('sortKey') == '-'
+    assert item.pop('schemaVersion') == 0
+    assert item.pop('deflationDate') == str(deflation_date)
+    assert item.pop('totalCount') == 100
+    assert item.pop('deflatedCount') == 90
+    assert item.pop('deletedCount') == 5
+    assert item.pop('maxToDelete') == 20
+    assert item.pop('exclusiveStartKey') == key
+    assert item == {}
+
+    # overwrite with a completed checkpoint
+    item = trending_dynamo.set_deflation_checkpoint(deflation_date, 200, 180, 20, 20)
+    assert trending_dynamo.get_deflation_checkpoint() == item
+    assert item['totalCount'] == 200
+    assert item['exclusiveStartKey'] is None
+
+
+def test_generate_top_items(trending_dynamo, trending_dynamo_itype2):
+    # add a distraction
+    trending_dynamo_itype2.add(str(uuid4()), Decimal(42))
+    assert list(trending_dynamo.generate_top_items()) == []
+
+    # test highest score first
+    item1 = trending_dynamo.add(str(uuid4()), Decimal(40))
+    item2 = trending_dynamo.add(str(uuid4()), Decimal(42))
+    item3 = trending_dynamo.add(str(uuid4()), Decimal(41))
+    assert list(trending_dynamo.generate_top_items()) == [item2, item3, item1]
+
+
+def test_snapshot(trending_dynamo, trending_dynamo_itype2):
+    assert trending_dynamo.get_snapshot() is None
+
+    # set a snapshot
+    now = pendulum.now('utc')
+    item = trending_dynamo.set_snapshot(['id1', 'id2'], [Decimal(2), Decimal(1 / 3)], now)
+    assert trending_dynamo.get_snapshot() == item
+    assert trending_dynamo_itype2.get_snapshot() is None
+    assert item.pop('partitionKey') == 'trendingSnapshot/itype'
+    assert item.pop('sortKey') == '-'
+    assert item.pop('schemaVersion') == 0
+    assert item.pop('itemIds') == ['id1', 'id2']
+    assert item.pop('scores') == [2, Decimal('0.333333333')]
+    assert pendulum.parse(item.pop('createdAt')) == now
+    assert item == {}
 
-    # test generate two, in correct order
-    item2 = trending_dynamo.add(str(uuid4()), Decimal(54))
-    assert list(trending_dynamo.generate_items()) == [item1, item2]
+    # overwrite it with an empty one
+    item = trending_dynamo.set_snapshot([], [], now)
+    assert trending_dynamo.get_snapshot() == item
+    assert item['itemIds'] == []
 
-    # test generate three, in correct order
-    item3 = trending_dynamo.add(str(uuid4()), Decimal(40))
-    assert list(trending_dynamo.generate_items()) == [item3, item1, item2]
+    # verify mismatched lengths are rejected
+    with pytest.raises(AssertionError, match='one score per item id'):
+        trending_dynamo.set_snapshot(['id1'], [], now)
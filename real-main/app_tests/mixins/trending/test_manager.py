@@ -3,45 +3,191 @@ from decimal import Decimal
 from unittest.mock import Mock, call
 from uuid import uuid4
 
+import botocore
 import pendulum
 import pytest
 
+from app.mixins.trending.exceptions import TrendingException
+
+
+@pytest.fixture
+def user(user_manager, cognito_client):
+    user_id, username = str(uuid4()), str(uuid4())[:8]
+    cognito_client.create_verified_user_pool_entry(user_id, username, f'{username}@real.app')
+    yield user_manager.create_cognito_only_user(user_id, username)
+
 
 @pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
 def test_trending_deflate(manager):
     # test with none
     manager.trending_deflate_item = Mock()
-    resp = manager.trending_deflate()
-    assert resp == (0, 0)
+    now = pendulum.now('utc')
+    resp = manager.trending_deflate(now=now)
+    assert resp == (0, 0, 0, True)
     assert manager.trending_deflate_item.mock_calls == []
 
     # test with one
     manager.trending_deflate_item = Mock(return_value=True)
     item1 = manager.trending_dynamo.add(str(uuid4()), Decimal(2))
-    now = pendulum.now('utc')
+    now = now.add(days=1)
     resp = manager.trending_deflate(now=now)
-    assert resp == (1, 1)
+    assert resp == (1, 1, 0, True)
     assert manager.trending_deflate_item.mock_calls == [call(item1, now=now)]
 
-    # test with two, order
+    # test with two
     manager.trending_deflate_item = Mock(return_value=False)
     item2 = manager.trending_dynamo.add(str(uuid4()), Decimal(3))
-    now = pendulum.now('utc')
+    now = now.add(days=1)
     resp = manager.trending_deflate(now=now)
-    assert resp == (2, 0)
-    assert manager.trending_deflate_item.mock_calls == [call(item1, now=now), call(item2, now=now)]
+    assert resp == (2, 0, 0, True)
+    manager.trending_deflate_item.assert_has_calls([call(item1, now=now), call(item2, now=now)], any_order=True)
+    assert len(manager.trending_deflate_item.mock_calls) == 2
 
-    # test with three, order
+    # test with three
     manager.trending_deflate_item = Mock(return_value=True)
     item3 = manager.trending_dynamo.add(str(uuid4()), Decimal(2.5))
-    now = pendulum.now('utc')
+    now = now.add(days=1)
     resp = manager.trending_deflate(now=now)
-    assert resp == (3, 3)
-    assert manager.trending_deflate_item.mock_calls == [
-        call(item1, now=now),
-        call(item3, now=now),
-        call(item2, now=now),
-    ]
+    assert resp == (3, 3, 0, True)
+    manager.trending_deflate_item.assert_has_calls(
+        [call(item1, now=now), call(item2, now=now), call(item3, now=now)], any_order=True
+    )
+    assert len(manager.trending_deflate_item.mock_calls) == 3
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_deflate_already_completed_today(manager, caplog):
+    manager.trending_dynamo.add(str(uuid4()), Decimal(2), now=pendulum.parse('2020-06-07T12:00:00Z'))
+
+    # first run does the work
+    now = pendulum.parse('2020-06-08T00:07:00Z')
+    assert manager.trending_deflate(now=now) == (1, 1, 0, True)
+    checkpoint = manager.trending_dynamo.get_deflation_checkpoint()
+    assert checkpoint['deflationDate'] == '2020-06-08'
+    assert checkpoint['exclusiveStartKey'] is None
+
+    # second run the same day is a no-op
+    manager.trending_deflate_item = Mock()
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        assert manager.trending_deflate(now=now.add(minutes=15)) == (1, 0, 0, True)
+    assert manager.trending_deflate_item.mock_calls == []
+    assert len(caplog.records) == 1
+    assert 'already completed today' in caplog.records[0].msg
+
+    # a run the next day does the work again
+    manager.trending_deflate_item = Mock(return_value=True)
+    assert manager.trending_deflate(now=now.add(days=1)) == (1, 1, 0, True)
+    assert len(manager.trending_deflate_item.mock_calls) == 1
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_deflate_stop_and_resume_from_checkpoint(manager):
+    created_at = pendulum.parse('2020-06-07T12:00:00Z')
+    item_ids = [str(uuid4()) for _ in range(3)]
+    for i, item_id in enumerate(item_ids):
+        manager.trending_dynamo.add(item_id, Decimal(10 + i), now=created_at)
+
+    # force one item per page
+    query_kwargs = manager.trending_dynamo.items_query_kwargs()
+    manager.trending_dynamo.items_query_kwargs = Mock(return_value={**query_kwargs, 'Limit': 1})
+
+    # a run that should stop as soon as possible processes just one page
+    now = pendulum.parse('2020-06-08T00:07:00Z')
+    assert manager.trending_deflate(now=now, stop_at=pendulum.now('utc')) == (1, 1, 0, False)
+    assert manager.trending_dynamo.get(item_ids[0])['gsiA4SortKey'] == 5
+    assert manager.trending_dynamo.get(item_ids[1])['gsiA4SortKey'] == 11
+    checkpoint = manager.trending_dynamo.get_deflation_checkpoint()
+    assert checkpoint['exclusiveStartKey']['partitionKey'].split('/') == [manager.item_type, item_ids[0]]
+
+    # another run picks up where we left off
+    resp = manager.trending_deflate(now=now.add(minutes=15), stop_at=pendulum.now('utc').add(minutes=1))
+    assert resp == (3, 3, 0, True)
+    assert manager.trending_dynamo.get(item_ids[0])['gsiA4SortKey'] == 5
+    assert manager.trending_dynamo.get(item_ids[1])['gsiA4SortKey'] == pytest.approx(Decimal(5.5))
+    assert manager.trending_dynamo.get(item_ids[2])['gsiA4SortKey'] == 6
+    assert manager.trending_dynamo.get_deflation_checkpoint()['exclusiveStartKey'] is None
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_deflate_deletes_tail(manager):
+    assert manager.min_score_to_keep == 0.5
+    manager.min_count_to_keep = 1
+    created_at = pendulum.parse('2020-06-07T12:00:00Z')
+    now = pendulum.parse('2020-06-08T00:07:00Z')
+
+    # test none to delete
+    item1_id = str(uuid4())
+    manager.trending_dynamo.add(item1_id, Decimal(0.25), now=created_at)
+    assert manager.trending_deflate(now=now) == (1, 1, 0, True)
+    assert manager.trending_dynamo.get(item1_id)['gsiA4SortKey'] == pytest.approx(Decimal(0.125))
+
+    # test two to delete, one spared by count and one by score after deflation
+    item2_id, item3_id, item4_id = str(uuid4()), str(uuid4()), str(uuid4())
+    manager.trending_dynamo.add(item2_id, Decimal(0.5), now=now)
+    manager.trending_dynamo.add(item3_id, Decimal(0.9), now=now)
+    manager.trending_dynamo.add(item4_id, Decimal(1.1), now=now)
+    manager.min_count_to_keep = 2
+    assert manager.trending_deflate(now=now.add(days=1)) == (4, 2, 2, True)
+    assert manager.trending_dynamo.get(item1_id) is None
+    assert manager.trending_dynamo.get(item2_id) is None
+    assert manager.trending_dynamo.get(item3_id)['gsiA4SortKey'] == pytest.approx(Decimal(0.45))
+    assert manager.trending_dynamo.get(item4_id)['gsiA4SortKey'] == pytest.approx(Decimal(0.55))
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_deflate_items_adapts_to_throttling(manager, caplog):
+    manager.trending_throttling_backoff_seconds = 0
+    items = [{'partitionKey': f'{manager.item_type}/{uuid4()}'} for _ in range(3)]
+    now = pendulum.now('utc')
+    throttle_error = botocore.exceptions.ClientError(
+        {'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem'
+    )
+
+    # one item gets throttled on its first try
+    throttled = []
+
+    def deflate_item(item, now):
+        if item is items[1] and not throttled:
+            throttled.append(item)
+            raise throttle_error
+        return True
+
+    manager.trending_deflate_item = Mock(side_effect=deflate_item)
+    with caplog.at_level(logging.WARNING):
+        assert manager.trending_deflate_items(items, now, 8) == (3, 5)
+    assert len(manager.trending_deflate_item.mock_calls) == 4
+    assert len(caplog.records) == 1
+    assert 'retrying with 4 workers' in caplog.records[0].msg
+
+    # no throttling, verify workers increase up to the max
+    max_workers = manager.trending_deflate_max_workers
+    assert manager.trending_deflate_items(items, now, max_workers - 1) == (3, max_workers)
+    assert manager.trending_deflate_items(items, now, max_workers) == (3, max_workers)
+
+    # other errors are raised
+    manager.trending_deflate_item = Mock(side_effect=Exception('nope'))
+    with pytest.raises(Exception, match='nope'):
+        manager.trending_deflate_items(items, now, 8)
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_delete_tail_item(manager, caplog):
+    item_id = str(uuid4())
+    item = manager.trending_dynamo.add(item_id, Decimal(0.1))
+
+    # the item receives a boost after we read it, verify not deleted
+    manager.trending_dynamo.add_score(item_id, Decimal(1), pendulum.parse(item['lastDeflatedAt']))
+    with caplog.at_level(logging.WARNING):
+        assert manager.trending_delete_tail_item(item) is False
+    assert len(caplog.records) == 1
+    assert 'Lost race condition' in caplog.records[0].msg
+    assert manager.trending_dynamo.get(item_id)
+
+    # unchanged since read, verify deleted
+    item = manager.trending_dynamo.get(item_id)
+    assert manager.trending_delete_tail_item(item) is True
+    assert manager.trending_dynamo.get(item_id) is None
 
 
 @pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
@@ -138,93 +284,140 @@ def test_trending_deflate_item_with_recursion(manager, caplog):
 
 
 @pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
-def test_trending_delete_tail(manager):
-    assert manager.min_count_to_keep == 10 * 1000
-    assert manager.min_score_to_keep == 0.5
-    manager.trending_dynamo.delete = Mock(wraps=manager.trending_dynamo.delete)
+def test_trending_buffer_score(manager):
+    item_id1, item_id2 = str(uuid4()), str(uuid4())
+    now = pendulum.now('utc')
+    assert manager.trending_buffer == {}
 
-    # test none to delete
-    cnt = manager.trending_delete_tail(10000)
-    assert cnt == 0
-    assert manager.trending_dynamo.delete.mock_calls == []
-
-    # test one to delete
-    manager.trending_dynamo.delete.reset_mock()
-    item1_id, item1_score = str(uuid4()), Decimal(0.25)
-    manager.trending_dynamo.add(item1_id, item1_score)
-    cnt = manager.trending_delete_tail(10001)
-    assert cnt == 1
-    assert manager.trending_dynamo.delete.mock_calls == [call(item1_id, expected_score=item1_score)]
-    assert manager.trending_dynamo.get(item1_id) is None
+    # buffer one
+    manager.trending_buffer_score(item_id1, now=now)
+    assert manager.trending_buffer == {item_id1: (1, now)}
 
-    # test two to delete, one spared by count
-    manager.trending_dynamo.delete.reset_mock()
-    item1_id, item1_score = str(uuid4()), Decimal(0.33)
-    item2_id, item2_score = str(uuid4()), Decimal(0.25)
-    item3_id, item3_score = str(uuid4()), Decimal(0.4)
-    manager.trending_dynamo.add(item1_id, item1_score)
-    manager.trending_dynamo.add(item2_id, item2_score)
-    manager.trending_dynamo.add(item3_id, item3_score)
-    cnt = manager.trending_delete_tail(10002)
-    assert cnt == 2
-    assert manager.trending_dynamo.delete.mock_calls == [
-        call(item2_id, expected_score=item2_score),
-        call(item1_id, expected_score=pytest.approx(item1_score)),
-    ]
-    assert manager.trending_dynamo.get(item1_id) is None
-    assert manager.trending_dynamo.get(item2_id) is None
-    assert manager.trending_dynamo.get(item3_id)
-    manager.trending_dynamo.delete(item3_id)
-
-    # test three to delete, two spared by score
-    manager.trending_dynamo.delete.reset_mock()
-    item1_id, item1_score = str(uuid4()), Decimal(0.50)
-    item2_id, item2_score = str(uuid4()), Decimal(0.25)
-    item3_id, item3_score = str(uuid4()), Decimal(0.55)
-    manager.trending_dynamo.add(item1_id, item1_score)
-    manager.trending_dynamo.add(item2_id, item2_score)
-    manager.trending_dynamo.add(item3_id, item3_score)
-    cnt = manager.trending_delete_tail(10003)
-    assert cnt == 1
-    assert manager.trending_dynamo.delete.mock_calls == [
-        call(item2_id, expected_score=item2_score),
+    # buffer another for the same item, at an earlier time
+    manager.trending_buffer_score(item_id1, multiplier=0.5, now=now.subtract(minutes=1))
+    assert manager.trending_buffer == {item_id1: (1.5, now)}
+
+    # buffer for a different item, at a later time
+    later = now.add(minutes=1)
+    manager.trending_buffer_score(item_id2, multiplier=4, now=later)
+    manager.trending_buffer_score(item_id1, multiplier=2, now=later)
+    assert manager.trending_buffer == {item_id1: (3.5, later), item_id2: (4, later)}
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_flush(manager, caplog):
+    item_id1, item_id2, item_id3 = str(uuid4()), str(uuid4()), str(uuid4())
+    now = pendulum.now('utc')
+
+    # test with none
+    manager.trending_flush_item = Mock()
+    assert manager.trending_flush() == 0
+    assert manager.trending_flush_item.mock_calls == []
+
+    # test with some, one of which fails
+    manager.trending_flush_item = Mock(side_effect=[True, False, Exception('nope')])
+    manager.trending_buffer_score(item_id1, now=now)
+    manager.trending_buffer_score(item_id2, multiplier=2, now=now)
+    manager.trending_buffer_score(item_id1, now=now)
+    manager.trending_buffer_score(item_id3, now=now)
+    with caplog.at_level(logging.ERROR):
+        assert manager.trending_flush() == 1
+    assert manager.trending_flush_item.mock_calls == [
+        call(item_id1, 2, now=now),
+        call(item_id2, 2, now=now),
+        call(item_id3, 1, now=now),
     ]
-    assert manager.trending_dynamo.get(item1_id)
-    assert manager.trending_dynamo.get(item2_id) is None
-    assert manager.trending_dynamo.get(item3_id)
+    assert len(caplog.records) == 1
+    assert item_id3 in caplog.records[0].msg
+    assert manager.trending_buffer == {}
+
+
+def test_trending_flush_item_user(user_manager, user):
+    now = pendulum.now('utc')
+    assert user.refresh_trending_item().trending_score is None
+
+    # verify dne item is a no-op
+    assert user_manager.trending_flush_item(str(uuid4()), 2, now=now) is False
+
+    # verify the combined multiplier is applied in one go
+    assert user_manager.trending_flush_item(user.id, 3, now=now) is True
+    expected_score = 3 * 2 ** (now - now.start_of('day')).total_days()
+    assert user.refresh_trending_item().trending_score == pytest.approx(Decimal(expected_score))
 
 
 @pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
-def test_trending_delete_tail_race_condition(manager, caplog):
-    assert manager.min_count_to_keep == 10 * 1000
-    assert manager.min_score_to_keep == 0.5
-    manager.trending_dynamo.delete = Mock(wraps=manager.trending_dynamo.delete)
+def test_trending_publish_snapshot(manager):
+    # test with none
+    now = pendulum.now('utc')
+    assert manager.trending_publish_snapshot(now=now) == 0
+    snapshot = manager.trending_dynamo.get_snapshot()
+    assert snapshot['itemIds'] == []
+    assert pendulum.parse(snapshot['createdAt']) == now
+
+    # add some, one of which is not viewable, and limit the size of the snapshot
+    item_id1, item_id2, item_id3, item_id4 = str(uuid4()), str(uuid4()), str(uuid4()), str(uuid4())
+    manager.trending_dynamo.add(item_id1, Decimal(4))
+    manager.trending_dynamo.add(item_id2, Decimal(3))
+    manager.trending_dynamo.add(item_id3, Decimal(2))
+    manager.trending_dynamo.add(item_id4, Decimal(1))
+    manager.trending_filter_viewable = Mock(side_effect=lambda ids: set(ids) - {item_id2})
+    manager.trending_snapshot_size = 2
+    assert manager.trending_publish_snapshot() == 2
+    snapshot = manager.trending_dynamo.get_snapshot()
+    assert snapshot['itemIds'] == [item_id1, item_id3]
+    assert snapshot['scores'] == [4, 2]
+    assert manager.trending_filter_viewable.mock_calls == [call([item_id1, item_id2, item_id3, item_id4])]
 
-    # set up two to delete
-    manager.trending_dynamo.delete.reset_mock()
-    item1_id, item1_score = str(uuid4()), Decimal(0.33)
-    item2_id, item2_score, item2_lda = str(uuid4()), Decimal(0.25), pendulum.now('utc')
-    manager.trending_dynamo.add(item1_id, item1_score)
-    manager.trending_dynamo.add(item2_id, item2_score, now=item2_lda)
 
-    # mock the generator so we can make a race condition
-    items = list(manager.trending_dynamo.generate_items())
-    manager.trending_dynamo.generate_items = Mock(return_value=(i for i in items))
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_get_snapshot(manager):
+    manager.trending_filter_viewable = Mock(side_effect=set)
+    item_id1, item_id2 = str(uuid4()), str(uuid4())
+    manager.trending_dynamo.add(item_id1, Decimal(2))
 
-    # add more score to one of them to create the rce condition
-    manager.trending_dynamo.add_score(item2_id, Decimal(1), item2_lda)
+    # nothing published yet, verify empty
+    now = pendulum.now('utc')
+    assert manager.trending_get_snapshot(now=now) == []
 
-    # do the tail delete
-    with caplog.at_level(logging.WARNING):
-        cnt = manager.trending_delete_tail(10002)
-    assert cnt == 1
-    assert len(caplog.records) == 1
-    assert 'not deleting trending' in caplog.records[0].msg
-    assert item2_id in caplog.records[0].msg
+    # publish, verify the in-process copy is used until the ttl expires
+    manager.trending_publish_snapshot()
+    assert manager.trending_get_snapshot(now=now) == []
+    assert manager.trending_get_snapshot(now=now + manager.trending_snapshot_ttl) == [item_id1]
 
-    assert manager.trending_dynamo.delete.mock_calls == [
-        call(item2_id, expected_score=pytest.approx(item2_score)),  # calls, but fails
-        call(item1_id, expected_score=pytest.approx(item1_score)),
-    ]
-    assert manager.trending_dynamo.get(item1_id) is None
-    assert manager.trending_dynamo.get(item2_id)
+    # publish again, verify picked up once the ttl expires again
+    manager.trending_dynamo.add(item_id2, Decimal(3))
+    manager.trending_publish_snapshot()
+    now = now + manager.trending_snapshot_ttl
+    assert manager.trending_get_snapshot(now=now) == [item_id1]
+    assert manager.trending_get_snapshot(now=now + manager.trending_snapshot_ttl) == [item_id2, item_id1]
+
+    # verify no dynamo reads while the in-process copy is warm
+    manager.trending_dynamo = Mock()
+    assert manager.trending_get_snapshot(now=now + manager.trending_snapshot_ttl) == [item_id2, item_id1]
+    assert manager.trending_dynamo.mock_calls == []
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_get_page(manager):
+    item_ids = [str(uuid4()) for _ in range(5)]
+    manager.trending_get_snapshot = Mock(return_value=item_ids)
+
+    # test paging through
+    assert manager.trending_get_page(limit=2) == {'items': item_ids[:2], 'nextToken': '2'}
+    assert manager.trending_get_page(limit=2, next_token='2') == {'items': item_ids[2:4], 'nextToken': '4'}
+    assert manager.trending_get_page(limit=2, next_token='4') == {'items': item_ids[4:], 'nextToken': None}
+    assert manager.trending_get_page() == {'items': item_ids, 'nextToken': None}
+
+    # test past the end, and bad tokens
+    assert manager.trending_get_page(next_token='10') == {'items': [], 'nextToken': None}
+    for next_token in ('-1', 'not-an-offset'):
+        with pytest.raises(TrendingException, match='Invalid nextToken'):
+            manager.trending_get_page(next_token=next_token)
+
+
+def test_trending_filter_viewable_user(user_manager, user):
+    user_id_dne = str(uuid4())
+    assert user_manager.trending_filter_viewable([user.id, user_id_dne]) == {user.id}
+
+    user.disable()
+    assert user_manager.trending_filter_viewable([user.id, user_id_dne]) == set()
@@ -107,6 +107,26 @@ def test_generate_views(view_dynamo):
     assert pks[1] == {'partitionKey': 'itype/iid', 'sortKey': 'view/uid1'}
 
 
+def test_batch_get_views(view_dynamo):
+    item_id1, item_id2, item_id3, user_id = str(uuid4()), str(uuid4()), str(uuid4()), str(uuid4())
+    assert view_dynamo.batch_get_views([], user_id) == []
+    assert view_dynamo.batch_get_views([item_id1, item_id2], user_id) == []
+
+    # add some views, including one by another user
+    view1 = view_dynamo.add_view(item_id1, user_id, 1, pendulum.now('utc'))
+    view3 = view_dynamo.add_view(item_id3, user_id, 3, pendulum.now('utc'))
+    view_dynamo.add_view(item_id2, str(uuid4()), 2, pendulum.now('utc'))
+    views = view_dynamo.batch_get_views([item_id1, item_id2, item_id3], user_id)
+    assert sorted(views, key=lambda v: v['viewCount']) == [view1, view3]
+
+    # verify more than fit in a single batch
+    item_ids = [str(uuid4()) for _ in range(150)]
+    for item_id in item_ids:
+        view_dynamo.add_view(item_id, user_id, 1, pendulum.now('utc'))
+    views = view_dynamo.batch_get_views(item_ids + [item_id2], user_id)
+    assert sorted(v['partitionKey'].split('/')[1] for v in views) == sorted(item_ids)
+
+
 def test_delete_view(view_dynamo):
     # add two views, verify
     item_id1, user_id1 = [str(uuid4()), str(uuid4())]
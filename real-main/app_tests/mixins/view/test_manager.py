@@ -1,5 +1,7 @@
+from unittest.mock import Mock
 from uuid import uuid4
 
+import pendulum
 import pytest
 
 from app.models.post.enums import PostType
@@ -35,6 +37,26 @@ def test_record_views_implemented(manager):
     manager.record_views(['iid1', 'iid2'], 'uid')
 
 
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['post_manager', 'chat_manager']))
+def test_record_view_counts(manager):
+    item_id1, item_id2, item_id3, user_id = str(uuid4()), str(uuid4()), str(uuid4()), str(uuid4())
+    viewed_at = pendulum.now('utc')
+    manager.view_dynamo.add_view(item_id2, user_id, 1, viewed_at)
+
+    # record a mix of first and repeat views
+    later = viewed_at.add(minutes=1)
+    assert manager.record_view_counts({item_id1: 2, item_id2: 3}, user_id, later) == {item_id1}
+    assert manager.view_dynamo.get_view(item_id1, user_id)['viewCount'] == 2
+    assert manager.view_dynamo.get_view(item_id2, user_id)['viewCount'] == 4
+    assert manager.view_dynamo.get_view(item_id2, user_id)['lastViewedAt'] == later.to_iso8601_string()
+
+    # verify losing a race to add a view is handled
+    manager.view_dynamo.batch_get_views = Mock(return_value=[])
+    assert manager.record_view_counts({item_id1: 1, item_id3: 1}, user_id, later) == {item_id3}
+    assert manager.view_dynamo.get_view(item_id1, user_id)['viewCount'] == 3
+    assert manager.view_dynamo.get_view(item_id3, user_id)['viewCount'] == 1
+
+
 @pytest.mark.parametrize(
     'manager, model1, model2',
     [
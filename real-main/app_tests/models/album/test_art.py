@@ -49,3 +49,33 @@ def test_generate_zoomed_grid_failures(cnt):
 def test_generate_zoomed_grid_success(cnt, size):
     assert (image := art.generate_zoomed_grid(get_images(cnt)))
     assert image.size == size
+
+
+@pytest.mark.parametrize('cnt, dimensions', [[4, (1920, 1080)], [9, (1280, 720)], [16, (960, 540)]])
+def test_get_cell_dimensions(cnt, dimensions):
+    assert art.get_cell_dimensions(cnt) == dimensions
+
+
+@pytest.mark.parametrize('cnt', [0, 1, 5, 17])
+def test_get_cell_dimensions_failures(cnt):
+    with pytest.raises(AssertionError):
+        art.get_cell_dimensions(cnt)
+
+
+def test_generate_zoomed_cell():
+    for image in get_images(5):
+        assert art.generate_zoomed_cell(image, (960, 540)).size == (960, 540)
+
+    # already the right size, no resize
+    image = PIL.Image.new('RGB', (960, 540))
+    assert art.generate_zoomed_cell(image, (960, 540)) is image
+
+
+def test_generate_grid_matches_generate_zoomed_grid():
+    images = get_images(9)
+    cells = [art.generate_zoomed_cell(image, art.get_cell_dimensions(9)) for image in images]
+    assert art.generate_grid(cells).tobytes() == art.generate_zoomed_grid(images).tobytes()
+
+    # cells must already be zoomed
+    with pytest.raises(AssertionError, match='Unexpected cell size'):
+        art.generate_grid(images)
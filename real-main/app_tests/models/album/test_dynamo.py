@@ -293,14 +293,18 @@ def test_set_and_clear_delete_at(album_dynamo, album_item, caplog):
     delete_at = pendulum.now('utc')
     new_item = album_dynamo.set_delete_at(album_id, delete_at)
     assert album_dynamo.get_album(album_id) == new_item
-    assert new_item['gsiK1PartitionKey'] == 'album'
+    assert new_item['gsiK1PartitionKey'] == album_dynamo.client.get_shard_partition_key(
+        'album', f'album/{album_id}', 4
+    )
     assert pendulum.parse(new_item['gsiK1SortKey']) == delete_at
 
     # verify we can set it again
     delete_at = pendulum.now('utc')
     new_item = album_dynamo.set_delete_at(album_id, delete_at)
     assert album_dynamo.get_album(album_id) == new_item
-    assert new_item['gsiK1PartitionKey'] == 'album'
+    assert new_item['gsiK1PartitionKey'] == album_dynamo.client.get_shard_partition_key(
+        'album', f'album/{album_id}', 4
+    )
     assert pendulum.parse(new_item['gsiK1SortKey']) == delete_at
 
     # verify we can clear it
@@ -1,3 +1,4 @@
+import logging
 from unittest.mock import call, patch
 from uuid import uuid4
 
@@ -94,17 +95,64 @@ def test_on_album_add_edit_sync_delete_at(album_manager, user, album):
 
 
 def test_on_post_album_change_update_art_if_needed(album_manager, user, album):
-    # check for a new album
+    # check for a new album, art update is buffered until flushed
     with patch.object(album_manager, 'init_album') as init_album_mock:
         album_manager.on_album_posts_last_updated_at_change_update_art_if_needed(album.id, new_item=album.item)
+        assert init_album_mock.mock_calls == []
+        assert album_manager.art_flush() == 1
     assert init_album_mock.mock_calls == [call(album.item), call().update_art_if_needed()]
+    assert album_manager.art_buffer == {}
 
-    # check for a changed album
+    # check for a changed album, several times in a row, results in just one update
+    new_item = {**album.item, 'postsLastUpdatedAt': pendulum.now('utc').to_iso8601_string()}
     with patch.object(album_manager, 'init_album') as init_album_mock:
         album_manager.on_album_posts_last_updated_at_change_update_art_if_needed(
             album.id, new_item=album.item, old_item={'un': 'used'}
         )
-    assert init_album_mock.mock_calls == [call(album.item), call().update_art_if_needed()]
+        album_manager.on_album_posts_last_updated_at_change_update_art_if_needed(
+            album.id, new_item=new_item, old_item=album.item
+        )
+        assert album_manager.art_flush() == 1
+    assert init_album_mock.mock_calls == [call(new_item), call().update_art_if_needed()]
+
+
+def test_art_flush_logs_failures(album_manager, user, album, caplog):
+    album_manager.on_album_posts_last_updated_at_change_update_art_if_needed(album.id, new_item=album.item)
+    with patch.object(album_manager, 'init_album', side_effect=Exception('nope')):
+        with caplog.at_level(logging.ERROR):
+            assert album_manager.art_flush() == 1
+    assert len(caplog.records) == 1
+    assert f'Art update failed for album `{album.id}`: nope' in caplog.records[0].msg
+    assert album_manager.art_buffer == {}
+
+
+def test_on_post_album_change_delete_art_tiles(album_manager, album1, album2, post):
+    s3_client = album_manager.clients['s3_uploads']
+    tile_path = album1.get_art_tile_path(post.id, (1920, 1080))
+    other_tile_path = album1.get_art_tile_path('pid', (1920, 1080))
+    s3_client.put_object(other_tile_path, b'other', 'image/jpeg')
+    in_album_item = {**post.item, 'albumId': album1.id, 'gsiK3SortKey': 0}
+
+    # post was not in an album, or stays ranked in the same album: tiles left alone
+    for old_item, new_item in [
+        (post.item, in_album_item),
+        (in_album_item, {**in_album_item, 'gsiK3SortKey': 0.5}),
+    ]:
+        s3_client.put_object(tile_path, b'tile', 'image/jpeg')
+        album_manager.on_post_album_change_delete_art_tiles(post.id, new_item=new_item, old_item=old_item)
+        assert s3_client.exists(tile_path)
+
+    # post moved to another album, archived (rank -1), removed from the album, or deleted: tiles deleted
+    for new_item in [
+        {**in_album_item, 'albumId': album2.id},
+        {**in_album_item, 'gsiK3SortKey': -1},
+        post.item,
+        None,
+    ]:
+        s3_client.put_object(tile_path, b'tile', 'image/jpeg')
+        album_manager.on_post_album_change_delete_art_tiles(post.id, new_item=new_item, old_item=in_album_item)
+        assert not s3_client.exists(tile_path)
+        assert s3_client.exists(other_tile_path)
 
 
 def test_on_post_album_change_update_counts_and_timestamps(album_manager, user, album1, album2, post):
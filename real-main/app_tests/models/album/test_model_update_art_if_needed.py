@@ -1,10 +1,15 @@
 import base64
+import io
+import logging
 import uuid
 from decimal import Decimal
 from os import path
+from unittest.mock import patch
 
+import PIL.Image
 import pytest
 
+from app.models.album import art
 from app.models.post.enums import PostType
 from app.utils import image_size
 
@@ -152,6 +157,52 @@ def test_changing_post_rank_changes_art(album, post1, post2, s3_uploads_client):
         assert not s3_uploads_client.exists(old_path)
 
 
+def test_art_tiles_cached(album, post1, post2, post3, post4, s3_uploads_client):
+    post_dynamo = post1.dynamo
+    for rank, post in enumerate([post1, post2, post3, post4]):
+        post_dynamo.set_album_id(post.item, album.id, album_rank=Decimal(rank) / 10)
+
+    # update art, check tiles were cached for the image posts but not the text-only post
+    cell_dimensions = (1920, 1080)
+    with patch.object(art, 'generate_zoomed_cell', wraps=art.generate_zoomed_cell) as zoom_mock:
+        album.update_art_if_needed()
+    assert len(zoom_mock.mock_calls) == 4
+    assert (first_art_hash := album.item['artHash'])
+    for post in (post1, post2, post3):
+        assert s3_uploads_client.exists(album.get_art_tile_path(post.id, cell_dimensions))
+    assert not s3_uploads_client.exists(album.get_art_tile_path(post4.id, cell_dimensions))
+
+    # reorder the posts, check only the text-only post's tile was regenerated
+    post_dynamo.set_album_rank(post3.id, Decimal('-0.1'))
+    with patch.object(art, 'generate_zoomed_cell', wraps=art.generate_zoomed_cell) as zoom_mock:
+        album.update_art_if_needed()
+    assert len(zoom_mock.mock_calls) == 1
+    assert album.item['artHash'] != first_art_hash
+    for size in image_size.JPEGS:
+        assert s3_uploads_client.exists(album.get_art_image_path(size))
+
+    # tiles are deleted along with the album art
+    album.s3_uploads_client.delete_objects_with_prefix(album.get_art_image_path_prefix())
+    assert not s3_uploads_client.exists(album.get_art_tile_path(post1.id, cell_dimensions))
+
+
+def test_art_tile_wrong_size_regenerated(album, post1, s3_uploads_client, caplog):
+    cell_dimensions = (960, 540)
+    path = album.get_art_tile_path(post1.id, cell_dimensions)
+    in_mem_file = io.BytesIO()
+    PIL.Image.new('RGB', (10, 10)).save(in_mem_file, format='JPEG')
+    s3_uploads_client.put_object(path, in_mem_file.getvalue(), 'image/jpeg')
+
+    with caplog.at_level(logging.WARNING):
+        tile = album.get_art_tile(post1, cell_dimensions)
+    assert tile.size == cell_dimensions
+    assert len(caplog.records) == 1
+    assert 'has wrong size' in caplog.records[0].msg
+
+    # the regenerated tile was saved back to S3
+    assert PIL.Image.open(s3_uploads_client.get_object_data_stream(path)).size == cell_dimensions
+
+
 def test_1_4_9_16_posts_in_album(
     album,
     post1,
@@ -241,3 +292,21 @@ def test_1_4_9_16_posts_in_album(
     assert native_path_16 != native_path_9
     assert (native_data_16 := album.s3_uploads_client.get_object_data_stream(native_path_16).read())
     assert native_data_16 != native_data_9
+
+
+def test_update_art_if_needed_one_post_without_4k_thumbnail(album, post1, s3_uploads_client, monkeypatch):
+    # as if the post was uploaded with its 4K thumbnail left to be rendered on demand
+    monkeypatch.setattr(post1, 'prefetched_thumbnail_sizes', (image_size.P1080, image_size.P480, image_size.P64))
+    s3_uploads_client.delete_object(post1.get_image_path(image_size.K4))
+    monkeypatch.setattr(album, 'prefetched_thumbnail_sizes', post1.prefetched_thumbnail_sizes)
+    post1.dynamo.set_album_id(post1.item, album.id, album_rank=0)
+
+    with patch.object(album.post_manager, 'batch_get_posts', return_value=[post1]):
+        album.update_art_if_needed()
+    assert album.item['artHash']
+    native_path = album.get_art_image_path(image_size.NATIVE)
+    native_image = PIL.Image.open(s3_uploads_client.get_object_data_stream(native_path))
+    assert native_image.size == PIL.Image.open(grant_path).size
+    assert not s3_uploads_client.exists(album.get_art_image_path(image_size.K4))
+    for size in (image_size.P1080, image_size.P480, image_size.P64):
+        assert s3_uploads_client.exists(album.get_art_image_path(size))
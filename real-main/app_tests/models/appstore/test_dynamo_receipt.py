@@ -65,7 +65,9 @@ def test_add_verification_attempt(appstore_receipt_dynamo):
     assert pendulum.parse(new_item.pop('verifyAttemptsLastAt')) == at_2
     assert new_item.pop('verifyAttemptsCount') == 2
     assert new_item.pop('verifyAttemptsStatusCodes') == [status_code_1, status_code_2]
-    assert new_item.pop('gsiK1PartitionKey') == 'appStoreReceipt'
+    assert new_item.pop('gsiK1PartitionKey') == appstore_receipt_dynamo.client.get_shard_partition_key(
+        'appStoreReceipt', key['partitionKey'], 4
+    )
     assert pendulum.parse(new_item.pop('gsiK1SortKey')) == at_3
     assert new_item == item
 
@@ -102,6 +102,21 @@ def test_get_block_status(block_manager, blocker_user, blocked_user):
     assert block_manager.get_block_status(blocker_user.id, blocked_user.id) == 'NOT_BLOCKING'
 
 
+def test_get_block_statuses(block_manager, blocker_user, blocked_user):
+    block_manager.block(blocker_user, blocked_user)
+    pairs = [
+        (blocker_user.id, blocker_user.id),
+        (blocker_user.id, blocked_user.id),
+        (blocked_user.id, blocker_user.id),
+    ]
+    assert block_manager.get_block_statuses(iter(pairs)) == {
+        pairs[0]: 'SELF',
+        pairs[1]: 'BLOCKING',
+        pairs[2]: 'NOT_BLOCKING',
+    }
+    assert block_manager.get_block_statuses([]) == {}
+
+
 def test_cant_double_block(block_manager, blocker_user, blocked_user):
     block_item = block_manager.block(blocker_user, blocked_user)
     assert block_item['blockerUserId'] == blocker_user.id
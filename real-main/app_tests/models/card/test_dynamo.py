@@ -1,3 +1,4 @@
+import logging
 from uuid import uuid4
 
 import pendulum
@@ -83,7 +84,7 @@ def test_add_card_maximal(card_dynamo):
         'gsiA2SortKey': user_id,
         'gsiA3PartitionKey': f'card/{comment_id}',
         'gsiA3SortKey': '-',
-        'gsiK1PartitionKey': 'card',
+        'gsiK1PartitionKey': card_dynamo.client.get_shard_partition_key('card', card_id, 8),
         'gsiK1SortKey': notify_user_at.to_iso8601_string() + '/' + user_id,
     }
 
@@ -124,6 +125,75 @@ def test_clear_notify_user_at(card_dynamo):
     assert card_dynamo.get_card(card_id) == card_item
 
 
+def test_clear_notify_user_at_card_dne(card_dynamo, caplog):
+    card_id = str(uuid4())
+    with pytest.raises(card_dynamo.client.exceptions.ConditionalCheckFailedException):
+        card_dynamo.clear_notify_user_at(card_id)
+
+    with caplog.at_level(logging.WARNING):
+        assert card_dynamo.clear_notify_user_at(card_id, fail_soft=True) is None
+    assert len(caplog.records) == 1
+    assert f'DNE card `{card_id}`' in caplog.records[0].msg
+    assert card_dynamo.get_card(card_id) is None
+
+
+def test_retry_notify_user_at(card_dynamo, caplog):
+    card_id = str(uuid4())
+    now = pendulum.now('utc')
+    org_card_item = card_dynamo.add_card(card_id, 'uid', 't', 'a', notify_user_at=now)
+
+    # push back notify user at twice, verify the attempts are counted and the shard is kept
+    card_item = card_dynamo.retry_notify_user_at(card_id, 'uid', now + pendulum.duration(minutes=1))
+    assert card_item['gsiK1PartitionKey'] == org_card_item['gsiK1PartitionKey']
+    assert card_item['gsiK1SortKey'] == (now + pendulum.duration(minutes=1)).to_iso8601_string() + '/uid'
+    assert card_item['notifyUserAttemptCount'] == 1
+    card_item = card_dynamo.retry_notify_user_at(card_id, 'uid', now + pendulum.duration(minutes=2))
+    assert card_item['gsiK1SortKey'] == (now + pendulum.duration(minutes=2)).to_iso8601_string() + '/uid'
+    assert card_item['notifyUserAttemptCount'] == 2
+    assert card_dynamo.get_card(card_id) == card_item
+
+    # clearing notify user at clears the attempts too
+    card_item = card_dynamo.clear_notify_user_at(card_id)
+    assert 'notifyUserAttemptCount' not in card_item
+
+    # verify can't retry once cleared, or if the card dne
+    with caplog.at_level(logging.WARNING):
+        assert card_dynamo.retry_notify_user_at(card_id, 'uid', now) is None
+        assert card_dynamo.retry_notify_user_at('cid-dne', 'uid', now) is None
+    assert len(caplog.records) == 2
+    assert all('Failed to retry notifyUserAt' in rec.msg for rec in caplog.records)
+    assert card_dynamo.get_card(card_id) == card_item
+    assert card_dynamo.get_card('cid-dne') is None
+
+
+def test_batch_get_cards(card_dynamo):
+    card_id_1, card_id_2 = str(uuid4()), str(uuid4())
+    card_item_1 = card_dynamo.add_card(card_id_1, 'uid', 't', 'a')
+    card_item_2 = card_dynamo.add_card(card_id_2, 'uid', 't', 'a')
+    assert card_dynamo.batch_get_cards([]) == []
+    card_items = card_dynamo.batch_get_cards([card_id_1, str(uuid4()), card_id_2])
+    assert sorted(card_items, key=lambda item: item['partitionKey']) == sorted(
+        [card_item_1, card_item_2], key=lambda item: item['partitionKey']
+    )
+
+
+def test_notify_users_checkpoint(card_dynamo):
+    assert card_dynamo.get_notify_users_checkpoint() is None
+
+    now = pendulum.now('utc')
+    keys = [
+        {'partitionKey': 'card/cid', 'sortKey': '-', 'gsiK1PartitionKey': 'card#0', 'gsiK1SortKey': 'sk'},
+        None,
+    ]
+    card_dynamo.set_notify_users_checkpoint(keys, now)
+    checkpoint = card_dynamo.get_notify_users_checkpoint()
+    assert checkpoint['exclusiveStartKeys'] == keys
+    assert checkpoint['updatedAt'] == now.to_iso8601_string()
+
+    card_dynamo.set_notify_users_checkpoint(None, now)
+    assert card_dynamo.get_notify_users_checkpoint()['exclusiveStartKeys'] is None
+
+
 def test_delete_card(card_dynamo):
     # delelte a card that DNE
     card_id = str(uuid4())
@@ -327,3 +397,46 @@ def test_generate_card_ids_by_notify_user_at_only_user_ids(card_dynamo):
             card_dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=[user_id_1, user_id_2, user_id_3])
         )
     ) == sorted([card_id_10, card_id_20, card_id_21, card_id_30, card_id_31, card_id_32])
+
+
+def test_notify_user_at_sharded(card_dynamo):
+    now = pendulum.now('utc')
+    card_ids = [str(uuid4()) for _ in range(32)]
+    for card_id in card_ids:
+        card_dynamo.add_card(card_id, 'uid', 't', 'a', notify_user_at=now)
+
+    # cards are spread over the shards
+    partition_keys = {card_dynamo.get_card(card_id)['gsiK1PartitionKey'] for card_id in card_ids}
+    assert len(partition_keys) > 1
+    assert partition_keys <= {f'card#{shard}' for shard in range(card_dynamo.notify_user_at_shard_count)}
+
+    # all shards are gathered
+    assert sorted(card_dynamo.generate_card_ids_by_notify_user_at(now)) == sorted(card_ids)
+
+
+def test_generate_card_key_pages_by_notify_user_at(card_dynamo):
+    card_dynamo.notify_user_at_shard_count = 2
+    now = pendulum.now('utc')
+    card_ids = [str(uuid4()) for _ in range(5)]
+    for i, card_id in enumerate(card_ids):
+        card_dynamo.add_card(card_id, 'uid', 't', 'a', notify_user_at=now - pendulum.duration(seconds=5 - i))
+    card_dynamo.add_card(str(uuid4()), 'uid', 't', 'a', notify_user_at=now + pendulum.duration(seconds=1))
+
+    # each page has at most one card from each shard, ordered by notify user at
+    pages = list(card_dynamo.generate_card_key_pages_by_notify_user_at(now, page_size=2))
+    for items, last_keys in pages:
+        assert len(items) <= 2
+        assert len(last_keys) == 2
+        assert [item['gsiK1SortKey'] for item in items] == sorted(item['gsiK1SortKey'] for item in items)
+    assert sorted(item['partitionKey'] for items, _ in pages for item in items) == sorted(
+        f'card/{card_id}' for card_id in card_ids
+    )
+    assert pages[-1][1] == [None, None]
+
+    # resume from the first page
+    resumed_pages = list(
+        card_dynamo.generate_card_key_pages_by_notify_user_at(now, page_size=2, exclusive_start_keys=pages[0][1])
+    )
+    assert sorted(item['partitionKey'] for items, _ in resumed_pages for item in items) == sorted(
+        item['partitionKey'] for items, _ in pages[1:] for item in items
+    )
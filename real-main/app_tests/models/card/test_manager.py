@@ -1,3 +1,4 @@
+import logging
 from unittest.mock import call, patch
 from uuid import uuid4
 
@@ -233,7 +234,9 @@ def test_delete_by_comment(card_manager, user1, user2, TestCardTemplate):
 
 def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTemplate):
     # configure mock to claim all apns-sending attempts succeeded
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': True})
+    pinpoint_client.configure_mock(
+        **{'send_users_apns.side_effect': lambda user_ids, *args, **kwargs: set(user_ids)}
+    )
     now = pendulum.now('utc')
 
     # add a card with a notification in the far future
@@ -272,7 +275,7 @@ def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTempla
     cnts = card_manager.notify_users()
     assert cnts == (1, 1)
     assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a3', 't3', body=None),
+        call.send_users_apns([user.id], 'a3', 't3', body=None),
     ]
     assert card1.item == card1.refresh_item().item
     assert card2.item == card2.refresh_item().item
@@ -296,10 +299,13 @@ def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTempla
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users()
     assert cnts == (2, 2)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a5', 't5', body='s'),
-        call.send_user_apns(user2.id, 'a4', 't4', body=None),
-    ]
+    assert sorted(pinpoint_client.mock_calls, key=str) == sorted(
+        [
+            call.send_users_apns([user.id], 'a5', 't5', body='s'),
+            call.send_users_apns([user2.id], 'a4', 't4', body=None),
+        ],
+        key=str,
+    )
     assert card1.item == card1.refresh_item().item
     assert card2.item == card2.refresh_item().item
     assert card4.refresh_item().notify_user_at is None
@@ -315,12 +321,12 @@ def test_notify_users_failed_notification(card_manager, pinpoint_client, user, T
     assert card.notify_user_at == now
 
     # configure our mock to report a failed message send
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': False})
+    pinpoint_client.configure_mock(**{'send_users_apns.return_value': set()})
 
     # run notificiations, verify attempted send and correct DB changes upon failure
     cnts = card_manager.notify_users()
     assert cnts == (1, 0)
-    assert pinpoint_client.mock_calls == [call.send_user_apns(user.id, 'a', 't', body=None)]
+    assert pinpoint_client.mock_calls == [call.send_users_apns([user.id], 'a', 't', body=None)]
     org_item = card.item
     card.refresh_item()
     assert 'gsiK1PartitionKey' not in card.item
@@ -332,7 +338,9 @@ def test_notify_users_failed_notification(card_manager, pinpoint_client, user, T
 
 def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2, user3, TestCardTemplate):
     # configure mock to claim all apns-sending attempts succeeded
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': True})
+    pinpoint_client.configure_mock(
+        **{'send_users_apns.side_effect': lambda user_ids, *args, **kwargs: set(user_ids)}
+    )
 
     # add one notification for each user in immediate past, verify they're there
     card1 = card_manager.add_or_update_card(
@@ -352,10 +360,13 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users(only_usernames=[user.username, user3.username])
     assert cnts == (2, 2)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a1', 't1', body=None),
-        call.send_user_apns(user3.id, 'a3', 't3', body=None),
-    ]
+    assert sorted(pinpoint_client.mock_calls, key=str) == sorted(
+        [
+            call.send_users_apns([user.id], 'a1', 't1', body=None),
+            call.send_users_apns([user3.id], 'a3', 't3', body=None),
+        ],
+        key=str,
+    )
     assert card1.refresh_item().notify_user_at is None
     assert card2.refresh_item().notify_user_at
     assert card3.refresh_item().notify_user_at is None
@@ -377,7 +388,7 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     cnts = card_manager.notify_users(only_usernames=[user2.username])
     assert cnts == (1, 1)
     assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user2.id, 'a2', 't2', body=None),
+        call.send_users_apns([user2.id], 'a2', 't2', body=None),
     ]
     assert card1.refresh_item().notify_user_at
     assert card2.refresh_item().notify_user_at is None
@@ -403,11 +414,163 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users()
     assert cnts == (3, 3)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a1', 't1', body=None),
-        call.send_user_apns(user2.id, 'a2', 't2', body=None),
-        call.send_user_apns(user3.id, 'a3', 't3', body=None),
-    ]
+    assert sorted(pinpoint_client.mock_calls, key=str) == sorted(
+        [
+            call.send_users_apns([user.id], 'a1', 't1', body=None),
+            call.send_users_apns([user2.id], 'a2', 't2', body=None),
+            call.send_users_apns([user3.id], 'a3', 't3', body=None),
+        ],
+        key=str,
+    )
     assert card1.refresh_item().notify_user_at is None
     assert card2.refresh_item().notify_user_at is None
     assert card3.refresh_item().notify_user_at is None
+
+
+def test_notify_users_groups_identical_messages(
+    card_manager, pinpoint_client, user1, user2, user3, TestCardTemplate
+):
+    pinpoint_client.configure_mock(
+        **{'send_users_apns.side_effect': lambda user_ids, *args, **kwargs: set(user_ids)}
+    )
+    before = pendulum.duration(seconds=-1)
+    for user in (user1, user2, user3):
+        card_manager.add_or_update_card(
+            TestCardTemplate(user.id, title='t', action='a', notify_user_after=before)
+        )
+    card_manager.add_or_update_card(TestCardTemplate(user1.id, title='t', action='b', notify_user_after=before))
+
+    # one request for the three identical messages, one for the other
+    assert card_manager.notify_users() == (4, 4)
+    assert sorted(pinpoint_client.mock_calls, key=str) == sorted(
+        [
+            call.send_users_apns(sorted([user1.id, user2.id, user3.id]), 'a', 't', body=None),
+            call.send_users_apns([user1.id], 'b', 't', body=None),
+        ],
+        key=str,
+    )
+
+    # requests are split at pinpoint's max users per request
+    pinpoint_client.reset_mock()
+    card_manager.notify_users_max_users_per_send = 2
+    for user in (user1, user2, user3):
+        card_manager.add_or_update_card(
+            TestCardTemplate(user.id, title='t', action='a', notify_user_after=before)
+        )
+    assert card_manager.notify_users() == (3, 3)
+    assert len(pinpoint_client.mock_calls) == 2
+    assert sorted(len(c.args[0]) for c in pinpoint_client.mock_calls) == [1, 2]
+
+
+def test_notify_users_send_failure(card_manager, pinpoint_client, user, user2, TestCardTemplate, caplog):
+    before = pendulum.duration(seconds=-1)
+    card1 = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t1', action='a', notify_user_after=before)
+    )
+    card2 = card_manager.add_or_update_card(
+        TestCardTemplate(user2.id, title='t2', action='a', notify_user_after=before)
+    )
+
+    def send_users_apns(user_ids, url, title, body=None):
+        if title == 't1':
+            raise Exception('nope')
+        return set(user_ids)
+
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': send_users_apns})
+    now = pendulum.now('utc')
+    with caplog.at_level(logging.ERROR):
+        assert card_manager.notify_users(now=now) == (2, 1)
+    assert len(caplog.records) == 1
+    assert f'Failed to send notifications to users `[\'{user.id}\']`: nope' in caplog.records[0].msg
+
+    # only the card in the failed request is left to be retried, after a backoff
+    assert card1.refresh_item().notify_user_at == now + card_manager.notify_users_retry_backoff
+    assert card1.item['notifyUserAttemptCount'] == 1
+    assert card2.refresh_item().notify_user_at is None
+
+    # a run before the backoff is up doesn't retry it
+    pinpoint_client.reset_mock()
+    pinpoint_client.configure_mock(
+        **{'send_users_apns.side_effect': lambda user_ids, *args, **kwargs: set(user_ids)}
+    )
+    assert card_manager.notify_users(now=now + pendulum.duration(minutes=1)) == (0, 0)
+    assert pinpoint_client.mock_calls == []
+
+    # a run after the backoff is up retries it
+    assert card_manager.notify_users(now=card1.notify_user_at + pendulum.duration(seconds=1)) == (1, 1)
+    assert pinpoint_client.mock_calls == [call.send_users_apns([user.id], 'a', 't1', body=None)]
+    assert card1.refresh_item().notify_user_at is None
+    assert 'notifyUserAttemptCount' not in card1.item
+
+
+def test_notify_users_send_failure_gives_up(card_manager, pinpoint_client, user, TestCardTemplate, caplog):
+    card = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t', action='a', notify_user_after=pendulum.duration(seconds=-1))
+    )
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': Exception('nope')})
+
+    # each failure pushes the card back by double the backoff of the last one
+    backoffs = []
+    for attempt_count in range(1, card_manager.notify_users_max_attempts):
+        now = card.notify_user_at + pendulum.duration(seconds=1)
+        assert card_manager.notify_users(now=now) == (1, 0)
+        backoffs.append(card.refresh_item().notify_user_at - now)
+        assert card.item['notifyUserAttemptCount'] == attempt_count
+    assert backoffs == [
+        card_manager.notify_users_retry_backoff * 2 ** i
+        for i in range(card_manager.notify_users_max_attempts - 1)
+    ]
+
+    # the last attempt fails too, the card is given up on
+    with caplog.at_level(logging.WARNING):
+        assert card_manager.notify_users(now=card.notify_user_at + pendulum.duration(seconds=1)) == (1, 0)
+    assert 'Giving up on notifying user of card' in caplog.records[-1].msg
+    assert card.refresh_item().notify_user_at is None
+    assert 'notifyUserAttemptCount' not in card.item
+    assert len(pinpoint_client.mock_calls) == card_manager.notify_users_max_attempts
+
+
+def test_notify_users_pages_and_checkpoint(
+    card_manager, pinpoint_client, user, user2, user3, TestCardTemplate, caplog
+):
+    # one shard, so the pages are in order of notifyUserAt
+    card_manager.dynamo.notify_user_at_shard_count = 1
+    pinpoint_client.configure_mock(
+        **{'send_users_apns.side_effect': lambda user_ids, *args, **kwargs: set(user_ids)}
+    )
+    cards = [
+        card_manager.add_or_update_card(
+            TestCardTemplate(u.id, title='t', action=u.id, notify_user_after=pendulum.duration(seconds=-3 + i))
+        )
+        for i, u in enumerate((user, user2, user3))
+    ]
+    card_manager.notify_users_page_size = 1
+
+    # a run that stops early after the first page leaves a checkpoint
+    assert card_manager.notify_users(stop_at=pendulum.now('utc')) == (1, 1)
+    assert cards[0].refresh_item().notify_user_at is None
+    assert cards[1].refresh_item().notify_user_at
+    assert cards[2].refresh_item().notify_user_at
+    assert card_manager.dynamo.get_notify_users_checkpoint()['exclusiveStartKeys']
+
+    # the next run resumes from the checkpoint and gets through the rest
+    pinpoint_client.reset_mock()
+    assert card_manager.notify_users() == (2, 2)
+    assert len(pinpoint_client.mock_calls) == 2
+    assert cards[1].refresh_item().notify_user_at is None
+    assert cards[2].refresh_item().notify_user_at is None
+    assert card_manager.dynamo.get_notify_users_checkpoint()['exclusiveStartKeys'] is None
+
+    # with nothing due, the checkpoint is left alone
+    pinpoint_client.reset_mock()
+    with patch.object(card_manager.dynamo, 'set_notify_users_checkpoint') as set_checkpoint_mock:
+        assert card_manager.notify_users() == (0, 0)
+    assert set_checkpoint_mock.mock_calls == []
+    assert pinpoint_client.mock_calls == []
+
+    # a checkpoint from before a change in the number of shards is ignored
+    card_manager.dynamo.set_notify_users_checkpoint([None, None], pendulum.now('utc'))
+    with caplog.at_level(logging.WARNING):
+        assert card_manager.notify_users() == (0, 0)
+    assert len(caplog.records) == 1
+    assert 'wrong number of shards' in caplog.records[0].msg
@@ -1,4 +1,5 @@
 import logging
+from unittest.mock import patch
 from uuid import uuid4
 
 import pendulum
@@ -87,6 +88,73 @@ def test_update_last_message_activity_at(cm_dynamo, caplog):
     assert cm_dynamo.get(chat_id, user_id) == item
 
 
+def test_update_last_message_activity_at_increment_messages_unviewed_count(cm_dynamo, caplog):
+    chat_id, user_id = 'cid', 'uid1'
+    now = pendulum.now('utc')
+    cm_dynamo.client.transact_write_items([cm_dynamo.transact_add(chat_id, user_id, now)])
+
+    # update both in one write
+    new_now = pendulum.now('utc')
+    item = cm_dynamo.update_last_message_activity_at(
+        chat_id, user_id, new_now, increment_messages_unviewed_count=True
+    )
+    assert item['gsiK2SortKey'] == 'chat/' + new_now.to_iso8601_string()
+    assert item['messagesUnviewedCount'] == 1
+    assert cm_dynamo.get(chat_id, user_id) == item
+
+    # same timestamp, as for messages added in the same instant, verify still one write
+    with patch.object(cm_dynamo.client, 'update_item', wraps=cm_dynamo.client.update_item) as update_item_mock:
+        with caplog.at_level(logging.WARNING):
+            item = cm_dynamo.update_last_message_activity_at(
+                chat_id, user_id, new_now, increment_messages_unviewed_count=True
+            )
+    assert len(update_item_mock.mock_calls) == 1
+    assert len(caplog.records) == 0
+    assert item['gsiK2SortKey'] == 'chat/' + new_now.to_iso8601_string()
+    assert item['messagesUnviewedCount'] == 2
+
+    # older timestamp, verify only the count is incremented
+    before = new_now.subtract(seconds=10)
+    with patch.object(cm_dynamo.client, 'update_item', wraps=cm_dynamo.client.update_item) as update_item_mock:
+        with caplog.at_level(logging.WARNING):
+            item = cm_dynamo.update_last_message_activity_at(
+                chat_id, user_id, before, increment_messages_unviewed_count=True
+            )
+    assert len(update_item_mock.mock_calls) == 2
+    assert len(caplog.records) == 1
+    assert 'last message activity' in caplog.records[0].msg
+    assert item['gsiK2SortKey'] == 'chat/' + new_now.to_iso8601_string()
+    assert item['messagesUnviewedCount'] == 3
+
+    # older timestamp without the increment, verify no change
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        assert cm_dynamo.update_last_message_activity_at(chat_id, user_id, before) is None
+    assert len(caplog.records) == 1
+    assert cm_dynamo.get(chat_id, user_id) == item
+
+
+def test_update_last_message_activity_at_member_dne(cm_dynamo, caplog):
+    # the member left the chat while a message was being fanned out
+    chat_id, user_id = 'cid', 'uid1'
+    now = pendulum.now('utc')
+    cm_dynamo.client.transact_write_items([cm_dynamo.transact_add(chat_id, user_id, now)])
+    cm_dynamo.delete(chat_id, user_id)
+
+    # verify nothing is written back, with or without the increment
+    with caplog.at_level(logging.WARNING):
+        assert cm_dynamo.update_last_message_activity_at(chat_id, user_id, pendulum.now('utc')) is None
+        assert (
+            cm_dynamo.update_last_message_activity_at(
+                chat_id, user_id, pendulum.now('utc'), increment_messages_unviewed_count=True
+            )
+            is None
+        )
+    assert len(caplog.records) == 3
+    assert all(rec.levelname == 'WARNING' for rec in caplog.records)
+    assert cm_dynamo.get(chat_id, user_id) is None
+
+
 def test_generate_user_ids_by_chat(cm_dynamo):
     chat_id = 'cid'
 
@@ -85,8 +85,10 @@ def test_on_message_added(chat_manager, chat, user1, user2, caplog, user1_messag
     assert all('Failed' in rec.msg for rec in caplog.records)
     assert all('last message activity' in rec.msg for rec in caplog.records)
     assert all(chat.id in rec.msg for rec in caplog.records)
-    assert user1.id in caplog.records[1].msg
-    assert user2.id in caplog.records[2].msg
+    # members are updated concurrently, so in no particular order
+    assert sorted(
+        user_id for user_id in (user1.id, user2.id) for rec in caplog.records[1:] if user_id in rec.msg
+    ) == (sorted([user1.id, user2.id]))
 
     # verify final state
     chat.refresh_item()
@@ -135,6 +137,7 @@ def test_on_chat_message_delete(chat_manager, chat, user1, user2, caplog, user1_
 
     # react to a message delete, verify counts drop as expected
     chat_manager.on_chat_message_delete(user1_message.id, old_item=user1_message.item)
+    chat_manager.deleted_messages_flush()
     assert chat.refresh_item().item['messagesCount'] == 0
     assert chat.member_dynamo.get(chat.id, user1.id).get('messagesUnviewedCount', 0) == 0
     assert chat.member_dynamo.get(chat.id, user2.id).get('messagesUnviewedCount', 0) == 0
@@ -142,6 +145,7 @@ def test_on_chat_message_delete(chat_manager, chat, user1, user2, caplog, user1_
     # react to a message delete, verify fails softly and final state
     with caplog.at_level(logging.WARNING):
         chat_manager.on_chat_message_delete(user1_message.id, old_item=user1_message.item)
+        chat_manager.deleted_messages_flush()
     assert len(caplog.records) == 2
     assert 'Failed to decrement messagesCount' in caplog.records[0].msg
     assert 'Failed to decrement messagesUnviewedCount' in caplog.records[1].msg
@@ -178,24 +182,28 @@ def test_on_message_delete_handles_chat_views_correctly(chat, user1, user2, chat
 
     # react to deleting message2, check counts
     chat_manager.on_chat_message_delete(message2.id, old_item=message2.item)
+    chat_manager.deleted_messages_flush()
     assert chat.refresh_item().item['messagesCount'] == 3
     assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 1
     assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 1
 
     # react to deleting message3, check counts
     chat_manager.on_chat_message_delete(message3.id, old_item=message3.item)
+    chat_manager.deleted_messages_flush()
     assert chat.refresh_item().item['messagesCount'] == 2
     assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 1
     assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 0
 
     # react to deleting message1, check counts
     chat_manager.on_chat_message_delete(message1.id, old_item=message1.item)
+    chat_manager.deleted_messages_flush()
     assert chat.refresh_item().item['messagesCount'] == 1
     assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 1
     assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 0
 
     # react to deleting message4, check counts
     chat_manager.on_chat_message_delete(message4.id, old_item=message4.item)
+    chat_manager.deleted_messages_flush()
     assert chat.refresh_item().item['messagesCount'] == 0
     assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 0
     assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 0
@@ -231,3 +239,41 @@ def test_on_chat_delete_delete_memberships(chat_manager, user1, user2, chat):
     chat_manager.on_chat_delete_delete_memberships(group_chat.id, old_item=group_chat.item)
     assert sum(1 for _ in chat_manager.member_dynamo.generate_chat_ids_by_user(user1.id)) == 0
     assert sum(1 for _ in chat_manager.member_dynamo.generate_chat_ids_by_user(user2.id)) == 0
+
+
+def test_deleted_messages_flush_batches_view_reads(
+    chat_manager, chat, user1, user2, chat_message_manager, caplog
+):
+    # user2 has three unviewed messages from user1, user1 has one unviewed message from user2
+    messages = [
+        chat_message_manager.add_chat_message(str(uuid4()), 'lore', chat.id, author.id)
+        for author in (user1, user1, user2, user1)
+    ]
+    for message in messages:
+        chat_manager.on_chat_message_add(message.id, new_item=message.item)
+    assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 1
+    assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 3
+
+    # delete them all in one stream batch, verify views are read in one batch and counts decremented
+    for message in messages:
+        chat_manager.on_chat_message_delete(message.id, old_item=message.item)
+    assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 3
+    batch_get = chat_manager.view_dynamo.client.batch_get
+    with patch.object(chat_manager.view_dynamo.client, 'batch_get', wraps=batch_get) as batch_get_mock:
+        assert chat_manager.deleted_messages_flush() == 2
+    assert len(batch_get_mock.mock_calls) == 1
+    assert chat.member_dynamo.get(chat.id, user1.id)['messagesUnviewedCount'] == 0
+    assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 0
+    assert chat_manager.deleted_messages_buffer == {}
+
+    # a counter that is already lower than the decrement is bottomed out at zero
+    chat_manager.member_dynamo.increment_messages_unviewed_count(chat.id, user2.id)
+    for message in messages[:2]:
+        chat_manager.on_chat_message_delete(message.id, old_item=message.item)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        assert chat_manager.deleted_messages_flush() == 1
+    assert len(caplog.records) == 1
+    assert 'Failed to decrement messagesUnviewedCount' in caplog.records[0].msg
+    assert user2.id in caplog.records[0].msg
+    assert chat.member_dynamo.get(chat.id, user2.id)['messagesUnviewedCount'] == 0
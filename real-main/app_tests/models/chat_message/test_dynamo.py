@@ -199,3 +199,33 @@ def test_increment_decrement_count(
         assert caplog.records[0].levelname == 'WARNING'
         assert all(x in caplog.records[0].msg for x in ['Failed to decrement', attribute_name, message_id])
         assert chat_message_dynamo.get_chat_message(message_id)[attribute_name] == 0
+
+
+def test_recent_messages_crud_cycle(chat_message_dynamo):
+    chat_id = str(uuid4())
+    item = chat_message_dynamo.add_chat_message('mid', chat_id, 'uid', 'lore', [], pendulum.now('utc'))
+    message = chat_message_dynamo.compact_chat_message(item)
+    assert message == {k: item[k] for k in ('messageId', 'chatId', 'userId', 'text', 'textTags', 'createdAt')}
+    assert chat_message_dynamo.get_recent_messages(chat_id) is None
+
+    # can only be created at version zero
+    assert chat_message_dynamo.put_recent_messages(chat_id, [message], 'from', 1) is False
+    assert chat_message_dynamo.put_recent_messages(chat_id, [message], 'from', 0) is True
+    assert chat_message_dynamo.put_recent_messages(chat_id, [], 'from', 0) is False
+    assert chat_message_dynamo.get_recent_messages(chat_id) == {
+        'partitionKey': f'chat/{chat_id}',
+        'sortKey': 'recentMessages',
+        'schemaVersion': 0,
+        'version': 0,
+        'fromCreatedAt': 'from',
+        'messages': [message],
+    }
+
+    # each write must be the next version
+    assert chat_message_dynamo.put_recent_messages(chat_id, [], 'from', 2) is False
+    assert chat_message_dynamo.put_recent_messages(chat_id, [], 'from', 1) is True
+    assert chat_message_dynamo.put_recent_messages(chat_id, [message], 'from', 1) is False
+    assert chat_message_dynamo.get_recent_messages(chat_id)['messages'] == []
+
+    assert chat_message_dynamo.delete_recent_messages(chat_id)
+    assert chat_message_dynamo.get_recent_messages(chat_id) is None
@@ -1,6 +1,8 @@
 import logging
+from unittest import mock
 from uuid import uuid4
 
+import pendulum
 import pytest
 
 
@@ -61,7 +63,125 @@ def test_on_chat_delete_delete_messages(chat_message_manager, user1, chat):
     assert chat_message_manager.get_chat_message(message_id_1)
     assert chat_message_manager.get_chat_message(message_id_2)
 
-    # trigger, verify messages are gone
+    # cache the messages
+    for message_id in (message_id_1, message_id_2):
+        chat_message_manager.on_chat_message_change_sync_recent_messages(
+            message_id, new_item=chat_message_manager.dynamo.get_chat_message(message_id)
+        )
+    assert chat_message_manager.recent_messages_flush() == 1
+    assert chat_message_manager.dynamo.get_recent_messages(chat.id)
+
+    # trigger, verify messages and the cache are gone
     chat_message_manager.on_chat_delete_delete_messages(chat.id, old_item=chat.item)
     assert chat_message_manager.get_chat_message(message_id_1) is None
     assert chat_message_manager.get_chat_message(message_id_2) is None
+    assert chat_message_manager.dynamo.get_recent_messages(chat.id) is None
+
+
+def add_message(chat_message_manager, chat, user, at):
+    "Add a message and buffer its stream INSERT event"
+    message = chat_message_manager.add_chat_message(str(uuid4()), 'lore', chat.id, user.id, now=at)
+    chat_message_manager.on_chat_message_change_sync_recent_messages(message.id, new_item=message.item)
+    return message
+
+
+def cached_message_ids(chat_message_manager, chat):
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    return [m['messageId'] for m in item['messages']] if item else None
+
+
+def test_recent_messages_flush_add_edit_delete(chat_message_manager, chat, user1):
+    now = pendulum.now('utc')
+    assert chat_message_manager.recent_messages_flush() == 0
+
+    # messages added in the same batch go into one write, in order of creation
+    message2 = add_message(chat_message_manager, chat, user1, now + pendulum.duration(seconds=2))
+    message1 = add_message(chat_message_manager, chat, user1, now + pendulum.duration(seconds=1))
+    with mock.patch.object(
+        chat_message_manager.dynamo, 'put_recent_messages', wraps=chat_message_manager.dynamo.put_recent_messages
+    ) as put_recent_messages:
+        assert chat_message_manager.recent_messages_flush() == 1
+    assert put_recent_messages.call_count == 1
+    assert cached_message_ids(chat_message_manager, chat) == [message1.id, message2.id]
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    assert item['fromCreatedAt'] == message1.item['createdAt']
+    assert item['messages'][0] == chat_message_manager.dynamo.compact_chat_message(message1.item)
+    assert 'gsiA1PartitionKey' not in item['messages'][0]
+
+    # a message older than the cache does not go in it
+    message0 = add_message(chat_message_manager, chat, user1, now)
+    assert chat_message_manager.recent_messages_flush() == 0
+    assert cached_message_ids(chat_message_manager, chat) == [message1.id, message2.id]
+
+    # edits replace the cached message, deletes remove it
+    old_item = message1.item.copy()
+    message1.edit('new text')
+    chat_message_manager.on_chat_message_change_sync_recent_messages(
+        message1.id, old_item=old_item, new_item=message1.item
+    )
+    chat_message_manager.on_chat_message_change_sync_recent_messages(message2.id, old_item=message2.item)
+    assert chat_message_manager.recent_messages_flush() == 1
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    assert [m['messageId'] for m in item['messages']] == [message1.id]
+    assert item['messages'][0]['text'] == 'new text'
+    assert item['messages'][0]['lastEditedAt'] == message1.item['lastEditedAt']
+    assert item['version'] == 1
+
+    # edits and deletes of messages not in the cache, and deletes with no cache, do nothing
+    chat_message_manager.on_chat_message_change_sync_recent_messages(message0.id, old_item=message0.item)
+    assert chat_message_manager.recent_messages_flush() == 0
+    chat_message_manager.dynamo.delete_recent_messages(chat.id)
+    chat_message_manager.on_chat_message_change_sync_recent_messages(message1.id, old_item=message1.item)
+    assert chat_message_manager.recent_messages_flush() == 0
+    assert chat_message_manager.dynamo.get_recent_messages(chat.id) is None
+
+
+def test_recent_messages_flush_add_then_edit_in_same_batch(chat_message_manager, chat, user1):
+    message = add_message(chat_message_manager, chat, user1, pendulum.now('utc'))
+    old_item = message.item.copy()
+    message.edit('new text')
+    chat_message_manager.on_chat_message_change_sync_recent_messages(
+        message.id, old_item=old_item, new_item=message.item
+    )
+    assert chat_message_manager.recent_messages_flush() == 1
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    assert [m['text'] for m in item['messages']] == ['new text']
+
+
+def test_recent_messages_flush_size_bounds(chat_message_manager, chat, user1):
+    chat_message_manager.recent_messages_count = 3
+    now = pendulum.now('utc')
+    messages = [
+        add_message(chat_message_manager, chat, user1, now + pendulum.duration(seconds=i)) for i in range(5)
+    ]
+    assert chat_message_manager.recent_messages_flush() == 1
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    assert [m['messageId'] for m in item['messages']] == [m.id for m in messages[2:]]
+    assert item['fromCreatedAt'] == messages[2].item['createdAt']
+
+    # trimmed down by encoded size too
+    chat_message_manager.recent_messages_max_bytes = 1
+    add_message(chat_message_manager, chat, user1, now + pendulum.duration(seconds=5))
+    assert chat_message_manager.recent_messages_flush() == 1
+    item = chat_message_manager.dynamo.get_recent_messages(chat.id)
+    assert len(item['messages']) == 1
+    assert item['fromCreatedAt'] == item['messages'][0]['createdAt']
+
+
+def test_recent_messages_flush_lost_race(chat_message_manager, chat, user1, caplog):
+    add_message(chat_message_manager, chat, user1, pendulum.now('utc'))
+
+    # someone else writes the cache between our read and our write, we retry
+    put_recent_messages = chat_message_manager.dynamo.put_recent_messages
+    with mock.patch.object(chat_message_manager.dynamo, 'put_recent_messages', side_effect=[False, True]):
+        assert chat_message_manager.recent_messages_flush() == 1
+
+    # we keep losing, the failure is logged and the rest of the chats are still processed
+    chat_message_manager.dynamo.put_recent_messages = put_recent_messages
+    add_message(chat_message_manager, chat, user1, pendulum.now('utc'))
+    with mock.patch.object(chat_message_manager.dynamo, 'put_recent_messages', return_value=False):
+        with caplog.at_level(logging.WARNING):
+            assert chat_message_manager.recent_messages_flush() == 0
+    assert len(caplog.records) == 1
+    assert 'Recent messages cache sync failed' in caplog.records[0].msg
+    assert chat.id in caplog.records[0].msg
@@ -7,6 +7,7 @@ import pytest
 
 from app.models.block.enums import BlockStatus
 from app.models.chat_message.exceptions import ChatMessageException
+from app.models.chat_message.model import DecimalJsonEncoder
 from app.models.post.enums import PostType
 
 
@@ -35,6 +36,10 @@ def user3(user_manager, cognito_client):
     yield user_manager.create_cognito_only_user(user_id, username)
 
 
+user4 = user3
+user5 = user3
+
+
 @pytest.fixture
 def chat(chat_manager, user1, user2):
     yield chat_manager.add_direct_chat('cid', user1.id, user2.id)
@@ -115,6 +120,43 @@ def test_get_author_encoded(chat_message_manager, user1, user2, user3, chat, blo
     assert message.get_author_encoded(user1.id) is None
 
 
+def test_cache_authors_encoded(chat_message_manager, user1, user2, user3, chat, block_manager, follower_manager):
+    message = chat_message_manager.add_chat_message('mid', 'lore', chat.id, user1.id)
+    follower_manager.request_to_follow(user2, user1)
+    block_manager.block(user3, user1)
+    user_ids = [user1.id, user2.id, user3.id]
+    expected = {user_id: message.get_author_encoded(user_id) for user_id in user_ids}
+    assert expected[user2.id]
+    assert json.loads(expected[user2.id])['followedStatus'] == 'FOLLOWING'
+    assert expected[user3.id] is None
+
+    # cached values are identical to the uncached ones, and the cache is used from then on
+    message.cache_authors_encoded(user_ids)
+    assert message.authors_encoded == expected
+    message.block_manager = mock.Mock()
+    assert {user_id: message.get_author_encoded(user_id) for user_id in user_ids} == expected
+    assert message.block_manager.mock_calls == []
+
+    # system messages have no author
+    message = chat_message_manager.add_chat_message('mid2', 'lore', chat.id, None)
+    message.cache_authors_encoded(user_ids)
+    assert message.authors_encoded == {}
+    assert message.get_author_encoded(user2.id) is None
+
+
+def test_cache_authors_encoded_once_per_statuses(chat_message_manager, user1, user2, user3, user4, user5, chat):
+    message = chat_message_manager.add_chat_message('mid', 'lore', chat.id, user1.id)
+    user_ids = [user2.id, user3.id, user4.id, user5.id]
+    expected = {user_id: message.get_author_encoded(user_id) for user_id in user_ids}
+
+    # the users all have the same statuses with the author, so the author is serialized just once
+    with mock.patch('app.models.chat_message.model.json.dumps', wraps=json.dumps) as json_dumps:
+        message.cache_authors_encoded(user_ids)
+    assert len([c for c in json_dumps.mock_calls if c.kwargs.get('cls') is DecimalJsonEncoder]) == 1
+    assert message.authors_encoded == expected
+    assert len({id(encoded) for encoded in message.authors_encoded.values()}) == 1
+
+
 def test_trigger_notifications_direct(message, chat, user1, user2, appsync_client):
     message.appsync = mock.Mock()
     message.trigger_notifications('ntype')
@@ -69,6 +69,25 @@ def test_get_follow_status(follower_manager, users):
     assert follower_manager.get_follow_status(their_user.id, our_user.id) == 'NOT_FOLLOWING'
 
 
+def test_get_follow_statuses(follower_manager, users, other_users):
+    our_user, their_user = users
+    other_user, _ = other_users
+    follower_manager.request_to_follow(our_user, their_user)
+    pairs = [
+        (our_user.id, our_user.id),
+        (our_user.id, their_user.id),
+        (their_user.id, our_user.id),
+        (other_user.id, their_user.id),
+    ]
+    assert follower_manager.get_follow_statuses(iter(pairs)) == {
+        pairs[0]: 'SELF',
+        pairs[1]: 'FOLLOWING',
+        pairs[2]: 'NOT_FOLLOWING',
+        pairs[3]: 'NOT_FOLLOWING',
+    }
+    assert follower_manager.get_follow_statuses([]) == {}
+
+
 def test_request_to_follow_public_user(follower_manager, users):
     our_user, their_user = users
 
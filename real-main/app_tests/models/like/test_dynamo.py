@@ -109,6 +109,25 @@ def test_delete_like(like_dynamo):
     assert like_dynamo.get_like(liked_by_user_id, post_id) is None
 
 
+def test_delete_likes(like_dynamo):
+    post_item_1 = {'postId': 'pid1', 'postedByUserId': 'pbuid'}
+    post_item_2 = {'postId': 'pid2', 'postedByUserId': 'pbuid'}
+    like_dynamo.add_like('luid1', post_item_1, LikeStatus.ONYMOUSLY_LIKED)
+    like_dynamo.add_like('luid2', post_item_1, LikeStatus.ANONYMOUSLY_LIKED)
+    like_dynamo.add_like('luid1', post_item_2, LikeStatus.ONYMOUSLY_LIKED)
+
+    # test deleting none
+    assert like_dynamo.delete_likes([]) == 0
+
+    # delete by items and by keys, verify the other like is not touched
+    like_item = like_dynamo.get_like('luid1', 'pid1')
+    like_key = {k: like_dynamo.get_like('luid2', 'pid1')[k] for k in ('partitionKey', 'sortKey')}
+    assert like_dynamo.delete_likes(iter([like_item, like_key])) == 2
+    assert like_dynamo.get_like('luid1', 'pid1') is None
+    assert like_dynamo.get_like('luid2', 'pid1') is None
+    assert like_dynamo.get_like('luid1', 'pid2')
+
+
 def test_generate_of_post(like_dynamo):
     post_id = 'pid'
 
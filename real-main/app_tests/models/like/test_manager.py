@@ -292,3 +292,38 @@ def test_dislike_all_by_user_from_user(like_manager, user1, user2, user1_posts,
     # check likes
     assert list(like_manager.dynamo.generate_of_post(post1.id)) == []
     assert list(like_manager.dynamo.generate_of_post(post2.id)) == []
+
+
+def test_bulk_dislike(like_manager, post_manager, user1, user2, user1_posts):
+    post1, post2 = user1_posts
+    like_manager.like_post(user1, post1, LikeStatus.ANONYMOUSLY_LIKED)
+    like_manager.like_post(user2, post1, LikeStatus.ONYMOUSLY_LIKED)
+    like_manager.like_post(user1, post2, LikeStatus.ONYMOUSLY_LIKED)
+    for like_item in like_manager.dynamo.generate_by_liked_by(user1.id):
+        post_manager.on_like_add(like_item['postId'], like_item)
+    for like_item in like_manager.dynamo.generate_by_liked_by(user2.id):
+        post_manager.on_like_add(like_item['postId'], like_item)
+    post_manager.like_counts_flush()
+    assert post1.refresh_item().item['onymousLikeCount'] == 1
+    assert post1.item['anonymousLikeCount'] == 1
+    assert post2.refresh_item().item['onymousLikeCount'] == 1
+
+    # dislike by items, likes are gone and counts are left to the stream
+    like_items = list(like_manager.dynamo.generate_by_liked_by(user1.id))
+    assert like_manager.bulk_dislike(iter(like_items)) == 2
+    assert list(like_manager.dynamo.generate_by_liked_by(user1.id)) == []
+    assert post1.refresh_item().item['anonymousLikeCount'] == 1
+
+    # the deletes come through the stream, and are counted with one rollup per post
+    for like_item in like_items:
+        post_manager.on_like_delete(like_item['postId'], like_item)
+    assert post_manager.like_counts_flush() == 2
+    assert post1.refresh_item().item['onymousLikeCount'] == 1
+    assert post1.item['anonymousLikeCount'] == 0
+    assert post2.refresh_item().item['onymousLikeCount'] == 0
+
+    # dislike by keys
+    assert like_manager.bulk_dislike([like_manager.dynamo.pk(user2.id, post1.id)]) == 1
+    assert like_manager.dynamo.get_like(user2.id, post1.id) is None
+
+    assert like_manager.bulk_dislike([]) == 0
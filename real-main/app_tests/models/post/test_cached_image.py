@@ -0,0 +1,90 @@
+import io
+
+import PIL.Image
+
+from app.models.post import cached_image
+from app.models.post.cached_image import CachedImage, ImageData
+from app.utils import image_size
+
+
+class ChunkedStream:
+    "Mimics a non-seekable S3 body"
+
+    def __init__(self, data):
+        self.fh = io.BytesIO(data)
+        self.read_sizes = []
+
+    def read(self, amt=None):
+        self.read_sizes.append(amt)
+        return self.fh.read(amt)
+
+
+def test_image_data_shares_bytes_io_buffer():
+    data = b'somedata' * 10
+    image_data = ImageData.from_stream(io.BytesIO(data))
+    assert image_data._data is data
+    assert image_data._temp_file is None
+
+
+def test_image_data_small_stream_held_in_memory(monkeypatch):
+    monkeypatch.setattr(cached_image, 'READ_CHUNK_SIZE', 4)
+    stream = ChunkedStream(b'0123456789')
+    image_data = ImageData.from_stream(stream)
+    assert stream.read_sizes == [4, 4, 4, 4]
+    assert image_data._temp_file is None
+    with image_data.open() as fh:
+        assert fh.read() == b'0123456789'
+
+
+def test_image_data_large_stream_spooled(monkeypatch):
+    monkeypatch.setattr(cached_image, 'READ_CHUNK_SIZE', 4)
+    monkeypatch.setattr(cached_image, 'SPOOL_MAX_SIZE', 6)
+    image_data = ImageData.from_stream(ChunkedStream(b'0123456789'))
+    assert image_data._data is None
+    assert image_data._temp_file
+
+    # readers are independent of each other
+    with image_data.open() as fh1, image_data.open() as fh2:
+        assert fh1.read(3) == b'012'
+        assert fh2.read(5) == b'01234'
+        assert fh1.read() == b'3456789'
+
+
+def test_set_image_does_not_copy():
+    image = PIL.Image.new('RGB', (10, 10))
+    cache = CachedImage('pid', source=lambda: None)
+    assert cache.set_image(image).readonly_image is image
+
+
+def test_image_data_checksum(monkeypatch):
+    md5 = '781e5e245d69b566979b86e28d23f2c7'  # of b'0123456789'
+    assert ImageData.from_stream(io.BytesIO(b'0123456789')).checksum == md5
+    assert ImageData.from_stream(ChunkedStream(b'0123456789')).checksum == md5
+
+    monkeypatch.setattr(cached_image, 'READ_CHUNK_SIZE', 4)
+    monkeypatch.setattr(cached_image, 'SPOOL_MAX_SIZE', 6)
+    assert ImageData.from_stream(ChunkedStream(b'0123456789')).checksum == md5
+
+
+def test_checksum(s3_uploads_client):
+    cache = CachedImage(
+        'pid', image_size=image_size.NATIVE, s3_client=s3_uploads_client, s3_path='pid/native.jpg'
+    )
+    assert cache.checksum is None
+
+    # data that passes through, in either direction, has a known checksum
+    cache.set_data(io.BytesIO(b'0123456789'))
+    assert cache.checksum == '781e5e245d69b566979b86e28d23f2c7'
+    cache.flush()
+    assert cache.checksum == s3_uploads_client.get_object_checksum('pid/native.jpg')
+    cache.clear()
+    assert cache.checksum is None
+    cache.refresh()
+    assert cache.checksum == '781e5e245d69b566979b86e28d23f2c7'
+
+    # setting an image makes the checksum unknown until it is encoded
+    cache.set_image(PIL.Image.new('RGB', (10, 10)))
+    assert cache.checksum is None
+    cache.flush()
+    assert cache.checksum
+    assert cache.checksum == s3_uploads_client.get_object_checksum('pid/native.jpg')
@@ -36,6 +36,21 @@ def test_post_add_and_delete(post_dynamo):
     assert post_dynamo.get_post(post_id) is None
 
 
+def test_get_post_statuses(post_dynamo):
+    post_id1, post_id2, post_id_dne = str(uuid4()), str(uuid4()), str(uuid4())
+    assert post_dynamo.get_post_statuses([]) == {}
+    assert post_dynamo.get_post_statuses([post_id_dne]) == {}
+
+    # add two posts, complete one of them
+    post_dynamo.add_pending_post('uid', post_id1, 'ptype')
+    post_item = post_dynamo.add_pending_post('uid', post_id2, 'ptype')
+    post_dynamo.set_post_status(post_item, PostStatus.COMPLETED)
+    assert post_dynamo.get_post_statuses([post_id1, post_id2, post_id_dne]) == {
+        post_id1: PostStatus.PENDING,
+        post_id2: PostStatus.COMPLETED,
+    }
+
+
 def test_add_pending_post_sans_options(post_dynamo):
     user_id = 'pbuid'
     post_id = 'pid'
@@ -993,13 +1008,44 @@ def test_transact_increment_decrement_clear_comments_unviewed_count(post_dynamo,
     assert post_id in caplog.records[0].msg
 
 
+def test_add_like_counts(post_dynamo, caplog):
+    post_id = str(uuid4())
+
+    # post doesn't exist, fails softly and nothing is created
+    with caplog.at_level(logging.WARNING):
+        assert post_dynamo.add_like_counts(post_id, 1, -2) is None
+    assert len(caplog.records) == 2
+    assert all(post_id in rec.msg for rec in caplog.records)
+    assert post_dynamo.get_post(post_id) is None
+
+    # both counts in one write
+    post_dynamo.add_pending_post('uid', post_id, 'ptype')
+    item = post_dynamo.add_like_counts(post_id, 3, 2)
+    assert item['onymousLikeCount'] == 3
+    assert item['anonymousLikeCount'] == 2
+    assert post_dynamo.get_post(post_id) == item
+
+    # one count only, and a decrement
+    item = post_dynamo.add_like_counts(post_id, 0, -1)
+    assert item['onymousLikeCount'] == 3
+    assert item['anonymousLikeCount'] == 1
+
+    # a count that would go below zero bottoms out at zero, the other is still applied
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        item = post_dynamo.add_like_counts(post_id, 1, -3)
+    assert len(caplog.records) == 1
+    assert 'Failed to decrement anonymousLikeCount' in caplog.records[0].msg
+    assert item['onymousLikeCount'] == 4
+    assert item['anonymousLikeCount'] == 0
+    assert post_dynamo.get_post(post_id) == item
+
+
 @pytest.mark.parametrize(
     'incrementor_name, decrementor_name, attribute_name',
     [
-        ['increment_anonymous_like_count', 'decrement_anonymous_like_count', 'anonymousLikeCount'],
         ['increment_comment_count', 'decrement_comment_count', 'commentCount'],
         ['increment_flag_count', 'decrement_flag_count', 'flagCount'],
-        ['increment_onymous_like_count', 'decrement_onymous_like_count', 'onymousLikeCount'],
         ['increment_viewed_by_count', None, 'viewedByCount'],
     ],
 )
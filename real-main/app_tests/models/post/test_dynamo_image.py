@@ -1,5 +1,7 @@
+from unittest.mock import Mock
 from uuid import uuid4
 
+import pendulum
 import pytest
 
 from app.models.post.dynamo import PostImageDynamo
@@ -126,6 +128,47 @@ def test_set_colors(post_image_dynamo, post_id, core_item):
     assert item == core_item
 
 
+def test_set_and_delete_image_hash(post_image_dynamo, post_id, core_item):
+    posted_at_str = pendulum.now('utc').to_iso8601_string()
+    later_str = pendulum.now('utc').add(seconds=1).to_iso8601_string()
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdef', 0, later_str) is None
+
+    item = post_image_dynamo.set_image_hash(post_id, posted_at_str, '0123456789abcdef')
+    assert post_image_dynamo.get(post_id) == item
+    assert item.pop('imageHash') == '0123456789abcdef'
+    assert item == core_item
+
+    # matches hashes within the distance that share a band, only if posted before
+    match = (post_id, posted_at_str)
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdef', 0, later_str) == match
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdee', 1, later_str) == match
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdee', 0, later_str) is None
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdef', 0, posted_at_str) is None
+
+    # the band guarantee only holds for distances less than the band count
+    with pytest.raises(AssertionError, match='band count'):
+        post_image_dynamo.get_first_image_hash_match('0123456789abcdef', 4, later_str)
+
+    post_image_dynamo.delete_image_hash(post_id)
+    assert post_image_dynamo.get_first_image_hash_match('0123456789abcdef', 0, later_str) is None
+
+
+def test_get_first_image_hash_match_stops_at_first_match(post_image_dynamo):
+    # a crowd of identical hashes, posted a second apart
+    now = pendulum.now('utc')
+    post_ids = [str(uuid4()) for _ in range(5)]
+    for i, post_id in enumerate(post_ids):
+        post_image_dynamo.set_image_hash(post_id, now.add(seconds=i).to_iso8601_string(), '0000000000000000')
+    later_str = now.add(seconds=10).to_iso8601_string()
+
+    # verify the earliest is found with one query page per band
+    post_image_dynamo.image_hash_query_page_size = 1
+    post_image_dynamo.client.table.query = Mock(wraps=post_image_dynamo.client.table.query)
+    first = post_image_dynamo.get_first_image_hash_match('0000000000000001', 3, later_str)
+    assert first == (post_ids[0], now.to_iso8601_string())
+    assert len(post_image_dynamo.client.table.query.mock_calls) == 4
+
+
 def test_delete(post_image_dynamo):
     post_id = str(uuid4())
     assert post_image_dynamo.get(post_id) is None
@@ -7,6 +7,7 @@ import stringcase
 
 from app.models.post.enums import PostStatus, PostType
 from app.models.post.exceptions import PostException
+from app.models.post.model import PostView
 from app.utils import image_size
 
 
@@ -18,6 +19,7 @@ def user(user_manager, cognito_client):
 
 
 user2 = user
+user3 = user
 
 
 @pytest.fixture
@@ -45,6 +47,32 @@ def test_get_post_dne(post_manager):
     assert post_manager.get_post('pid-dne') is None
 
 
+def test_get_post_view(post_manager, user):
+    post = post_manager.add_post(user, 'pid', PostType.TEXT_ONLY, text='t')
+    assert post_manager.get_post_view('pid-dne') is None
+
+    post_view = post_manager.get_post_view(post.id)
+    assert isinstance(post_view, PostView)
+    assert post_view.item == post.item
+    assert post_view.id == post.id
+    assert post_view.user_id == user.id
+    assert post_view.type == PostType.TEXT_ONLY
+    assert post_view.status == post.status
+    assert post_view.posted_at == post.posted_at
+    assert post_view.original_post_id == post.id
+    assert not hasattr(post_view, '__dict__')
+
+
+def test_batch_get_post_views(post_manager, user):
+    post1 = post_manager.add_post(user, 'pid1', PostType.TEXT_ONLY, text='t')
+    post2 = post_manager.add_post(user, 'pid2', PostType.TEXT_ONLY, text='t')
+    assert post_manager.batch_get_post_views([]) == []
+
+    post_views = post_manager.batch_get_post_views([post1.id, 'pid-dne', post2.id])
+    assert sorted(post_view.id for post_view in post_views) == ['pid1', 'pid2']
+    assert all(isinstance(post_view, PostView) for post_view in post_views)
+
+
 def test_add_post_errors(post_manager, user):
     # try to add a post without any content (no text or media)
     with pytest.raises(PostException, match='without text'):
@@ -556,6 +584,47 @@ def test_record_views(post_manager, user, user2, posts, caplog):
     assert user2.refresh_item().item['lastPostViewAt']
 
 
+def test_record_views_counts_and_originals(post_manager, user, user2, user3, posts, caplog):
+    post1, post2 = posts
+    post3 = post_manager.add_post(user2, str(uuid.uuid4()), PostType.TEXT_ONLY, text='t')
+    post4 = post_manager.add_post(user2, str(uuid.uuid4()), PostType.TEXT_ONLY, text='t')
+    post4.archive()
+    # make post3 a non-original post, with post1 as its original
+    post_manager.dynamo.client.set_attributes(post_manager.dynamo.pk(post3.id), originalPostId=post1.id)
+
+    # record views, including of an archived post
+    with caplog.at_level(logging.WARNING):
+        post_manager.record_views([post2.id, post3.id, post4.id, post3.id], user3.id)
+    assert len(caplog.records) == 1
+    assert 'non-COMPLETED' in caplog.records[0].msg
+    assert post4.id in caplog.records[0].msg
+    assert post_manager.view_dynamo.get_view(post1.id, user3.id)['viewCount'] == 2
+    assert post_manager.view_dynamo.get_view(post2.id, user3.id)['viewCount'] == 1
+    assert post_manager.view_dynamo.get_view(post3.id, user3.id)['viewCount'] == 2
+    assert post_manager.view_dynamo.get_view(post4.id, user3.id) is None
+
+    # verify viewed by counts, aggregated per author
+    assert [p.refresh_item().item.get('viewedByCount', 0) for p in (post1, post2, post3, post4)] == [1, 1, 1, 0]
+    assert user.refresh_item().item['postViewedByCount'] == 2
+    assert user2.refresh_item().item['postViewedByCount'] == 1
+    assert user3.refresh_item().item['lastPostViewAt']
+
+    # verify repeat views don't change viewed by counts
+    post_manager.record_views([post1.id, post3.id], user3.id)
+    assert post_manager.view_dynamo.get_view(post1.id, user3.id)['viewCount'] == 4
+    assert post_manager.view_dynamo.get_view(post3.id, user3.id)['viewCount'] == 3
+    assert [p.refresh_item().item.get('viewedByCount', 0) for p in (post1, post2, post3, post4)] == [1, 1, 1, 0]
+    assert user.refresh_item().item['postViewedByCount'] == 2
+    assert user2.refresh_item().item['postViewedByCount'] == 1
+
+    # verify the post owner's views are recorded, but don't go up to the original or count as viewed by
+    post_manager.record_views([post3.id], user2.id)
+    assert post_manager.view_dynamo.get_view(post3.id, user2.id)['viewCount'] == 1
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id) is None
+    assert post3.refresh_item().item['viewedByCount'] == 1
+    assert user2.refresh_item().item['postViewedByCount'] == 1
+
+
 def test_delete_all_by_user(post_manager, user):
     assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
 
@@ -574,3 +643,15 @@ def test_delete_all_by_user(post_manager, user):
     # test delete those posts
     post_manager.delete_all_by_user(user.id)
     assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
+
+
+def test_trending_filter_viewable(post_manager, user):
+    post1 = post_manager.add_post(user, str(uuid.uuid4()), PostType.TEXT_ONLY, text='t')
+    post2 = post_manager.add_post(user, str(uuid.uuid4()), PostType.IMAGE)
+    post_id_dne = str(uuid.uuid4())
+    assert post1.status == PostStatus.COMPLETED
+    assert post2.status == PostStatus.PENDING
+    assert post_manager.trending_filter_viewable([post1.id, post2.id, post_id_dne]) == {post1.id}
+
+    post1.archive()
+    assert post_manager.trending_filter_viewable([post1.id, post2.id, post_id_dne]) == set()
@@ -88,20 +88,12 @@ def test_on_like_add(post_manager, post, like_onymous, like_anonymous):
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
 
-    # trigger, check state
+    # trigger, check the changes are buffered until flushed
     post_manager.on_like_add(post.id, like_onymous.item)
-    post.refresh_item()
-    assert post.item.get('onymousLikeCount', 0) == 1
-    assert post.item.get('anonymousLikeCount', 0) == 0
-
-    # trigger, check state
     post_manager.on_like_add(post.id, like_anonymous.item)
-    post.refresh_item()
-    assert post.item.get('onymousLikeCount', 0) == 1
-    assert post.item.get('anonymousLikeCount', 0) == 1
-
-    # trigger, check state
     post_manager.on_like_add(post.id, like_anonymous.item)
+    assert post.refresh_item().item.get('onymousLikeCount', 0) == 0
+    assert post_manager.like_counts_flush() == 1
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 2
@@ -109,48 +101,78 @@ def test_on_like_add(post_manager, post, like_onymous, like_anonymous):
     # checking junk like status
     with pytest.raises(Exception, match='junkjunk'):
         post_manager.on_like_add(post.id, {**like_onymous.item, 'likeStatus': 'junkjunk'})
+    assert post_manager.like_counts_flush() == 0
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 2
 
 
-def test_on_like_delete(post_manager, post, like_onymous, like_anonymous, caplog):
+def test_on_like_delete(post_manager, post, like_onymous, like_anonymous):
     # configure and check starting state
-    post_manager.dynamo.increment_onymous_like_count(post.id)
-    post_manager.dynamo.increment_anonymous_like_count(post.id)
+    post_manager.on_like_add(post.id, like_onymous.item)
+    post_manager.on_like_add(post.id, like_anonymous.item)
+    post_manager.like_counts_flush()
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 1
 
     # trigger, check state
     post_manager.on_like_delete(post.id, like_onymous.item)
+    assert post_manager.like_counts_flush() == 1
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 1
 
-    # trigger, check state
+    # trigger, check the count bottoms out at zero
     post_manager.on_like_delete(post.id, like_anonymous.item)
+    post_manager.on_like_delete(post.id, like_anonymous.item)
+    assert post_manager.like_counts_flush() == 1
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
 
-    # trigger, check fails softly
-    with caplog.at_level(logging.WARNING):
-        post_manager.on_like_delete(post.id, like_onymous.item)
-    assert len(caplog.records) == 1
-    assert 'Failed to decrement' in caplog.records[0].msg
-    assert 'onymousLikeCount' in caplog.records[0].msg
-    assert post.id in caplog.records[0].msg
-    post.refresh_item()
-    assert post.item.get('onymousLikeCount', 0) == 0
-    assert post.item.get('anonymousLikeCount', 0) == 0
+    # changes that cancel out are not written
+    post_manager.on_like_add(post.id, like_onymous.item)
+    post_manager.on_like_delete(post.id, like_onymous.item)
+    assert post_manager.like_counts_flush() == 0
 
     # checking junk like status
     with pytest.raises(Exception, match='junkjunk'):
         post_manager.on_like_delete(post.id, {**like_onymous.item, 'likeStatus': 'junkjunk'})
-    post.refresh_item()
-    assert post.item.get('onymousLikeCount', 0) == 0
-    assert post.item.get('anonymousLikeCount', 0) == 0
+
+
+def test_like_counts_flush_one_write_per_post(post_manager, user, post, like_onymous, like_anonymous):
+    post2 = post_manager.add_post(user, str(uuid4()), PostType.TEXT_ONLY, text='t')
+    for _ in range(20):
+        post_manager.on_like_add(post.id, like_onymous.item)
+        post_manager.on_like_add(post.id, like_anonymous.item)
+    post_manager.on_like_add(post2.id, like_onymous.item)
+    with patch.object(post_manager.dynamo, 'add_like_counts', wraps=post_manager.dynamo.add_like_counts) as mock:
+        assert post_manager.like_counts_flush() == 2
+    assert sorted(mock.mock_calls, key=str) == sorted([call(post.id, 20, 20), call(post2.id, 1, 0)], key=str)
+    assert post.refresh_item().item['onymousLikeCount'] == 20
+    assert post.item['anonymousLikeCount'] == 20
+    assert post2.refresh_item().item['onymousLikeCount'] == 1
+    assert post_manager.like_counts_buffer == {}
+
+
+def test_like_counts_flush_failure(post_manager, post, like_onymous, caplog):
+    post_manager.on_like_add(post.id, like_onymous.item)
+    with patch.object(post_manager.dynamo, 'add_like_counts', side_effect=Exception('nope')):
+        with caplog.at_level(logging.ERROR):
+            assert post_manager.like_counts_flush() == 0
+    assert len(caplog.records) == 1
+    assert 'Like counts write failed' in caplog.records[0].msg
+    assert post.id in caplog.records[0].msg
+    assert post_manager.like_counts_buffer == {}
+
+
+def test_like_counts_flush_post_dne(post_manager, like_onymous, caplog):
+    post_manager.on_like_add('pid-dne', like_onymous.item)
+    with caplog.at_level(logging.WARNING):
+        assert post_manager.like_counts_flush() == 0
+    assert len(caplog.records) == 1
+    assert post_manager.dynamo.get_post('pid-dne') is None
 
 
 def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unviewed_comments(post_manager, post):
@@ -198,6 +220,53 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_race_conditi
         post_manager.on_post_view_count_change_update_counts(post.id, new_item=new_item)
 
 
+def test_on_post_view_count_change_update_trending(post_manager, user, user2):
+    # verify starting state, post got a free bump into trending upon completion
+    now = pendulum.parse('2020-06-09T00:00:00Z')  # exact begining of day so post gets exactly one free trending
+    post = post_manager.add_post(user, str(uuid4()), PostType.TEXT_ONLY, text='t', now=now)
+    assert post.refresh_trending_item().trending_score == 1
+    assert post_manager.trending_buffer == {}
+
+    # react to the viewCount not going up, verify nothing buffered
+    viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
+    new_item = {'sortKey': f'view/{user2.id}', 'viewCount': 1, 'lastViewedAt': viewed_at.to_iso8601_string()}
+    post_manager.on_post_view_count_change_update_trending(post.id, new_item=new_item, old_item=new_item)
+    assert post_manager.trending_buffer == {}
+
+    # react to a view by the post owner and two views by a rando, verify buffered and nothing written yet
+    owner_item = {**new_item, 'sortKey': f'view/{user.id}'}
+    post_manager.on_post_view_count_change_update_trending(post.id, new_item=owner_item)
+    post_manager.on_post_view_count_change_update_trending(post.id, new_item=new_item)
+    post_manager.on_post_view_count_change_update_trending(
+        post.id, new_item={**new_item, 'viewCount': 2}, old_item=new_item
+    )
+    assert post_manager.trending_buffer == {post.id: (3, viewed_at)}
+    assert post_manager.trending_viewers_buffer == {post.id: {user.id: 1, user2.id: 2}}
+    assert post.refresh_trending_item().trending_score == 1
+
+    # flush, verify one combined increment for the post without the owner's view, passed up to the user
+    assert post_manager.trending_flush() == 1
+    assert post_manager.trending_buffer == {}
+    assert post_manager.trending_viewers_buffer == {}
+    assert post.refresh_trending_item().trending_score == 1 + 2 * 2
+    assert user.refresh_trending_item().trending_score is None
+    assert post_manager.user_manager.trending_buffer == {user.id: (2, viewed_at)}
+    assert post_manager.user_manager.trending_flush() == 1
+    assert user.refresh_trending_item().trending_score == 2
+
+    # only views by the post owner, verify nothing incremented
+    post_manager.on_post_view_count_change_update_trending(post.id, new_item=owner_item)
+    assert post_manager.trending_flush() == 0
+    assert post.refresh_trending_item().trending_score == 1 + 2 * 2
+
+
+def test_trending_flush_item_non_completed_post(post_manager, post, user):
+    post.archive()
+    assert post_manager.trending_flush_item(post.id, 1) is False
+    assert post.refresh_trending_item().trending_score is None
+    assert post_manager.user_manager.trending_buffer == {}
+
+
 def test_on_comment_add(post_manager, post, user, user2, comment_manager):
     # verify starting state
     post.refresh_item()
@@ -247,12 +316,14 @@ def test_on_comment_delete(post_manager, post, user2, caplog, comment_manager):
     # postprocess a deleted comment, verify counts drop as expected
     comment = comment_manager.add_comment(str(uuid4()), post.id, user2.id, 'lore')
     post_manager.on_comment_delete(comment.id, comment.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 1
     assert post.item['commentsUnviewedCount'] == 1
 
     # postprocess a deleted comment, verify counts drop as expected
     post_manager.on_comment_delete(comment.id, comment.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 0
     assert post.item['commentsUnviewedCount'] == 0
@@ -260,6 +331,7 @@ def test_on_comment_delete(post_manager, post, user2, caplog, comment_manager):
     # postprocess a deleted comment, verify fails softly and final state
     with caplog.at_level(logging.WARNING):
         post_manager.on_comment_delete(comment.id, comment.item)
+        post_manager.deleted_comments_flush()
     assert len(caplog.records) == 2
     assert 'Failed to decrement commentCount' in caplog.records[0].msg
     assert 'Failed to decrement commentsUnviewedCount' in caplog.records[1].msg
@@ -299,6 +371,7 @@ def test_comment_deleted_with_post_views(post_manager, post, user, user2, caplog
 
     # postprocess deleteing comment4, verify state
     post_manager.on_comment_delete(comment4.id, comment4.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 3
     assert post.item['commentsUnviewedCount'] == 1
@@ -306,6 +379,7 @@ def test_comment_deleted_with_post_views(post_manager, post, user, user2, caplog
 
     # postprocess deleteing comment2, verify state
     post_manager.on_comment_delete(comment2.id, comment2.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 2
     assert post.item['commentsUnviewedCount'] == 1
@@ -313,6 +387,7 @@ def test_comment_deleted_with_post_views(post_manager, post, user, user2, caplog
 
     # postprocess deleteing comment4, verify state
     post_manager.on_comment_delete(comment4.id, comment4.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 1
     assert post.item['commentsUnviewedCount'] == 0
@@ -320,6 +395,7 @@ def test_comment_deleted_with_post_views(post_manager, post, user, user2, caplog
 
     # postprocess deleteing comment1, verify state
     post_manager.on_comment_delete(comment1.id, comment1.item)
+    post_manager.deleted_comments_flush()
     post.refresh_item()
     assert post.item['commentCount'] == 0
     assert post.item['commentsUnviewedCount'] == 0
@@ -445,3 +521,52 @@ def test_on_post_verification_hidden_change_update_is_verified(post_manager, pos
         post.refresh_item()
         assert post.item['isVerified'] is is_verified
         assert 'isVerifiedHiddenValue' not in post.item
+
+
+def test_deleted_comments_flush_batches_view_reads(post_manager, post, user, user2, comment_manager):
+    post2 = post_manager.add_post(user, str(uuid4()), PostType.TEXT_ONLY, text='t')
+    comments = [
+        comment_manager.add_comment(str(uuid4()), p.id, u.id, 'lore')
+        for p, u in ((post, user2), (post, user2), (post, user), (post2, user2))
+    ]
+    for comment in comments:
+        post_manager.on_comment_add(comment.id, comment.item)
+    assert post.refresh_item().item['commentsUnviewedCount'] == 2
+    assert post2.refresh_item().item['commentsUnviewedCount'] == 1
+
+    # delete them all in one stream batch, verify posts and views are each read in one batch
+    for comment in comments:
+        post_manager.on_comment_delete(comment.id, comment.item)
+    assert post.refresh_item().item['commentsUnviewedCount'] == 2
+    batch_get = post_manager.view_dynamo.client.batch_get
+    with patch.object(post_manager.view_dynamo.client, 'batch_get', wraps=batch_get) as batch_get_mock:
+        assert post_manager.deleted_comments_flush() == 2
+    assert len(batch_get_mock.mock_calls) == 2
+    assert post.refresh_item().item['commentCount'] == 0
+    assert post.item['commentsUnviewedCount'] == 0
+    assert 'gsiA3SortKey' not in post.item
+    assert post2.refresh_item().item['commentsUnviewedCount'] == 0
+    assert 'gsiA3SortKey' not in post2.item
+    assert post_manager.deleted_comments_buffer == {}
+
+    # nothing buffered
+    with patch.object(post_manager.view_dynamo.client, 'batch_get') as batch_get_mock:
+        assert post_manager.deleted_comments_flush() == 0
+    assert batch_get_mock.mock_calls == []
+
+
+def test_deleted_comments_flush_read_failure(post_manager, post, user2, comment_manager, caplog):
+    comment = comment_manager.add_comment(str(uuid4()), post.id, user2.id, 'lore')
+    post_manager.on_comment_add(comment.id, comment.item)
+    post_manager.on_comment_delete(comment.id, comment.item)
+
+    # a failed read is logged rather than raised, and the buffer is not retried
+    with patch.object(post_manager.view_dynamo.client, 'batch_get', side_effect=Exception('nope')):
+        with caplog.at_level(logging.ERROR):
+            assert post_manager.deleted_comments_flush() == 0
+    assert len(caplog.records) == 1
+    assert 'Unviewed count decrements failed' in caplog.records[0].msg
+    assert post.id in caplog.records[0].msg
+    assert 'nope' in caplog.records[0].msg
+    assert post_manager.deleted_comments_buffer == {}
+    assert post.refresh_item().item['commentsUnviewedCount'] == 1
@@ -1,5 +1,7 @@
 import decimal
+import io
 import logging
+import math
 import uuid
 from os import path
 from unittest import mock
@@ -194,6 +196,34 @@ def test_get_hls_access_cookies(cloudfront_client, s3_uploads_client):
     assert cloudfront_client.mock_calls == [mock.call.generate_presigned_cookies(cookie_path)]
 
 
+def test_image_caches_are_lazy(s3_uploads_client):
+    item = {
+        'postedByUserId': 'user-id',
+        'postId': 'post-id',
+        'postType': PostType.IMAGE,
+        'postStatus': PostStatus.PENDING,
+    }
+    post = Post(item, s3_uploads_client=s3_uploads_client)
+    assert not hasattr(post, '_image_caches')
+
+    cache = post.p480_jpeg_cache
+    assert post._image_caches == {image_size.P480: cache}
+    assert post.p480_jpeg_cache is cache
+    assert cache.image_size == image_size.P480
+    assert cache.s3_path == f'user-id/post/post-id/image/{image_size.P480.filename}'
+
+    # no s3 client, no caches
+    post = Post(item)
+    assert not hasattr(post, 'native_jpeg_cache')
+
+
+def test_image_caches_text_only(post):
+    assert post.k4_jpeg_cache.readonly_image.size == image_size.K4.max_dimensions
+    assert post.p1080_jpeg_cache.readonly_image.size == image_size.P1080.max_dimensions
+    assert not hasattr(post, 'native_jpeg_cache')
+    assert not hasattr(post, 'p480_jpeg_cache')
+
+
 def test_set_checksum(post):
     assert 'checksum' not in post.item
 
@@ -210,6 +240,18 @@ def test_set_checksum(post):
     assert post.item['checksum'] == md5
 
 
+def test_set_checksum_from_native_jpeg_cache(pending_image_post):
+    post = pending_image_post
+    assert 'checksum' not in post.item
+
+    # native jpeg data that passed through the cache, no trip to s3 needed for its md5
+    post.native_jpeg_cache.set_data(io.BytesIO(b'anything'))
+    with mock.patch.object(post.s3_uploads_client, 'get_object_checksum') as get_object_checksum:
+        post.set_checksum()
+    assert get_object_checksum.mock_calls == []
+    assert post.item['checksum'] == 'f0e166dc34d14d6c228ffac576c9a43c'
+
+
 def test_set_is_verified_minimal(pending_image_post):
     # check initial state and configure mock
     post = pending_image_post
@@ -733,20 +775,24 @@ def test_set_colors(s3_uploads_client, pending_image_post):
     post = pending_image_post
     assert 'colors' not in post.image_item
 
-    # put an image in the bucket
-    s3_path = post.get_image_path(image_size.NATIVE)
+    # put an image in the bucket, grant is small enough that it is its own 480p thumbnail
+    s3_path = post.get_image_path(image_size.P480)
     s3_uploads_client.put_object(s3_path, open(grant_path, 'rb'), 'image/jpeg')
 
     post.set_colors()
-    assert post.image_item['colors'] == grant_colors
+    colors = [(c['r'], c['g'], c['b']) for c in post.image_item['colors']]
+    assert len(colors) == len(grant_colors)
+    # close to what colorthief found, color for color
+    for c in grant_colors:
+        assert min(math.dist((c['r'], c['g'], c['b']), color) for color in colors) < 40
 
 
-def test_set_colors_colortheif_fails(s3_uploads_client, pending_image_post, caplog):
+def test_set_colors_fails(s3_uploads_client, pending_image_post, caplog):
     post = pending_image_post
     assert 'colors' not in post.image_item
 
     # put an image in the bucket
-    s3_path = post.get_image_path(image_size.NATIVE)
+    s3_path = post.get_image_path(image_size.P480)
     s3_uploads_client.put_object(s3_path, open(blank_path, 'rb'), 'image/jpeg')
 
     assert len(caplog.records) == 0
@@ -756,7 +802,7 @@ def test_set_colors_colortheif_fails(s3_uploads_client, pending_image_post, capl
 
     assert len(caplog.records) == 1
     assert caplog.records[0].levelname == 'WARNING'
-    assert 'ColorTheif' in caplog.records[0].msg
+    assert 'Palette extraction failed' in caplog.records[0].msg
     assert f'`{post.id}`' in caplog.records[0].msg
 
 
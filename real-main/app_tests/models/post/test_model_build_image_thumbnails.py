@@ -207,3 +207,29 @@ def test_build_image_thumbnails_content_type(s3_uploads_client, processing_image
     # check 64p content type
     path_64 = post.get_image_path(image_size.P64)
     assert s3_uploads_client.bucket.Object(path_64).content_type == 'image/jpeg'
+
+
+def test_build_image_thumbnails_flushes_native(s3_uploads_client, processing_image_post):
+    post = processing_image_post
+    path = post.get_image_path(image_size.NATIVE)
+    assert not s3_uploads_client.exists(path)
+
+    # native jpeg with unsaved changes gets flushed back along with the thumbnails
+    post.native_jpeg_cache.set_data(open(grant_path, 'rb'))
+    post.build_image_thumbnails()
+    assert s3_uploads_client.get_object_data_stream(path).read() == open(grant_path, 'rb').read()
+    for size in image_size.THUMBNAILS:
+        assert s3_uploads_client.exists(post.get_image_path(size))
+
+
+def test_build_image_thumbnails_only_prefetched_sizes(s3_uploads_client, processing_image_post, monkeypatch):
+    post = processing_image_post
+    prefetched_sizes = (image_size.P1080, image_size.P480, image_size.P64)
+    monkeypatch.setattr(post, 'prefetched_thumbnail_sizes', prefetched_sizes)
+    s3_uploads_client.put_object(post.get_image_path(image_size.NATIVE), open(blank_path, 'rb'), 'image/jpeg')
+
+    post.build_image_thumbnails()
+    assert not s3_uploads_client.exists(post.get_image_path(image_size.K4))
+    for size in prefetched_sizes:
+        image = PIL.Image.open(s3_uploads_client.get_object_data_stream(post.get_image_path(size)))
+        assert image.size[0] == size.max_dimensions[0]
@@ -197,6 +197,34 @@ def test_complete_with_original_post(post_manager, post_with_media, post_with_me
     assert post2.item['originalPostId'] == post1.id
 
 
+def test_complete_with_similar_image_original_post(post_manager, user, post_with_media):
+    post1 = post_with_media
+    post2 = post_manager.add_post(user, 'pid4', PostType.IMAGE, text='t')
+    post2.dynamo.set_checksum(post2.id, post2.item['postedAt'], 'checksum4')
+    post3 = post_manager.add_post(user, 'pid5', PostType.IMAGE, text='t')
+    post3.dynamo.set_checksum(post3.id, post3.item['postedAt'], 'checksum5')
+    assert post2.image_hash_max_distance == 3
+
+    # checksums all differ, but the perceptual hashes of the first two differ by only three bits
+    post1.image_dynamo.set_image_hash(post1.id, post1.item['postedAt'], '00ff00ff00ff00ff')
+    post2.image_dynamo.set_image_hash(post2.id, post2.item['postedAt'], '00ff00ff00ff00f8')
+    post3.image_dynamo.set_image_hash(post3.id, post3.item['postedAt'], '00ff00ff00ff00f0')
+
+    # the post that was posted first is original
+    post1.complete()
+    assert 'originalPostId' not in post1.item
+
+    # the post similar to the first is not
+    post2.refresh_image_item()
+    post2.complete()
+    assert post2.item['originalPostId'] == post1.id
+
+    # the post that differs from the first by four bits is not considered similar to it, but it is to the second
+    post3.refresh_image_item()
+    post3.complete()
+    assert post3.item['originalPostId'] == post2.id
+
+
 def test_complete_with_set_as_user_photo(post_manager, user, post_with_media, post_set_as_user_photo):
     # complete the post without use_as_user_photo, verify user photo change api no called
     post_with_media.user.update_photo = mock.Mock()
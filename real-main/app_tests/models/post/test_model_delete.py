@@ -78,7 +78,8 @@ def test_delete_completed_text_only_post_with_expiration(post_manager, post_with
 
 def test_delete_pending_media_post(post_manager, post_with_media, user_manager):
     post = post_with_media
-    assert post.image_item
+    post.image_dynamo.set_image_hash(post.id, post.item['postedAt'], '0123456789abcdef')
+    assert post.refresh_image_item().image_item
     assert post_manager.dynamo.get_post(post_with_media.id)
     assert post_manager.original_metadata_dynamo.get(post_with_media.id)
 
@@ -98,6 +99,8 @@ def test_delete_pending_media_post(post_manager, post_with_media, user_manager):
     assert not post.item
     assert not post.image_item
     assert post_manager.original_metadata_dynamo.get(post_with_media.id) is None
+    later_str = pendulum.now('utc').to_iso8601_string()
+    assert post.image_dynamo.get_first_image_hash_match('0123456789abcdef', 0, later_str) is None
 
     # check calls to mocked out managers
     assert post.comment_manager.mock_calls == [mock.call.delete_all_on_post(post.id)]
@@ -1,3 +1,4 @@
+import hashlib
 import uuid
 from unittest import mock
 
@@ -94,6 +95,8 @@ def test_process_image_upload_success_jpeg(pending_post, s3_uploads_client, gran
 
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert len(post.refresh_image_item().image_item['imageHash']) == 16
+    assert post.item['checksum'] == hashlib.md5(grant_data).hexdigest()
 
 
 def test_process_image_upload_success_jpeg_with_crop(pending_post, s3_uploads_client, grant_data):
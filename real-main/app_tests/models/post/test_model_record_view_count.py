@@ -27,6 +27,16 @@ def post(post_manager, user):
 post2 = post
 
 
+def record_view_count_and_flush(post_manager, post, user_id, view_count, viewed_at):
+    "Record the view, then do the trending work the dynamo stream handler would do on the new view items"
+    post.record_view_count(user_id, view_count, viewed_at=viewed_at)
+    for post_id in dict.fromkeys([post.id, post.original_post_id]):
+        if view_item := post_manager.view_dynamo.get_view(post_id, user_id):
+            post_manager.on_post_view_count_change_update_trending(post_id, new_item=view_item)
+    post_manager.trending_flush()
+    post_manager.user_manager.trending_flush()
+
+
 def test_record_view_count_logs_warning_for_non_completed_posts(post, user2, caplog):
     # verify no warning for a completed post
     with caplog.at_level(logging.WARNING):
@@ -93,8 +103,7 @@ def test_text_only_posts_trend(post_manager, user, user2):
 
     # record a view, verify that boosts trending score
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
-    post.record_view_count(user2.id, 4, viewed_at=viewed_at)
-    assert post.trending_score == 1 + 2
+    record_view_count_and_flush(post_manager, post, user2.id, 4, viewed_at)
     assert post.refresh_trending_item().trending_score == 1 + 2
     assert user.refresh_trending_item()
     assert pendulum.parse(user.trending_item['lastDeflatedAt']) == viewed_at
@@ -117,8 +126,7 @@ def test_non_verified_image_posts_trend_with_lower_multiplier(post_manager, user
 
     # record a view, verify adds to trending
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
-    post.record_view_count(user2.id, 4, viewed_at=viewed_at)
-    assert post.trending_score == 0.5 + 1
+    record_view_count_and_flush(post_manager, post, user2.id, 4, viewed_at)
     assert post.refresh_trending_item().trending_score == 0.5 + 1
     assert user.refresh_trending_item().trending_score == 0.5  # includes an extra deflation compared to post
 
@@ -136,8 +144,7 @@ def test_text_only_posts_trend_with_full_multiplier(post_manager, user, user2):
 
     # record a view, verify adds to trending
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
-    post.record_view_count(user2.id, 4, viewed_at=viewed_at)
-    assert post.trending_score == 2 + 1
+    record_view_count_and_flush(post_manager, post, user2.id, 4, viewed_at)
     assert post.refresh_trending_item().trending_score == 2 + 1
     assert user.refresh_trending_item().trending_score == 1  # includes an extra deflation compared to post
 
@@ -156,8 +163,7 @@ def test_posts_from_subscriber_trend_with_boosted_multiplier(post_manager, user,
 
     # record a view, verify adds to trending
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
-    post.record_view_count(user2.id, 4, viewed_at=viewed_at)
-    assert post.trending_score == 8 + 4
+    record_view_count_and_flush(post_manager, post, user2.id, 4, viewed_at)
     assert post.refresh_trending_item().trending_score == 8 + 4
     assert user.refresh_trending_item().trending_score == 4  # includes an extra deflation compared to post
 
@@ -177,8 +183,7 @@ def test_verified_image_posts_originality_determines_trending(post_manager, user
 
     # record a view, verify that boosts trending score
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # exactly one day forward
-    post.record_view_count(user2.id, 4, viewed_at=viewed_at)
-    assert post.trending_score == 1 + 2
+    record_view_count_and_flush(post_manager, post, user2.id, 4, viewed_at)
     assert post.refresh_trending_item().trending_score == 1 + 2
     assert user.refresh_trending_item()
     assert pendulum.parse(user.trending_item['lastDeflatedAt']) == viewed_at
@@ -202,7 +207,7 @@ def test_verified_image_posts_originality_determines_trending(post_manager, user
 
     # record a view on that copy by a third user
     viewed_at = pendulum.parse('2020-06-10T00:00:00Z')  # 12 hours forward for original post
-    post2.record_view_count(user3.id, 8, viewed_at=viewed_at)
+    record_view_count_and_flush(post_manager, post2, user3.id, 8, viewed_at)
     assert post2.trending_score is None
     assert post2.refresh_trending_item().trending_score is None
     assert user2.refresh_trending_item().trending_score is None
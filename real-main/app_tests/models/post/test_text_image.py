@@ -6,7 +6,8 @@ they're more just intended to ensure the alogirthm doesn't crash.
 """
 import pytest
 
-from app.models.post.text_image import generate_text_image, rectangle_wrap
+from app.models.post import text_image
+from app.models.post.text_image import generate_text_image, get_font, get_text_image, rectangle_wrap
 
 dims_4k = (3840, 2160)
 dims_64p = (114, 64)
@@ -46,3 +47,45 @@ def test_rectangle_wrap():
     assert text == 'a b c\nd e'
     assert text_height == 22
     assert text_width == 48
+
+
+def test_rectangle_wrap_single_token():
+    text, text_width, text_height = rectangle_wrap(['word'], [40], 2, 2, 10, 16 / 9)
+    assert text == 'word'
+    assert text_width == 40
+    assert text_height == 10
+
+
+def test_rectangle_wrap_narrow_aspect_ratio():
+    # a tall target puts every token on its own line
+    text, text_width, text_height = rectangle_wrap(['a', 'b', 'c'], [15, 13, 16], 2, 2, 10, 1 / 10)
+    assert text == 'a\nb\nc'
+    assert text_width == 16
+    assert text_height == 34
+
+
+def test_get_font_is_cached():
+    assert get_font(20) is get_font(20)
+    assert get_font(20) is not get_font(21)
+    assert get_font(20).size == 20
+
+
+def test_get_text_image_is_cached(monkeypatch):
+    monkeypatch.setattr(text_image, '_render_cache', type(text_image._render_cache)())
+    image = get_text_image('Fly high', dims_64p)
+    assert image.size == dims_64p
+    assert get_text_image('Fly high', dims_64p) is image
+    assert get_text_image('Fly higher', dims_64p) is not image
+    assert get_text_image('Fly high', (228, 128)) is not image
+
+
+def test_get_text_image_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(text_image, '_render_cache', type(text_image._render_cache)())
+    monkeypatch.setattr(text_image, 'RENDER_CACHE_MAX_PIXELS', 2 * 114 * 64)
+    image_1 = get_text_image('one', dims_64p)
+    image_2 = get_text_image('two', dims_64p)
+    assert get_text_image('one', dims_64p) is image_1
+    get_text_image('three', dims_64p)
+    assert len(text_image._render_cache) == 2
+    assert get_text_image('one', dims_64p) is image_1
+    assert get_text_image('two', dims_64p) is not image_2
@@ -126,6 +126,21 @@ def test_get_user_by_username(user_dynamo):
     assert user_dynamo.get_user_by_username(username2)['userId'] == user_id2
 
 
+def test_get_user_statuses(user_dynamo):
+    user_id1, user_id2, user_id_dne = str(uuid4()), str(uuid4()), str(uuid4())
+    assert user_dynamo.get_user_statuses([]) == {}
+    assert user_dynamo.get_user_statuses([user_id_dne]) == {}
+
+    # add two users, one of which is disabled
+    user_dynamo.add_user(user_id1, str(uuid4())[:8])
+    user_dynamo.add_user(user_id2, str(uuid4())[:8])
+    user_dynamo.set_user_status(user_id2, UserStatus.DISABLED)
+    assert user_dynamo.get_user_statuses([user_id1, user_id2, user_id_dne]) == {
+        user_id1: UserStatus.ACTIVE,
+        user_id2: UserStatus.DISABLED,
+    }
+
+
 def test_delete_user(user_dynamo):
     user_id = 'my-user-id'
     username = 'my-USername'
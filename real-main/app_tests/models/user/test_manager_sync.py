@@ -82,33 +82,82 @@ def test_sync_elasticsearch(user_manager, user):
     [['sync_pinpoint_email', 'EMAIL', 'email'], ['sync_pinpoint_phone', 'SMS', 'phoneNumber']],
 )
 def test_sync_pinpoint_attribute(user_manager, user, method_name, pinpoint_attribute, dynamo_attribute):
-    # test no value
+    # test no value, verify buffered rather than sent to pinpoint
     user.item.pop(dynamo_attribute, None)
     with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
         getattr(user_manager, method_name)(user.id, user.item, user.item)
-    assert pinpoint_client_mock.mock_calls == [call.delete_user_endpoint(user.id, pinpoint_attribute)]
+    assert pinpoint_client_mock.mock_calls == []
+    assert user_manager.pinpoint_buffer == {user.id: ({pinpoint_attribute: None}, None)}
 
-    # test with value
+    # test with value, verify the later value wins
     user.item[dynamo_attribute] = 'the-val'
+    getattr(user_manager, method_name)(user.id, user.item, user.item)
+    assert user_manager.pinpoint_buffer == {user.id: ({pinpoint_attribute: 'the-val'}, None)}
+
+    # flush, verify
     with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
-        getattr(user_manager, method_name)(user.id, user.item, user.item)
-    assert pinpoint_client_mock.mock_calls == [call.update_user_endpoint(user.id, pinpoint_attribute, 'the-val')]
+        pinpoint_client_mock.sync_user_endpoints.return_value = True
+        user_manager.pinpoint_flush()
+    assert pinpoint_client_mock.mock_calls == [
+        call.sync_user_endpoints(user.id, addresses={pinpoint_attribute: 'the-val'}, endpoint_status=None)
+    ]
+    assert user_manager.pinpoint_buffer == {}
 
 
 def test_sync_pinpoint_user_status(user_manager, user):
     user.item['userStatus'] = UserStatus.ACTIVE
+    user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
     with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
-        user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
-    assert pinpoint_client_mock.mock_calls == [call.enable_user_endpoints(user.id)]
+        pinpoint_client_mock.sync_user_endpoints.return_value = True
+        user_manager.pinpoint_flush()
+    assert pinpoint_client_mock.mock_calls == [
+        call.sync_user_endpoints(user.id, addresses={}, endpoint_status='ACTIVE')
+    ]
 
     user.item['userStatus'] = UserStatus.DISABLED
+    user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
     with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
-        user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
-    assert pinpoint_client_mock.mock_calls == [call.disable_user_endpoints(user.id)]
+        pinpoint_client_mock.sync_user_endpoints.return_value = True
+        user_manager.pinpoint_flush()
+    assert pinpoint_client_mock.mock_calls == [
+        call.sync_user_endpoints(user.id, addresses={}, endpoint_status='INACTIVE')
+    ]
 
     user.item['userStatus'] = UserStatus.DELETING
+    user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
+    with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
+        pinpoint_client_mock.sync_user_endpoints.return_value = True
+        user_manager.pinpoint_flush()
+    assert pinpoint_client_mock.mock_calls == [call.delete_user_endpoints(user.id)]
+
+
+def test_pinpoint_flush_combines_changes_per_user(user_manager, user, user2, caplog):
+    user.item.update({'email': 'e@real.app', 'phoneNumber': '+12125551212', 'userStatus': UserStatus.DISABLED})
+    user_manager.sync_pinpoint_email(user.id, user.item)
+    user_manager.sync_pinpoint_phone(user.id, user.item)
+    user_manager.sync_pinpoint_user_status(user.id, user.item)
+    user_manager.sync_pinpoint_email(user2.id, {**user2.item, 'email': 'e2@real.app'})
+
+    # one sync per user, and a failure for one user doesn't stop the others
+    with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
+        pinpoint_client_mock.sync_user_endpoints.side_effect = [Exception('nope'), True]
+        with caplog.at_level(logging.WARNING):
+            assert user_manager.pinpoint_flush() == 1
+    assert pinpoint_client_mock.mock_calls == [
+        call.sync_user_endpoints(
+            user.id, addresses={'EMAIL': 'e@real.app', 'SMS': '+12125551212'}, endpoint_status='INACTIVE'
+        ),
+        call.sync_user_endpoints(user2.id, addresses={'EMAIL': 'e2@real.app'}, endpoint_status=None),
+    ]
+    assert len(caplog.records) == 1
+    assert f'Pinpoint sync failed for user `{user.id}`' in caplog.records[0].msg
+
+    # a pending sync for a user that is then deleted is dropped
+    user_manager.sync_pinpoint_email(user.id, user.item)
     with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
-        user_manager.sync_pinpoint_user_status(user.id, user.item, user.item)
+        with patch.object(user_manager, 'elasticsearch_client'):
+            user_manager.on_user_delete(user.id, user.item)
+        assert user_manager.pinpoint_flush() == 0
     assert pinpoint_client_mock.mock_calls == [call.delete_user_endpoints(user.id)]
 
 
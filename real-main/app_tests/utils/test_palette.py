@@ -0,0 +1,50 @@
+import math
+from os import path
+
+import PIL.Image
+import pytest
+
+from app.utils import palette
+
+fixtures_dir = path.join(path.dirname(path.dirname(__file__)), 'fixtures')
+grant_path = path.join(fixtures_dir, 'grant.jpg')
+grant_horizontal_path = path.join(fixtures_dir, 'grant-horizontal.jpg')
+blank_path = path.join(fixtures_dir, 'big-blank.jpg')
+
+# as found by colorthief's get_palette(color_count=5)
+colorthief_palettes = {
+    grant_path: [(51, 58, 45), (186, 206, 228), (145, 154, 169), (158, 180, 205), (130, 123, 125)],
+    grant_horizontal_path: [(53, 59, 49), (172, 175, 181), (132, 126, 128), (168, 157, 150), (147, 164, 142)],
+}
+
+
+@pytest.mark.parametrize('image_path', colorthief_palettes.keys())
+def test_get_palette_similar_to_colorthief(image_path):
+    colors = palette.get_palette(PIL.Image.open(image_path), color_count=5)
+    assert len(colors) == 5
+    distances = [
+        min(math.dist(expected, color) for color in colors) for expected in colorthief_palettes[image_path]
+    ]
+    assert max(distances) < 40
+    assert sum(distances) / len(distances) < 20
+
+
+def test_get_palette_most_common_first():
+    image = PIL.Image.new('RGB', (10, 10), color=(200, 0, 0))
+    image.paste((0, 0, 200), (0, 0, 10, 3))
+    image.paste((0, 200, 0), (0, 3, 10, 4))
+    assert palette.get_palette(image, color_count=5) == [(204, 4, 4), (4, 4, 204), (4, 204, 4)]
+
+
+def test_get_palette_ignores_white():
+    image = PIL.Image.new('RGB', (10, 10), color=(255, 255, 255))
+    image.paste((0, 0, 200), (0, 0, 10, 3))
+    assert palette.get_palette(image) == [(4, 4, 204)]
+
+    with pytest.raises(ValueError, match='no non-background pixels'):
+        palette.get_palette(PIL.Image.open(blank_path))
+
+
+def test_get_palette_converts_mode():
+    image = PIL.Image.new('L', (10, 10), color=100)
+    assert palette.get_palette(image) == [(100, 100, 100)]
@@ -0,0 +1,57 @@
+import io
+from os import path
+
+import PIL.Image
+import pytest
+
+from app.utils import perceptual_hash
+
+fixtures_dir = path.join(path.dirname(path.dirname(__file__)), 'fixtures')
+grant_path = path.join(fixtures_dir, 'grant.jpg')
+grant_horizontal_path = path.join(fixtures_dir, 'grant-horizontal.jpg')
+squirrel_path = path.join(fixtures_dir, 'squirrel.png')
+
+
+def test_dhash_format():
+    image_hash = perceptual_hash.dhash(PIL.Image.open(grant_path))
+    assert len(image_hash) == 16
+    assert int(image_hash, 16) >= 0
+
+    # flat images have no differences between neighbouring pixels
+    assert perceptual_hash.dhash(PIL.Image.new('RGB', (100, 100))) == '0000000000000000'
+
+
+def test_dhash_similar_images():
+    image = PIL.Image.open(grant_path)
+    image_hash = perceptual_hash.dhash(image)
+
+    # re-encoded at low quality
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=20)
+    assert perceptual_hash.hamming_distance(image_hash, perceptual_hash.dhash(PIL.Image.open(buf))) <= 3
+
+    # resized down, as a thumbnail would be
+    small = image.resize((48, 64), resample=PIL.Image.LANCZOS)
+    assert perceptual_hash.hamming_distance(image_hash, perceptual_hash.dhash(small)) <= 3
+
+
+def test_dhash_different_images():
+    hashes = [
+        perceptual_hash.dhash(PIL.Image.open(p)) for p in (grant_path, grant_horizontal_path, squirrel_path)
+    ]
+    assert perceptual_hash.hamming_distance(hashes[0], hashes[1]) > 10
+    assert perceptual_hash.hamming_distance(hashes[0], hashes[2]) > 10
+
+
+def test_hamming_distance():
+    assert perceptual_hash.hamming_distance('0000000000000000', '0000000000000000') == 0
+    assert perceptual_hash.hamming_distance('0000000000000000', '0000000000000003') == 2
+    assert perceptual_hash.hamming_distance('f000000000000001', '0000000000000000') == 5
+    assert perceptual_hash.hamming_distance('ffffffffffffffff', '0000000000000000') == 64
+
+
+def test_split_bands():
+    assert perceptual_hash.split_bands('0123456789abcdef', 4) == ['0123', '4567', '89ab', 'cdef']
+    assert perceptual_hash.split_bands('0123456789abcdef', 2) == ['01234567', '89abcdef']
+    with pytest.raises(AssertionError):
+        perceptual_hash.split_bands('0123456789abcdef', 3)
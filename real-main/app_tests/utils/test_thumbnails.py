@@ -0,0 +1,123 @@
+import logging
+from os import path
+from unittest import mock
+
+import PIL.Image
+import pytest
+
+from app.utils import image_size, thumbnails
+
+fixtures_dir = path.join(path.dirname(path.dirname(__file__)), 'fixtures')
+big_blank_path = path.join(fixtures_dir, 'big-blank.jpg')
+grant_rotated_path = path.join(fixtures_dir, 'grant-rotated.jpg')
+
+
+@pytest.mark.parametrize(
+    'dimensions, max_dimensions',
+    [
+        ((4000, 2000), (3840, 2160)),
+        ((4000, 2000), (64, 64)),
+        ((2000, 4000), (1920, 1080)),
+        ((333, 777), (480, 480)),
+        ((1001, 999), (480, 480)),
+        ((100, 100), (480, 480)),
+        ((5000, 3), (64, 64)),
+    ],
+)
+def test_fit_dimensions_matches_pil_thumbnail(dimensions, max_dimensions):
+    image = PIL.Image.new('RGB', dimensions)
+    image.thumbnail(max_dimensions)
+    assert thumbnails.fit_dimensions(dimensions, max_dimensions) == image.size
+
+
+def test_open_jpeg_full_size():
+    image, is_reduced = thumbnails.open_jpeg(big_blank_path)
+    assert image.size == (4000, 2000)
+    assert is_reduced is False
+
+
+def test_open_jpeg_reduced():
+    # fit size is 480x240, so the decoder can scale down by 1/8 to 500x250
+    image, is_reduced = thumbnails.open_jpeg(big_blank_path, max_dimensions=(480, 480))
+    assert image.size == (500, 250)
+    assert is_reduced is True
+
+    # fit size is 3840x1920, so no scaling down is possible
+    image, is_reduced = thumbnails.open_jpeg(big_blank_path, max_dimensions=(3840, 2160))
+    assert image.size == (4000, 2000)
+    assert is_reduced is False
+
+
+def test_open_jpeg_rotated():
+    # stored as 240x320 with an exif orientation of 6, so displayed as 320x240
+    image, is_reduced = thumbnails.open_jpeg(grant_rotated_path)
+    assert image.size == (320, 240)
+    assert is_reduced is False
+
+    image, is_reduced = thumbnails.open_jpeg(grant_rotated_path, max_dimensions=(160, 120))
+    assert image.size == (160, 120)
+    assert is_reduced is True
+
+
+def test_generate_thumbnails():
+    image = PIL.Image.new('RGB', (4000, 2000), color='red')
+    max_dimensions_list = [(3840, 2160), (1920, 1080), (480, 480), (64, 64)]
+    thumbs = list(thumbnails.generate_thumbnails(image, max_dimensions_list))
+    assert [thumb.size for thumb in thumbs] == [(3840, 1920), (1920, 960), (480, 240), (64, 32)]
+    assert all(thumb.getpixel((0, 0)) == (255, 0, 0) for thumb in thumbs)
+    # source image untouched
+    assert image.size == (4000, 2000)
+
+
+def test_generate_thumbnails_small_image():
+    image = PIL.Image.new('RGB', (100, 50))
+    thumbs = list(thumbnails.generate_thumbnails(image, [(480, 480), (64, 64)]))
+    assert thumbs[0] is image
+    assert thumbs[1].size == (64, 32)
+
+
+@pytest.mark.parametrize(
+    'path, size',
+    [
+        ('uid/post/pid/image/4K.jpg', image_size.K4),
+        ('uid/post/pid/image/64p.jpg', image_size.P64),
+        ('uid/profile-photo/pid/1080p.jpg', image_size.P1080),
+        ('uid/album/aid/art-hash/480p.jpg', image_size.P480),
+        ('uid/post/pid/image/native.jpg', None),
+        ('uid/album/aid/tiles/pid/960x540.jpg', None),
+        ('4K.jpg', None),
+    ],
+)
+def test_get_thumbnail_size(path, size):
+    assert thumbnails.get_thumbnail_size(path) is size
+
+
+def test_get_native_path():
+    assert thumbnails.get_native_path('uid/post/pid/image/4K.jpg') == 'uid/post/pid/image/native.jpg'
+    assert thumbnails.get_native_path('uid/album/aid/ah/64p.jpg') == 'uid/album/aid/ah/native.jpg'
+
+
+def test_render_missing_thumbnail(s3_uploads_client, caplog):
+    path = 'uid/post/pid/image/480p.jpg'
+    with pytest.raises(ValueError, match='not that of a thumbnail'):
+        thumbnails.render_missing_thumbnail(s3_uploads_client, 'uid/post/pid/image/native.jpg')
+
+    # no native image to render from
+    with caplog.at_level(logging.WARNING):
+        assert thumbnails.render_missing_thumbnail(s3_uploads_client, path) is False
+    assert len(caplog.records) == 1
+    assert 'no native jpeg' in caplog.records[0].msg
+    assert not s3_uploads_client.exists(path)
+
+    # render it
+    with open(big_blank_path, 'rb') as fh:
+        s3_uploads_client.put_object('uid/post/pid/image/native.jpg', fh.read(), 'image/jpeg')
+    assert thumbnails.render_missing_thumbnail(s3_uploads_client, path) is True
+    image = PIL.Image.open(s3_uploads_client.get_object_data_stream(path))
+    assert image.format == 'JPEG'
+    assert image.size == thumbnails.fit_dimensions((4000, 2000), image_size.P480.max_dimensions)
+
+    # already exists, nothing to do
+    with mock.patch.object(s3_uploads_client, 'put_object') as put_object_mock:
+        assert thumbnails.render_missing_thumbnail(s3_uploads_client, path) is False
+    assert put_object_mock.mock_calls == []
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import argparse
+import base64
+import io
+import multiprocessing
+import os
+import sys
+
+import PIL.Image
+import PIL.ImageOps
+import pyheif
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.models.post.cached_image import CachedImage  # noqa E402
+from app.utils import image_size  # noqa E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare peak memory use of image upload ingest')
+    parser.add_argument('paths', nargs='+', help='jpeg or heic files to ingest')
+    parser.add_argument('-s', dest='scale', type=int, default=1, help='upscale jpeg inputs by this factor first')
+    args = parser.parse_args()
+    return args.paths, args.scale
+
+
+def load_image_data(path, scale):
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if scale == 1 or path.lower().endswith('.heic'):
+        return data
+    image = PIL.Image.open(io.BytesIO(data))
+    image = image.resize((image.size[0] * scale, image.size[1] * scale), resample=PIL.Image.BICUBIC)
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=95)
+    return buf.getvalue()
+
+
+def legacy_ingest(image_data_b64, is_heic):
+    "The ingest path as it was: reading the data and setting images both made copies"
+    data = io.BytesIO(base64.b64decode(image_data_b64)).read()
+    if is_heic:
+        heif_file = pyheif.read(io.BytesIO(data))
+        image = PIL.Image.frombytes(
+            heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
+        )
+    else:
+        image = PIL.ImageOps.exif_transpose(PIL.Image.open(io.BytesIO(data)))
+    native = image.copy()
+    return native.copy()
+
+
+def ingest(image_data_b64, is_heic):
+    source = CachedImage('pid', image_size=image_size.NATIVE_HEIC if is_heic else image_size.NATIVE, source=list)
+    source.set_data(io.BytesIO(base64.b64decode(image_data_b64)))
+    native = CachedImage('pid', image_size=image_size.NATIVE, source=list)
+    native.set_image(source.readonly_image)
+    return native.readonly_image
+
+
+def read_memory_status_kb(field):
+    with open('/proc/self/status') as fh:
+        return next(int(line.split()[1]) for line in fh if line.startswith(f'{field}:'))
+
+
+def measure(func, image_data_b64, is_heic, queue):
+    # reset the peak RSS (linux only), so transient memory use from startup is not counted
+    with open('/proc/self/clear_refs', 'w') as fh:
+        fh.write('5')
+    baseline = read_memory_status_kb('VmRSS')
+    image = func(image_data_b64, is_heic)
+    peak = read_memory_status_kb('VmHWM')
+    queue.put((image.size, baseline, peak))
+
+
+def run_in_fresh_process(func, image_data_b64, is_heic):
+    "Each measurement gets a process of its own, so memory freed by one does not hide the next"
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(func, image_data_b64, is_heic, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    paths, scale = parse_args()
+    for path in paths:
+        image_data_b64 = base64.b64encode(load_image_data(path, scale)).decode('ascii')
+        is_heic = path.lower().endswith('.heic')
+        results = {}
+        for name, func in (('legacy', legacy_ingest), ('streaming', ingest)):
+            size, baseline, peak = run_in_fresh_process(func, image_data_b64, is_heic)
+            results[name] = (peak - baseline) / 1024
+        print(
+            f'{os.path.basename(path)} {size[0]}x{size[1]}: peak RSS growth legacy {results["legacy"]:.1f}MB, '
+            + f'streaming {results["streaming"]:.1f}MB'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import colorthief
+import PIL.Image
+import pyheif
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.utils import image_size, palette, thumbnails  # noqa E402
+
+
+class ColorThiefFromImage(colorthief.ColorThief):
+    def __init__(self, image):
+        self.image = image
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare palette extraction against colorthief')
+    parser.add_argument('paths', nargs='+', help='jpeg or heic files to extract palettes from')
+    args = parser.parse_args()
+    return args.paths
+
+
+def open_image(path):
+    if path.lower().endswith('.heic'):
+        heif_file = pyheif.read(path)
+        return PIL.Image.frombytes(
+            heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
+        )
+    image, _ = thumbnails.open_jpeg(path)
+    return image
+
+
+def main():
+    paths = parse_args()
+    for path in paths:
+        image = open_image(path)
+        start = time.perf_counter()
+        expected = ColorThiefFromImage(image).get_palette(color_count=5)
+        colorthief_time = time.perf_counter() - start
+
+        # in post processing the 480p thumbnail is already at hand, so it is not timed
+        thumbnail = thumbnails.resize_to_fit(image, image_size.P480.max_dimensions)
+        start = time.perf_counter()
+        colors = palette.get_palette(thumbnail, color_count=5)
+        palette_time = time.perf_counter() - start
+
+        distances = [min(math.dist(color, other) for other in colors) for color in expected]
+        print(
+            f'{os.path.basename(path)} {image.size[0]}x{image.size[1]}: colorthief {colorthief_time * 1000:.1f}ms, '
+            + f'palette {palette_time * 1000:.1f}ms, max color distance {max(distances):.1f}'
+        )
+        print(f'  colorthief: {expected}')
+        print(f'  palette:    {colors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import PIL.Image
+import PIL.ImageOps
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.utils import image_size, thumbnails  # noqa E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare thumbnail generation before and after pyramid resizing')
+    parser.add_argument('paths', nargs='+', help='jpeg files to thumbnail')
+    parser.add_argument('-s', dest='scale', type=int, default=1, help='upscale the inputs by this factor first')
+    parser.add_argument('-n', dest='iterations', type=int, default=5, help='iterations per input')
+    args = parser.parse_args()
+    return args.paths, args.scale, args.iterations
+
+
+def load_jpeg_data(path, scale):
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if scale == 1:
+        return data
+    image = PIL.Image.open(io.BytesIO(data))
+    image = image.resize((image.size[0] * scale, image.size[1] * scale), resample=PIL.Image.BICUBIC)
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=95)
+    return buf.getvalue()
+
+
+def legacy_thumbnails(data):
+    image = PIL.ImageOps.exif_transpose(PIL.Image.open(io.BytesIO(data)))
+    for size in image_size.THUMBNAILS:
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size.max_dimensions, resample=PIL.Image.LANCZOS)
+        thumbnail.load()
+
+
+def pyramid_thumbnails(data):
+    max_dimensions_list = [size.max_dimensions for size in image_size.THUMBNAILS]
+    image, _ = thumbnails.open_jpeg(io.BytesIO(data), max_dimensions=max_dimensions_list[0])
+    for thumbnail in thumbnails.generate_thumbnails(image, max_dimensions_list):
+        thumbnail.load()
+
+
+def time_it(func, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(data)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    paths, scale, iterations = parse_args()
+    for path in paths:
+        data = load_jpeg_data(path, scale)
+        size = PIL.Image.open(io.BytesIO(data)).size
+        legacy = time_it(legacy_thumbnails, data, iterations)
+        pyramid = time_it(pyramid_thumbnails, data, iterations)
+        print(
+            f'{os.path.basename(path)} {size[0]}x{size[1]}: legacy {legacy * 1000:.1f}ms, '
+            + f'pyramid {pyramid * 1000:.1f}ms, speedup {legacy / pyramid:.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import io
+import logging
+import os
+
+import boto3
+import PIL.Image
+
+logger = logging.getLogger()
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+
+# keep in sync with app.utils.perceptual_hash and app.models.post.dynamo.image
+HASH_SIZE = 8
+BAND_COUNT = 4
+
+
+def dhash(image):
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), resample=PIL.Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left, right = pixels[row * (HASH_SIZE + 1) + col], pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | int(left > right)
+    return f'{value:0{HASH_SIZE * HASH_SIZE // 4}x}'
+
+
+class Migration:
+    """
+    For all post images of completed or archived posts without a perceptual hash,
+    compute one from the 64p thumbnail and index it for near-duplicate detection.
+    """
+
+    def __init__(self, dynamo_table, s3_bucket):
+        self.dynamo_table = dynamo_table
+        self.s3_bucket = s3_bucket
+
+    def run(self):
+        for image_item in self.generate_all_image_items_to_migrate():
+            self.migrate_image_item(image_item)
+
+    def generate_all_image_items_to_migrate(self):
+        "Return a generator of all items in the table that pass the filter"
+        scan_kwargs = {
+            'FilterExpression': ' AND '.join(
+                ['begins_with(partitionKey, :pk_prefix)', 'sortKey = :sk', 'attribute_not_exists(imageHash)']
+            ),
+            'ExpressionAttributeValues': {':pk_prefix': 'post/', ':sk': 'image'},
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def migrate_image_item(self, image_item):
+        post_id = image_item['partitionKey'].split('/')[1]
+        post_item = self.dynamo_table.get_item(Key={'partitionKey': f'post/{post_id}', 'sortKey': '-'}).get(
+            'Item'
+        )
+        if not post_item or post_item.get('postStatus') not in ('COMPLETED', 'ARCHIVED'):
+            logger.warning(f'Post `{post_id}`: skipping, not completed or archived')
+            return
+
+        path = '/'.join([post_item['postedByUserId'], 'post', post_id, 'image', '64p.jpg'])
+        data = self.s3_get_object_data(path)
+        if data is None:
+            logger.warning(f'Post `{post_id}`: s3: no 64p thumbnail found')
+            return
+        try:
+            image_hash = dhash(PIL.Image.open(io.BytesIO(data)))
+        except Exception as err:
+            logger.warning(f'Post `{post_id}`: unable to hash 64p thumbnail: {err}')
+            return
+
+        logger.warning(f'Post `{post_id}`: dynamo: adding image hash `{image_hash}`')
+        band_digits = len(image_hash) // BAND_COUNT
+        with self.dynamo_table.batch_writer() as batch:
+            for band_index in range(BAND_COUNT):
+                band = image_hash[band_index * band_digits : (band_index + 1) * band_digits]
+                item = {
+                    'partitionKey': f'post/{post_id}',
+                    'sortKey': f'imageHash/{band_index}',
+                    'schemaVersion': 0,
+                    'gsiK2PartitionKey': f'postImageHash/{band_index}/{band}',
+                    'gsiK2SortKey': f'{post_item["postedAt"]}/{image_hash}',
+                }
+                batch.put_item(Item=item)
+        self.dynamo_table.update_item(
+            Key={k: image_item[k] for k in ('partitionKey', 'sortKey')},
+            UpdateExpression='SET imageHash = :ih',
+            ConditionExpression='attribute_exists(partitionKey) AND attribute_not_exists(imageHash)',
+            ExpressionAttributeValues={':ih': image_hash},
+        )
+
+    def s3_get_object_data(self, path):
+        try:
+            return self.s3_bucket.Object(path).get()['Body'].read()
+        except self.s3_bucket.meta.client.exceptions.NoSuchKey:
+            return None
+
+
+if __name__ == '__main__':
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+    assert S3_UPLOADS_BUCKET, 'Must set env variable S3_UPLOADS_BUCKET to bucket name'
+
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+    s3_bucket = boto3.resource('s3').Bucket(S3_UPLOADS_BUCKET)
+
+    migration = Migration(dynamo_table, s3_bucket)
+    migration.run()
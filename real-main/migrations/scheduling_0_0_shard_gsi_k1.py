@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import zlib
+
+import boto3
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+
+logger = logging.getLogger()
+
+# map of unsharded GSI-K1 partition key to shard count
+# keep in sync with app.models.card.dynamo, app.models.album.dynamo and app.models.appstore.dynamo.receipt
+SHARD_COUNTS = {
+    'card': 8,
+    'album': 4,
+    'appStoreReceipt': 4,
+}
+
+
+class Migration:
+    """
+    For all cards, albums and app store receipts in the single-partition GSI-K1 scheduling
+    indexes, move them to one of the sharded partitions `{partitionKey}#{shard}`.
+    """
+
+    def __init__(self, dynamo_client, dynamo_table):
+        self.dynamo_client = dynamo_client
+        self.dynamo_table = dynamo_table
+
+    def run(self):
+        for item in self.generate_items_to_migrate():
+            self.migrate_item(item)
+
+    def generate_items_to_migrate(self):
+        "Return a generator of all items that need to be migrated"
+        pk_values = {f':pk{i}': pk for i, pk in enumerate(SHARD_COUNTS)}
+        scan_kwargs = {
+            'FilterExpression': f'gsiK1PartitionKey IN ({", ".join(pk_values)})',
+            'ExpressionAttributeValues': pk_values,
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def migrate_item(self, item):
+        key = {k: item[k] for k in ('partitionKey', 'sortKey')}
+        old_pk = item['gsiK1PartitionKey']
+        shard = zlib.crc32(item['partitionKey'].encode('utf-8')) % SHARD_COUNTS[old_pk]
+        query_kwargs = {
+            'Key': key,
+            'UpdateExpression': 'SET gsiK1PartitionKey = :new_pk',
+            # the item may have been removed from the index since we read it
+            'ConditionExpression': 'gsiK1PartitionKey = :old_pk',
+            'ExpressionAttributeValues': {':old_pk': old_pk, ':new_pk': f'{old_pk}#{shard}'},
+        }
+        logger.warning(f'Migrating `{key}`')
+        try:
+            self.dynamo_table.update_item(**query_kwargs)
+        except self.dynamo_client.exceptions.ConditionalCheckFailedException:
+            logger.warning(f'Item `{key}` no longer in the index, skipping')
+
+
+def lambda_handler(event, context):
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+    dynamo_client = boto3.client('dynamodb')
+
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
+
+    return {'statusCode': 200, 'body': json.dumps('Migration completed successfully')}
+
+
+if __name__ == '__main__':
+    lambda_handler(None, None)
@@ -0,0 +1,97 @@
+import logging
+import os
+from uuid import uuid4
+
+import pytest
+
+from migrations.post_image_0_0_fill_image_hash import Migration
+
+grant_path = os.path.join(os.path.dirname(__file__), 'fixtures', 'grant.jpg')
+grant_hash = 'c31672b1ca7a6839'
+
+
+@pytest.fixture
+def image_data():
+    with open(grant_path, 'rb') as fh:
+        data = fh.read()
+    yield data
+
+
+def add_post(dynamo_table, s3_bucket, post_status, image_data=None, image_hash=None):
+    user_id, post_id = str(uuid4()), str(uuid4())
+    if image_data:
+        s3_bucket.put_object(Key=f'{user_id}/post/{post_id}/image/64p.jpg', Body=image_data)
+    post_item = {
+        'partitionKey': f'post/{post_id}',
+        'sortKey': '-',
+        'postId': post_id,
+        'postedByUserId': user_id,
+        'postedAt': '2020-06-01T12:00:00.000000Z',
+        'postStatus': post_status,
+    }
+    image_item = {'partitionKey': f'post/{post_id}', 'sortKey': 'image', 'schemaVersion': 0}
+    if image_hash:
+        image_item['imageHash'] = image_hash
+    dynamo_table.put_item(Item=post_item)
+    dynamo_table.put_item(Item=image_item)
+    return post_id
+
+
+def get_band_items(dynamo_table, post_id):
+    items = [
+        dynamo_table.get_item(Key={'partitionKey': f'post/{post_id}', 'sortKey': f'imageHash/{i}'}).get('Item')
+        for i in range(4)
+    ]
+    return [item for item in items if item]
+
+
+def test_migrate_none(dynamo_table, s3_bucket, caplog):
+    migration = Migration(dynamo_table, s3_bucket)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+
+def test_migrate_skips(dynamo_table, s3_bucket, image_data, caplog):
+    pending_post_id = add_post(dynamo_table, s3_bucket, 'PENDING', image_data=image_data)
+    no_image_post_id = add_post(dynamo_table, s3_bucket, 'COMPLETED')
+    hashed_post_id = add_post(dynamo_table, s3_bucket, 'COMPLETED', image_data=image_data, image_hash='ab')
+
+    migration = Migration(dynamo_table, s3_bucket)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 2
+    assert any(pending_post_id in rec.msg and 'skipping' in rec.msg for rec in caplog.records)
+    assert any(no_image_post_id in rec.msg and 'no 64p thumbnail' in rec.msg for rec in caplog.records)
+
+    for post_id in (pending_post_id, no_image_post_id, hashed_post_id):
+        assert get_band_items(dynamo_table, post_id) == []
+
+
+def test_migrate_completed_post(dynamo_table, s3_bucket, image_data, caplog):
+    post_id = add_post(dynamo_table, s3_bucket, 'COMPLETED', image_data=image_data)
+
+    migration = Migration(dynamo_table, s3_bucket)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 1
+    assert post_id in caplog.records[0].msg
+
+    image_key = {'partitionKey': f'post/{post_id}', 'sortKey': 'image'}
+    assert dynamo_table.get_item(Key=image_key)['Item']['imageHash'] == grant_hash
+    assert get_band_items(dynamo_table, post_id) == [
+        {
+            'partitionKey': f'post/{post_id}',
+            'sortKey': f'imageHash/{i}',
+            'schemaVersion': 0,
+            'gsiK2PartitionKey': f'postImageHash/{i}/{grant_hash[i * 4 : (i + 1) * 4]}',
+            'gsiK2SortKey': f'2020-06-01T12:00:00.000000Z/{grant_hash}',
+        }
+        for i in range(4)
+    ]
+
+    # migration is idempotent
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
@@ -0,0 +1,120 @@
+import logging
+import zlib
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.scheduling_0_0_shard_gsi_k1 import Migration
+
+
+def expected_gsi_k1_pk(item, shard_count):
+    shard = zlib.crc32(item['partitionKey'].encode('utf-8')) % shard_count
+    return f'{item["gsiK1PartitionKey"]}#{shard}'
+
+
+@pytest.fixture
+def card(dynamo_table):
+    user_id = str(uuid4())
+    item = {
+        'partitionKey': f'card/{uuid4()}',
+        'sortKey': '-',
+        'schemaVersion': 1,
+        'title': 'title',
+        'action': 'action',
+        'gsiA1PartitionKey': f'user/{user_id}',
+        'gsiA1SortKey': f'card/{pendulum.now("utc").to_iso8601_string()}',
+        'gsiK1PartitionKey': 'card',
+        'gsiK1SortKey': f'{pendulum.now("utc").to_iso8601_string()}/{user_id}',
+    }
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+@pytest.fixture
+def album(dynamo_table):
+    item = {
+        'partitionKey': f'album/{uuid4()}',
+        'sortKey': '-',
+        'schemaVersion': 0,
+        'name': 'name',
+        'gsiK1PartitionKey': 'album',
+        'gsiK1SortKey': pendulum.now('utc').to_iso8601_string(),
+    }
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+@pytest.fixture
+def receipt(dynamo_table):
+    item = {
+        'partitionKey': f'appStoreReceipt/{uuid4()}',
+        'sortKey': '-',
+        'schemaVersion': 0,
+        'gsiK1PartitionKey': 'appStoreReceipt',
+        'gsiK1SortKey': pendulum.now('utc').to_iso8601_string(),
+    }
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+@pytest.fixture
+def already_sharded_card(dynamo_table):
+    item = {
+        'partitionKey': f'card/{uuid4()}',
+        'sortKey': '-',
+        'schemaVersion': 1,
+        'gsiK1PartitionKey': 'card#3',
+        'gsiK1SortKey': f'{pendulum.now("utc").to_iso8601_string()}/uid',
+    }
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+def test_nothing_to_migrate(dynamo_client, dynamo_table, caplog, already_sharded_card):
+    # add something to the db to ensure it doesn't migrate
+    pk = {'partitionKey': 'unrelated-item', 'sortKey': '-'}
+    dynamo_table.put_item(Item=pk)
+
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    assert dynamo_table.get_item(Key=pk)['Item'] == pk
+    key = {k: already_sharded_card[k] for k in ('partitionKey', 'sortKey')}
+    assert dynamo_table.get_item(Key=key)['Item'] == already_sharded_card
+
+
+def test_migrate(dynamo_client, dynamo_table, caplog, card, album, receipt):
+    items_and_shard_counts = [(card, 8), (album, 4), (receipt, 4)]
+
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    for item, _ in items_and_shard_counts:
+        assert sum(item['partitionKey'] in str(record) for record in caplog.records) == 1
+
+    # verify only the partition key changed, and in the same way the app would
+    for item, shard_count in items_and_shard_counts:
+        key = {k: item[k] for k in ('partitionKey', 'sortKey')}
+        new_item = dynamo_table.get_item(Key=key)['Item']
+        assert new_item == {**item, 'gsiK1PartitionKey': expected_gsi_k1_pk(item, shard_count)}
+
+    # migrate again, verify nothing to do
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+
+def test_migrate_item_removed_from_index(dynamo_client, dynamo_table, caplog, card):
+    key = {k: card[k] for k in ('partitionKey', 'sortKey')}
+    dynamo_table.update_item(Key=key, UpdateExpression='REMOVE gsiK1PartitionKey, gsiK1SortKey')
+
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.migrate_item(card)
+    assert len(caplog.records) == 2
+    assert 'no longer in the index' in caplog.records[1].msg
+    assert 'gsiK1PartitionKey' not in dynamo_table.get_item(Key=key)['Item']